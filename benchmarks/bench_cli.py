@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+
+
+def _run(*args):
+    subprocess.check_call([sys.executable, '-m', 'dpm.main'] + list(args),
+                          stdout=subprocess.PIPE)
+
+
+def bench_cli_startup(benchmark):
+    # Time to import dpm and all its dependencies, paid by every command.
+    benchmark.pedantic(_run, args=('--version',), rounds=5)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+from os.path import join
+
+from dpm.utils.md5_hash import md5_file_chunk
+
+
+def bench_md5_huge_file(benchmark, huge_package):
+    path = join(huge_package, 'data/table_0.csv')
+    benchmark(md5_file_chunk, path)
+
+
+def bench_md5_many_small_files(benchmark, many_small_package):
+    data_dir = join(many_small_package, 'data')
+    paths = [join(data_dir, name) for name in os.listdir(data_dir)]
+    benchmark(lambda: [md5_file_chunk(path) for path in paths])
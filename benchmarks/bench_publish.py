@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from dpm.client import Client
+
+
+def _publish(path, config, **kwargs):
+    Client(path, config, **kwargs).publish()
+
+
+def bench_publish_many_small(benchmark, registry, many_small_package):
+    benchmark.pedantic(_publish, args=(many_small_package, registry), rounds=3)
+
+
+def bench_publish_huge(benchmark, registry, huge_package):
+    benchmark.pedantic(_publish, args=(huge_package, registry), rounds=3)
+
+
+def bench_publish_huge_gzip(benchmark, registry, huge_package):
+    benchmark.pedantic(_publish, args=(huge_package, registry), kwargs={'compress': 'gzip'},
+                       rounds=3)
+
+
+def bench_publish_huge_live(benchmark, live_registry, huge_package):
+    # Real connections and streaming upload through the socket.
+    benchmark.pedantic(_publish, args=(huge_package, live_registry), rounds=3)
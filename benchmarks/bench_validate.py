@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from os.path import join
+
+import pytest
+from datapackage import DataPackage
+
+from dpm.client import validate_data
+
+
+def _validate(path, **kwargs):
+    report = validate_data(DataPackage(join(path, 'datapackage.json')), **kwargs)
+    assert report['valid']
+
+
+def bench_validate_many_small(benchmark, many_small_package):
+    benchmark.pedantic(_validate, args=(many_small_package,), rounds=3)
+
+
+def bench_validate_huge(benchmark, huge_package):
+    benchmark.pedantic(_validate, args=(huge_package,), rounds=3)
+
+
+def bench_validate_wide(benchmark, wide_package):
+    benchmark.pedantic(_validate, args=(wide_package,), rounds=3)
+
+
+@pytest.mark.parametrize('reader', ['csv', 'mmap'])
+def bench_validate_huge_all_rows(benchmark, huge_package, reader):
+    benchmark.pedantic(_validate, args=(huge_package,),
+                       kwargs={'row_limit': 0, 'reader': reader}, rounds=3)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import re
+
+import pytest
+import responses
+
+from tests.fake_registry import FakeRegistry
+from . import packages
+
+SERVER = 'http://registry.bench'
+BITSTORE = 'http://bitstore.bench/upload'
+CONFIG = {
+    'username': 'bench',
+    'access_token': 'secret',
+    'server': SERVER,
+}
+
+
+@pytest.fixture(scope='session')
+def many_small_package(tmpdir_factory):
+    return packages.many_small_csvs(str(tmpdir_factory.getbasetemp().join('many-small')))
+
+
+@pytest.fixture(scope='session')
+def huge_package(tmpdir_factory):
+    return packages.huge_csvs(str(tmpdir_factory.getbasetemp().join('huge')))
+
+
+@pytest.fixture(scope='session')
+def wide_package(tmpdir_factory):
+    return packages.wide_schema(str(tmpdir_factory.getbasetemp().join('wide')))
+
+
+def _authorize(request):
+    filedata = json.loads(request.body.decode('utf-8'))['filedata']
+    return 200, {}, json.dumps({'filedata': {
+        name: {'upload_url': BITSTORE, 'upload_query': {'key': name}}
+        for name in filedata
+    }})
+
+
+def _upload(request):
+    # Drain the streamed body, as a real bitstore would.
+    for _ in iter(lambda: request.body.read(64 * 1024), b''):
+        pass
+    return 204, {}, ''
+
+
+@pytest.fixture
+def registry():
+    """
+    In-process registry server and bitstore, which accept any package.
+    """
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mock:
+        mock.add(responses.POST, SERVER + '/api/auth/token', json={'token': 'token'})
+        mock.add_callback(responses.POST, SERVER + '/api/datastore/authorize',
+                          callback=_authorize)
+        mock.add_callback(responses.POST, re.compile(re.escape(BITSTORE)), callback=_upload)
+        mock.add(responses.POST, SERVER + '/api/package/upload', json={'status': 'queued'})
+        yield CONFIG
+
+
+@pytest.fixture
+def live_registry():
+    """
+    Registry server and bitstore on a local socket, see tests/fake_registry.py
+    """
+    with FakeRegistry() as registry:
+        yield registry.config
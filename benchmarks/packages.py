@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Generators of synthetic data packages for benchmarks.
+
+Sizes are multiplied by DPM_BENCH_SCALE environment variable (default 1),
+e.g. DPM_BENCH_SCALE=10 for a run closer to production data volumes.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import random
+from os.path import join
+
+SCALE = float(os.environ.get('DPM_BENCH_SCALE') or 1)
+
+# Column types cycled through generated tables.
+FIELD_TYPES = ('integer', 'string', 'number', 'date', 'boolean')
+
+
+def scaled(value):
+    return max(1, int(value * SCALE))
+
+
+def _value(field_type, rnd):
+    if field_type == 'integer':
+        return str(rnd.randint(-10 ** 6, 10 ** 6))
+    if field_type == 'number':
+        return '%.4f' % rnd.uniform(-1000, 1000)
+    if field_type == 'date':
+        return '20%02d-%02d-%02d' % (rnd.randint(0, 17), rnd.randint(1, 12), rnd.randint(1, 28))
+    if field_type == 'boolean':
+        return rnd.choice(('true', 'false'))
+    return 'value-%x' % rnd.getrandbits(40)
+
+
+def write_csv(path, rows, columns, seed=0):
+    """
+    Write csv file with `rows` rows of random values and return its schema.
+    """
+    rnd = random.Random(seed)
+    fields = [{'name': 'column_%s' % idx, 'type': FIELD_TYPES[idx % len(FIELD_TYPES)]}
+              for idx in range(columns)]
+    with io.open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(field['name'] for field in fields) + '\n')
+        for _ in range(rows):
+            f.write(','.join(_value(field['type'], rnd) for field in fields) + '\n')
+    return {'fields': fields}
+
+
+def make_package(path, name, tables):
+    """
+    Create data package `name` in directory `path` with csv resource for every
+    (rows, columns) pair in `tables`. Return `path`.
+    """
+    os.makedirs(join(path, 'data'))
+    resources = []
+    for idx, (rows, columns) in enumerate(tables):
+        resource_path = 'data/table_%s.csv' % idx
+        schema = write_csv(join(path, resource_path), rows, columns, seed=idx)
+        resources.append({
+            'name': 'table_%s' % idx,
+            'path': resource_path,
+            'format': 'csv',
+            'schema': schema,
+        })
+    with io.open(join(path, 'datapackage.json'), 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'name': name, 'resources': resources}, indent=2))
+    with io.open(join(path, 'README.md'), 'w', encoding='utf-8') as f:
+        f.write('# %s\n\nSynthetic data package for benchmarks.\n' % name)
+    return path
+
+
+def many_small_csvs(path):
+    """ Many small tables, e.g. a package of per-region statistics. """
+    return make_package(path, 'many-small', [(100, 8)] * scaled(200))
+
+
+def huge_csvs(path):
+    """ A few big tables, around 25 MB each at scale 1. """
+    return make_package(path, 'huge', [(scaled(250000), 10)] * 2)
+
+
+def wide_schema(path):
+    """ One table with hundreds of columns. """
+    return make_package(path, 'wide', [(scaled(2000), 300)])
@@ -4,23 +4,52 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import copy
 import json as json_module
 import os
 import os.path
-from os.path import exists, isfile, join, getsize
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import basename, exists, isfile, join, getsize, splitext
 from os import listdir
 
 from builtins import filter
 from datapackage import DataPackage
 import datetime
-from goodtables import Inspector
 import requests
 import six
-from tabulator import Stream
-from jsontableschema import Schema
+from dpm.client.hooks import HookRegistry
+from dpm.utils.compat import monotonic
 from dpm.utils.md5_hash import md5_file_chunk
-from dpm.utils.file import ChunkReader
-from dpm.utils.click import echo
+from dpm.utils.file import ChunkReader, MultipartReader, write_json
+from dpm.utils import columnar, mediatype
+from dpm.utils.profile import NullProfiler
+from dpm.utils.scheduler import TransferScheduler
+from dpm.utils.click import echo, parse_size
+from dpm.utils.compress import ENCODINGS, check_compression, compress_file, is_text
+from dpm.utils.httpcache import DEFAULT_MAX_SIZE, HTTPCache
+from dpm.utils.lock import Lockfile
+from dpm.utils.uploads import UploadIndex, digest_key
+from dpm.utils.validation import DataValidator
+
+
+# Number of threads compressing files during publish.
+COMPRESS_WORKERS = 4
+
+# Number of rows validated in every table by default, as in goodtables.
+DATA_ROW_LIMIT = 1000
+# Max number of errors in the dataset validation report.
+DATA_ERROR_LIMIT = 1000
+
+# Registry responses that are worth retrying: the request did not reach the
+# application or it was temporarily unavailable.
+RETRY_STATUSES = (502, 503, 504)
+# Seconds to wait before the first retry, doubled for every next one.
+RETRY_BACKOFF = 0.5
+# Packages requested per page of package listing.
+PACKAGES_PAGE_SIZE = 500
 
 
 class DpmException(Exception):
@@ -66,19 +95,21 @@ class DataValidationError(DpmException):
     pass
 
 
-class Client(object):
-
-    def __init__(self, data_package_path='', config=None, click=None, datavalidate=False):
-        if not data_package_path:
-            data_package_path = os.getcwd()
-        data_package_path = os.path.abspath(data_package_path)
-        # may want to use the datapackage-py here
-        self.datapackage = self._load_dp(data_package_path)
+class BaseClient(object):
+    """
+    Connection, configuration and authentication handling shared by the
+    registry clients.
+    """
 
-        self.click = click
-        self.token = None
+    def __init__(self, config=None, session=None, profiler=None, hooks=None, retries=0):
         self.config = config
-        self.datavalidate = datavalidate
+        self.token = None
+        self.session = session or requests.Session()
+        self.profiler = profiler or NullProfiler()
+        if not isinstance(hooks, HookRegistry):
+            hooks = HookRegistry(hooks or ())
+        self.hooks = hooks
+        self.retries = retries
 
     def _ensure_config(self):
         try:
@@ -96,6 +127,185 @@ class Client(object):
             # remove trailing slash
             self.server = self.server[:-1]
 
+    def _ensure_auth(self):
+        """
+        Get auth token from the server using credentials. Token can be used in future
+        requests to the server.
+
+        # TODO: refresh expired token
+        """
+        self._ensure_config()
+        if self.token:
+            return self.token
+
+        authresponse = self._apirequest(
+            method='POST',
+            url='/api/auth/token',
+            json={'username': self.username, 'secret': self.access_token})
+
+        self.token = authresponse.json().get('token')
+        if not self.token:
+            raise AuthResponseError(authresponse, 'Server did not return auth token')
+
+        return self.token
+
+    def _apirequest(self, method, url, *args, **kwargs):
+        """
+        General request-response processing routine for dpr-api server.
+
+        :return:
+            Response -- requests.Response instance
+
+        """
+
+        # TODO: doing this for every request is kinda awkward
+        self._ensure_config()
+
+        if not url.startswith('http'):
+            # Relative url is given. Build absolute server url
+            url = self.server + url
+
+        headers = kwargs.pop('headers', {})
+        if self.token:
+            headers.setdefault('Auth-Token', '%s' % self.token)
+
+        attempt = 0
+        while True:
+            self.profiler.count('api-requests')
+            try:
+                response = self._send(method, url, *args, headers=headers, **kwargs)
+            except requests.ConnectionError as e:
+                if attempt >= self.retries:
+                    raise
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    break
+                error = HTTPStatusError(response, message='Error %s' % response.status_code)
+            if self.hooks:
+                self.hooks.on_retry(method, url, attempt + 1, error)
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+
+        try:
+            jsonresponse = response.json()
+        except Exception as e:
+            six.raise_from(
+                JSONDecodeError(response, message='Failed to decode JSON response from server'), e)
+
+        if response.status_code not in (200, 201):
+            raise HTTPStatusError(response, message='Error %s\n%s' % (
+                response.status_code,
+                jsonresponse.get('message') or jsonresponse.get('description')))
+
+        return response
+
+    def _send(self, method, url, *args, **kwargs):
+        """
+        Send HTTP request, reporting it to the hooks.
+        """
+        if not self.hooks:
+            return self.session.request(method, url, *args, **kwargs)
+
+        self.hooks.on_request_start(method, url)
+        start = monotonic()
+        try:
+            response = self.session.request(method, url, *args, **kwargs)
+        except Exception as e:
+            self.hooks.on_request_end(method, url, None, monotonic() - start, error=e)
+            raise
+        self.hooks.on_request_end(method, url, response.status_code, monotonic() - start)
+        return response
+
+    def _package_request(self, method, name, action=None, **kwargs):
+        """
+        Authenticate and send request to the package endpoint of the registry
+        server, e.g. /api/package/<username>/<name>/<action>
+        """
+        self._ensure_auth()
+        url = '/api/package/%s/%s' % (self.username, name)
+        if action:
+            url += '/' + action
+        return self._apirequest(method=method, url=url, **kwargs)
+
+    def iter_packages(self, publisher=None, page_size=PACKAGES_PAGE_SIZE):
+        """
+        Yield packages published by `publisher`, username by default, page by
+        page. The next page is fetched in background while the current one is
+        consumed, and only these two pages are kept in memory.
+
+        Server can paginate with `next` url or `cursor` in the response
+        body, or with Link: <url>; rel="next" header. A response without
+        them is the last page.
+        """
+        self._ensure_config()
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self._apirequest, 'GET',
+                                     '/api/package/%s' % (publisher or self.username),
+                                     params={'per_page': page_size})
+            while future:
+                response = future.result()
+                page = response.json()
+                next_url = page.get('next') or response.links.get('next', {}).get('url')
+                if next_url:
+                    future = executor.submit(self._apirequest, 'GET', next_url)
+                elif page.get('cursor'):
+                    future = executor.submit(self._apirequest, 'GET', response.url.split('?')[0],
+                                             params={'per_page': page_size,
+                                                     'cursor': page['cursor']})
+                else:
+                    future = None
+                for package in page.get('data') or []:
+                    yield package
+        finally:
+            # Consumer stopped early, do not wait for the prefetched page.
+            if future:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def package_url(self, name, publisher=None):
+        """
+        Return url of the page of published package.
+        """
+        self._ensure_config()
+        return '%s/%s/%s' % (self.server, publisher or self.username, name)
+
+
+class Client(BaseClient):
+
+    def __init__(self, data_package_path='', config=None, click=None, datavalidate=False,
+                 session=None, scheduler=None, compress=None, profiler=None, hooks=None,
+                 retries=0, verify=False, convert=None, convert_mode='add', dedup=False,
+                 upload_index=None):
+        if not data_package_path:
+            data_package_path = os.getcwd()
+        data_package_path = os.path.abspath(data_package_path)
+        # may want to use the datapackage-py here
+        self.datapackage = self._load_dp(data_package_path)
+
+        super(Client, self).__init__(config=config, session=session, profiler=profiler,
+                                     hooks=hooks, retries=retries)
+        self.click = click
+        self.datavalidate = datavalidate
+        self.compress = compress
+        # Format to convert csv resources to on publish, and whether to 'add'
+        # converted resources or 'replace' the csv ones.
+        self.convert = convert
+        self.convert_mode = convert_mode
+        # Ask the server to alias files with the same content as another file
+        # of the package, or as a file in `upload_index` (UploadIndex, default
+        # one if None), instead of uploading them.
+        self.dedup = dedup
+        self.upload_index = upload_index
+        self.scheduler = scheduler or TransferScheduler(
+            bandwidth=parse_size((config or {}).get('upload_rate') or 0) or None)
+        # Digests and validation status from datapackage.lock, if it exists.
+        self.lockfile = Lockfile(data_package_path, verify=verify)
+        # Local copies of remote resources for validation.
+        self.http_cache = HTTPCache(
+            max_size=parse_size((config or {}).get('http_cache_size') or 0) or DEFAULT_MAX_SIZE)
+
     def _load_dp(self, path):
         dppath = join(path, 'datapackage.json')
 
@@ -107,27 +317,128 @@ class Client(object):
         dp = DataPackage(dppath)
         return dp
 
-    def validate(self):
+    def validate(self, resources=None):
+        """
+        Validate metadata and, if datavalidate is enabled, data of resources
+        of the datapackage. Validate data only of resources with paths in
+        `resources`, if given.
+        """
         validate_metadata(self.datapackage)
 
         if self.datavalidate:
-            report = validate_data(self.datapackage)
+            lockfile = self.lockfile if self.lockfile.exists() else None
+            report = validate_data(self.datapackage, hooks=self.hooks, lock=lockfile,
+                                   resources=resources, http_cache=self.http_cache)
+            self._save_lock()
             if not report['valid']:
                 print_inspection_report(report)
                 raise DataValidationError('[ERROR] data validation failed!')
         return True
 
-    def publish(self, publisher=None):
+    def lock(self):
+        """
+        Write datapackage.lock with digests of the files to publish and
+        validation status of tabular resources. Only new or changed files are
+        hashed and validated, unless the lock was created with verify=True.
+        Return the lock.
+        """
+        validate_metadata(self.datapackage)
+        with self.profiler.span('hash'):
+            for path in self.file_list():
+                self.lockfile.entry(path)
+        with self.profiler.span('validate'):
+            report = validate_data(self.datapackage, hooks=self.hooks, lock=self.lockfile,
+                                   http_cache=self.http_cache)
+        self.lockfile.save()
+        if not report['valid']:
+            print_inspection_report(report)
+        return self.lockfile
+
+    def affected_resources(self, changed):
+        """
+        Return paths of resources affected by `changed` files, paths relative
+        to the datapackage: changed resources, resources with changed
+        descriptors if datapackage.json is changed, and resources referencing
+        them by foreign keys. datapackage.json is reloaded if changed.
+        """
+        affected = set(changed)
+        if 'datapackage.json' in changed:
+            old = [resource.descriptor for resource in self.datapackage.resources]
+            self.datapackage = self._load_dp(self.datapackage.base_path)
+            affected.update(resource.descriptor.get('path')
+                            for resource in self.datapackage.resources
+                            if resource.descriptor not in old)
+
+        resources = self.datapackage.resources
+        result = set(resource.descriptor['path'] for resource in resources
+                     if resource.descriptor.get('path') in affected)
+        # Resources referencing affected ones, until there are no new ones.
+        while True:
+            dependent = set(
+                resource.descriptor['path'] for resource in resources
+                for _, reference, _ in foreign_keys(self.datapackage, resource)
+                if reference is not None and reference.descriptor.get('path') in result)
+            if dependent <= result:
+                break
+            result |= dependent
+        return sorted(result)
+
+    def _save_lock(self):
+        """
+        Save entries recomputed in this run, if the data package is locked.
+        """
+        if self.lockfile.changed and self.lockfile.exists():
+            self.lockfile.save()
+
+    def publish(self, publisher=None, validate=True, files=None):
         """
         Publish datapackage to the registry server.
 
         @param publisher: optional publisher to use. If not provided
         first try to use publisher in datapackage.json and if that is missing
         use username.
+        @param validate: set to False to skip validation, e.g. if it was
+        already done.
+        @param files: optional paths of files to upload, e.g. files changed
+        since the last publish. datapackage.json is always uploaded.
+
+        If `convert` is 'parquet', csv resources are converted to Parquet
+        and added to, or replace csv ones in the uploaded datapackage.json.
+        The local datapackage is not changed.
+
+        With `dedup`, files with the same content as another file of the
+        package, or as a file uploaded before, are not uploaded if the server
+        accepts them as aliases, see _dedup().
         """
-        self.validate()
+        if self.compress:
+            try:
+                check_compression(self.compress)
+            except ValueError as e:
+                raise DpmException(str(e))
+        if validate:
+            with self.profiler.span('validate'):
+                self.validate()
         token = self._ensure_auth()
 
+        workdir = tempfile.mkdtemp(prefix='dpm-') if self.compress or self.convert else None
+        try:
+            file_list = self.file_list()
+            if files is not None:
+                file_list = [path for path in file_list
+                             if path == 'datapackage.json' or path in files]
+            local_paths = {}
+            if self.convert:
+                file_list = self._convert_files(file_list, workdir, local_paths)
+            return self._publish_files(file_list, workdir, local_paths)
+        finally:
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def file_list(self):
+        """
+        Return paths of files to publish: datapackage.json, readme and
+        resources.
+        """
         file_list = ['datapackage.json']
 
         accepted_readme = ['README', 'README.txt', 'README.md']
@@ -139,10 +450,88 @@ class Client(object):
 
         for resource in self.datapackage.resources:
             file_list.append(resource.descriptor['path'])
+        return file_list
 
+    def _convert_files(self, file_list, workdir, local_paths):
+        """
+        Convert csv resources in `file_list` to Parquet files in `workdir`,
+        and write datapackage.json with the converted resources there. Return
+        file list to publish; `local_paths` are updated with paths of the
+        written files. csv files are parsed with the dialect and encoding of
+        their resources, which are dropped from the converted descriptors.
+        """
+        if self.convert != 'parquet':
+            raise DpmException('Unknown conversion format: %s' % self.convert)
+        descriptor = copy.deepcopy(self.datapackage.descriptor)
+        resources = []
+        file_list = list(file_list)
+        for idx, resource in enumerate(descriptor.get('resources', [])):
+            path = resource.get('path')
+            is_csv = resource.get('format') == 'csv' or resource.get('mediatype') == 'text/csv' \
+                or (path or '').endswith('.csv')
+            if not path or not is_csv or '://' in path:
+                resources.append(resource)
+                continue
+            target = splitext(path)[0] + '.parquet'
+            converted = dict(resource, path=target, format='parquet',
+                             mediatype=columnar.MEDIA_TYPES['parquet'])
+            for key in ('encoding', 'dialect', 'bytes', 'hash'):
+                converted.pop(key, None)
+            if self.convert_mode == 'replace':
+                resources.append(converted)
+            else:
+                converted['name'] = '%s-parquet' % (resource.get('name') or splitext(basename(path))[0])
+                resources.extend([resource, converted])
+            if path not in file_list:
+                continue
+            local_paths[target] = join(workdir, '%s.parquet' % idx)
+            local_path = join(self.datapackage.base_path, path)
+            with self.profiler.span(path, 'convert', bytes=getsize(local_path)):
+                try:
+                    columnar.csv_to_parquet(
+                        local_path, local_paths[target], resource.get('schema'),
+                        dialect=resource.get('dialect'), encoding=resource.get('encoding'))
+                except ValueError as e:
+                    raise DpmException(str(e))
+            position = file_list.index(path)
+            if self.convert_mode == 'replace':
+                file_list[position] = target
+            else:
+                file_list.insert(position + 1, target)
+        descriptor['resources'] = resources
+        local_paths['datapackage.json'] = join(workdir, 'datapackage.json')
+        write_json(local_paths['datapackage.json'], descriptor)
+        return file_list
+
+    def _publish_files(self, file_list, workdir=None, local_paths=None):
+        """
+        Authorize, upload and finalize files of the datapackage. If compression
+        is enabled, compressed files are written to and uploaded from `workdir`.
+        Files in `local_paths` are uploaded from the given paths instead of
+        the datapackage, e.g. converted files.
+        """
+        local_paths = dict(local_paths or {})
+        converted = set(local_paths)
         filedata = {}
-        for file in file_list:
-            filedata[file] = self._get_file_info(file)
+        with self.profiler.span('hash'), ThreadPoolExecutor(max_workers=COMPRESS_WORKERS) as executor:
+            # Compress text resources on worker threads while other files are hashed.
+            compressing = {}
+            if self.compress:
+                for idx, resource in enumerate(self.datapackage.resources):
+                    path = resource.descriptor['path']
+                    if is_text(path) and path in file_list and path not in converted:
+                        local_paths[path] = join(workdir, '%s.%s' % (idx, self.compress))
+                        compressing[path] = executor.submit(
+                            self._get_compressed_file_info, path, local_paths[path])
+
+            for file in file_list:
+                if file not in compressing:
+                    filedata[file] = self._get_file_info(file, local_paths.get(file))
+            for file, future in compressing.items():
+                filedata[file] = future.result()
+        self._save_lock()
+        index = (self.upload_index or UploadIndex()) if self.dedup else None
+        aliases = self._dedup(file_list, filedata, index) if self.dedup else {}
 
         file_info_for_request = {
             'metadata': {
@@ -152,168 +541,197 @@ class Client(object):
             'filedata': filedata
         }
 
-        response = self._apirequest(
-                method='POST',
-                url='/api/datastore/authorize',
-                json=file_info_for_request
-            )
+        with self.profiler.span('authorize'):
+            response = self._apirequest(
+                    method='POST',
+                    url='/api/datastore/authorize',
+                    json=file_info_for_request
+                )
         filedata = response.json().get('filedata')
         if not filedata:
             raise DpmException('server did not provide upload authorization for files')
 
         # Upload datapackage.json
-        for path in file_list:
-            self._upload_file(path, filedata[path])
+        with self.profiler.span('upload'):
+            for path in file_list:
+                info = file_info_for_request['filedata'][path]
+                if path in aliases:
+                    if not (filedata.get(path) or {}).get('upload_url'):
+                        self.scheduler.skip(info['size'])
+                        continue
+                    # The server ignored the alias, e.g. the aliased file
+                    # was purged. Upload the file and forget the old one.
+                    if index is not None:
+                        index.discard(self.server, info)
+                self._upload_file(path, filedata[path], local_paths.get(path),
+                                  file_type=info['type'])
+                if index is not None and path != 'datapackage.json':
+                    index.add(self.server, info, filedata[path]['upload_url'] + '/' +
+                              filedata[path]['upload_query']['key'])
 
         # TODO: (?) echo('Finalizing ... ', nl=False)
         data_package_s3_url = filedata['datapackage.json']['upload_url'] + '/' +\
                               filedata['datapackage.json']['upload_query']['key']
-        response = self._apirequest(
-            method='POST',
-            url='/api/package/upload',
-            json={'datapackage': data_package_s3_url}
-        )
+        with self.profiler.span('finalize'):
+            response = self._apirequest(
+                method='POST',
+                url='/api/package/upload',
+                json={'datapackage': data_package_s3_url}
+            )
         status = response.json().get('status', None)
         if status is None or status != 'queued':
             raise DpmException('server did not provide upload authorization for files')
+        if index is not None:
+            try:
+                index.save()
+            except (IOError, OSError):
+                # Only costs uploads on the next publish.
+                pass
 
         # Return published datapackage url
         return self.server + '/%s/%s' % (self.username, self.datapackage.descriptor['name'])
 
-    def _get_file_info(self, path):
-        local_path = join(self.datapackage.base_path, path)
-        md5 = md5_file_chunk(local_path)
+    def _dedup(self, file_list, filedata, index=None):
+        """
+        Find files of `file_list` with the same md5, size and encoding as an
+        earlier file of the list, or as a file in upload `index`, and mark
+        them with 'alias' in `filedata` sent to the server: path of the file
+        in this upload, or url of the uploaded file. Return {path: alias}.
+
+        The server accepts an alias by sending no upload_url for the file in
+        its response, and copies the aliased file. Files with aliases it does
+        not accept are uploaded.
+        """
+        aliases = {}
+        uploaded = {}
+        for path in file_list:
+            if path == 'datapackage.json':
+                continue
+            info = filedata[path]
+            key = digest_key(info)
+            alias = uploaded.get(key) or (index.get(self.server, info) if index else None)
+            if alias:
+                info['alias'] = aliases[path] = alias
+            else:
+                uploaded[key] = path
+        return aliases
+
+    def _get_file_info(self, path, local_path=None):
+        """
+        Return size, md5 and type of file within the data package, or of
+        `local_path` uploaded in its place.
+        """
+        generated = local_path is not None
+        local_path = local_path or join(self.datapackage.base_path, path)
         size = getsize(local_path)
-
-        file_type = 'binary/octet-stream'
-        if path.endswith('.json'):
-            file_type = 'application/json'
+        with self.profiler.span(path, 'hash', bytes=size):
+            if self.lockfile.exists() and not generated:
+                entry = self.lockfile.entry(path)
+                size, md5 = entry['size'], entry['md5']
+            else:
+                md5 = md5_file_chunk(local_path)
 
         return {
             'size': size,
             'md5': md5,
-            'type': file_type,
+            'type': self._get_file_type(path, local_path),
             'name': path
         }
 
-    def _upload_file(self, path, data):
-        '''Upload a file within the data package.'''
-        # TODO: (?) echo('Uploading resource %s' % resource.local_data_path)
+    def _get_compressed_file_info(self, path, dst):
+        """
+        Compress file within the data package into `dst`. Return file info
+        with size and md5 of the compressed file, which is what gets uploaded.
+        """
         local_path = join(self.datapackage.base_path, path)
-        filestream = open(local_path, 'rb')
-
-        response = requests.post(data['upload_url'],
-                                 data=data['upload_query'],
-                                 files={'file': filestream})
-
-        if response.status_code not in (200, 201, 204):
-            raise HTTPStatusError(
-                response,
-                message='Bitstore upload failed.\nError %s\n%s' % (response.status_code, response.content))
+        with self.profiler.span(path, 'compress', bytes=getsize(local_path)):
+            md5, size = compress_file(local_path, dst, method=self.compress)
+        return {
+            'size': size,
+            'md5': md5,
+            'type': self._get_file_type(path),
+            'encoding': ENCODINGS[self.compress],
+            'name': path
+        }
 
-    def _ensure_auth(self):
+    def _get_file_type(self, path, local_path=None):
         """
-        Get auth token from the server using credentials. Token can be used in future
-        requests to the server.
-
-        # TODO: refresh expired token
+        Return Content-Type of file within the data package, detected from
+        its resource descriptor and contents, see dpm.utils.mediatype.
         """
-        if self.token:
-            return self.token
-
-        self._ensure_config()
-        authresponse = self._apirequest(
-            method='POST',
-            url='/api/auth/token',
-            json={'username': self.username, 'secret': self.access_token})
-
-        self.token = authresponse.json().get('token')
-        if not self.token:
-            raise AuthResponseError(authresponse, 'Server did not return auth token')
-
-        return self.token
-
-    def _apirequest(self, method, url, *args, **kwargs):
+        descriptor = next((resource.descriptor for resource in self.datapackage.resources
+                           if resource.descriptor.get('path') == path), None)
+        media_type, charset = mediatype.detect(
+            local_path or join(self.datapackage.base_path, path), descriptor)
+        return mediatype.content_type(media_type, charset)
+
+    def _upload_file(self, path, data, local_path=None, file_type=None):
+        '''
+        Upload a file within the data package. If `local_path` is given, upload
+        contents of that file instead, e.g. compressed version of the file.
+        `file_type` is Content-Type of the original file.
+        '''
+        # TODO: (?) echo('Uploading resource %s' % resource.local_data_path)
+        local_path = local_path or join(self.datapackage.base_path, path)
+        size = getsize(local_path)
+        self.profiler.count('bitstore-requests')
+        with self.scheduler.upload(size), \
+                self.profiler.span(path, 'upload', bytes=size), \
+                open(local_path, 'rb') as filestream:
+            body = MultipartReader(data['upload_query'], filestream, size,
+                                   filename=basename(path),
+                                   file_type=file_type or self._get_file_type(path))
+            body.on_read = self.scheduler.consume
+            if self.hooks:
+                body.on_read = self._upload_progress(path, size)
+            response = self._send('POST', data['upload_url'], data=body,
+                                  headers={'Content-Type': body.content_type})
+
+            if response.status_code not in (200, 201, 204):
+                raise HTTPStatusError(
+                    response,
+                    message='Bitstore upload failed.\nError %s\n%s' % (response.status_code, response.content))
+
+    def _upload_progress(self, path, total):
         """
-        General request-response processing routine for dpr-api server.
-
-        :return:
-            Response -- requests.Response instance
-
+        Return read callback for upload body, which throttles the upload and
+        reports progress to the hooks.
         """
+        sent = [0]
 
-        # TODO: doing this for every request is kinda awkward
-        self._ensure_config()
-
-        if not url.startswith('http'):
-            # Relative url is given. Build absolute server url
-            url = self.server + url
-
-        methods = {
-            'POST': requests.post,
-            'PUT': requests.put,
-            'GET': requests.get,
-            'DELETE': requests.delete
-        }
-
-        headers = kwargs.pop('headers', {})
-        if self.token:
-            headers.setdefault('Auth-Token', '%s' % self.token)
-
-        response = methods.get(method)(url, *args, headers=headers, **kwargs)
-
-        try:
-            jsonresponse = response.json()
-        except Exception as e:
-            six.raise_from(
-                JSONDecodeError(response, message='Failed to decode JSON response from server'), e)
-
-        if response.status_code not in (200, 201):
-            raise HTTPStatusError(response, message='Error %s\n%s' % (
-                response.status_code,
-                jsonresponse.get('message') or jsonresponse.get('description')))
-
-        return response
+        def on_read(nbytes):
+            self.scheduler.consume(nbytes)
+            sent[0] += nbytes
+            self.hooks.on_upload_progress(path, sent[0], total, nbytes)
+        return on_read
 
     def tag(self, tag_string):
         """
         Tag datapackage on the registry server.
         """
-        self._ensure_auth()
-        response = self._apirequest(
-            method='POST',
-            url='/api/package/%s/%s/tag' % (self.username, self.datapackage.descriptor['name']),
-            json={'version': tag_string})
+        self._package_request('POST', self.datapackage.descriptor['name'], 'tag',
+                              json={'version': tag_string})
 
     def purge(self):
         """
         Purge datapackage from the registry server.
         """
         # echo('Purging %s ... ' % dp.descriptor['name'], nl=False)  # TODO: logging
-        self._ensure_auth()
-        response = self._apirequest(
-            method='DELETE',
-            url='/api/package/%s/%s/purge' % (self.username, self.datapackage.descriptor['name']))
+        self._package_request('DELETE', self.datapackage.descriptor['name'], 'purge')
 
     def delete(self):
         """
         Delete datapackage from the registry server.
         """
         # echo('Deleting %s ... ' % dp.descriptor['name'], nl=False)  # TODO: logging
-        self._ensure_auth()
-        response = self._apirequest(
-            method='DELETE',
-            url='/api/package/%s/%s' % (self.username, self.datapackage.descriptor['name']))
+        self._package_request('DELETE', self.datapackage.descriptor['name'])
 
     def undelete(self):
         """
         Undelete datapackage from the registry server.
         """
         # echo('Undeleting %s ... ' % dp.descriptor['name'], nl=False)  # TODO: logging
-        self._ensure_auth()
-        response = self._apirequest(
-            method='POST',
-            url='/api/package/%s/%s/undelete' % (self.username, self.datapackage.descriptor['name']))
+        self._package_request('POST', self.datapackage.descriptor['name'], 'undelete')
 
 
 def validate_metadata(datapackage):
@@ -326,49 +744,167 @@ def validate_metadata(datapackage):
                 'Resource at index %s and path %s does not exist on disk' % (
                     idx, resource.local_data_path)
             )
+        for _, reference, _ in foreign_keys(datapackage, resource):
+            if reference is None:
+                raise ResourceDoesNotExist(
+                    'Resource at index %s has foreign key to missing resource' % idx)
 
     return True
 
 
-def validate_data(datapackage):
+def _as_list(fields):
+    return [fields] if isinstance(fields, six.string_types) else list(fields)
+
+
+def foreign_keys(datapackage, resource):
+    """
+    Return foreign keys of the `resource` schema as a list of
+    (fields, referenced resource, referenced fields). Referenced resource is
+    None if it is missing in the datapackage. Keys referencing other
+    datapackages are skipped.
+    """
+    result = []
+    schema = resource.descriptor.get('schema') or {}
+    for foreign_key in schema.get('foreignKeys', []):
+        reference = foreign_key.get('reference', {})
+        if reference.get('datapackage'):
+            continue
+        name = reference.get('resource')
+        if name in ('', 'self', None):
+            target = resource
+        else:
+            target = next((candidate for candidate in datapackage.resources
+                           if candidate.descriptor.get('name') == name), None)
+        result.append((_as_list(foreign_key['fields']), target,
+                       _as_list(reference.get('fields', []))))
+    return result
+
+
+def validate_data(datapackage, hooks=None, memory_budget=None, row_limit=DATA_ROW_LIMIT,
+                  lock=None, resources=None, http_cache=None, reader='csv'):
+    """
+    Validate data of tabular resources of the datapackage, one table at a
+    time. See dpm.utils.validation.DataValidator for options.
+
+    If `lock` (dpm.utils.lock.Lockfile) is given, tables that are unchanged
+    and valid according to the lock are skipped, and validation status of
+    the other tables is stored in it. If `resources` paths are given, only
+    these resources are validated. Remote resources are read through
+    `http_cache` (dpm.utils.httpcache.HTTPCache), if given.
+    """
     # Start timer
     start = datetime.datetime.now()
 
-    tables = []
-    for resource in datapackage.resources:
-        is_tabular = resource.descriptor.get('format', None) == 'csv' \
-                or resource.descriptor.get('mediatype', None) == 'text/csv' \
-                or resource.local_data_path.endswith('csv')
-
-        if is_tabular:
-            path = resource.remote_data_path or resource.local_data_path
-            tables.append({
-                'source': path,
-                'stream': Stream(path, headers=1),
-                'schema': Schema(resource.descriptor['schema']),
-                'extra': {}
-            })
-    inspector = Inspector()
-
+    validator = DataValidator(row_limit=row_limit, error_limit=DATA_ERROR_LIMIT,
+                              memory_budget=memory_budget, reader=reader)
     reports = []
-    errors = []
-    for table in tables:
-        report = inspector._Inspector__inspect_table(table)
-        errors.extend(report['errors'])
-        reports.append(report)
-
-    # Stop timer
-    stop = datetime.datetime.now()
-    errors = errors[:1000]
-    report = {
-        'time': round((stop - start).total_seconds(), 3),
-        'valid': True if len(reports) == 0 else all(report['valid'] for report in reports),
-        'table-count': len(tables),
-        'error-count': sum(len(report['errors']) for report in reports),
-        'errors': errors,
-        'tables': reports,
-    }
-    return report
+    try:
+        for resource in datapackage.resources:
+            table_format = columnar.resource_format(resource.descriptor, _data_path(resource))
+            is_tabular = resource.descriptor.get('format', None) == 'csv' \
+                    or resource.descriptor.get('mediatype', None) == 'text/csv' \
+                    or (_data_path(resource) or '').endswith('csv') \
+                    or table_format is not None
+
+            if resources is not None and resource.descriptor.get('path') not in resources:
+                continue
+            if is_tabular:
+                if lock and _is_locked_valid(lock, datapackage, resource):
+                    continue
+                # Header and rows within the limit. Columnar files are read whole.
+                lines = row_limit + 1 if row_limit and not table_format else None
+                try:
+                    report = validator.validate_table(
+                        _data_path(resource, http_cache, lines),
+                        resource.descriptor.get('schema'),
+                        foreign_keys=_key_indexes(validator, datapackage, resource, http_cache),
+                        format=table_format)
+                except ValueError as e:
+                    # E.g. pyarrow is not installed.
+                    raise DataValidationError(str(e))
+                reports.append(report)
+                if lock and not resource.remote_data_path:
+                    lock.set_valid(resource.descriptor['path'], report['valid'],
+                                   _lock_references(datapackage, resource))
+                if hooks:
+                    hooks.on_validation_table_done(report)
+    finally:
+        validator.close()
+
+    return validator.report(reports, start)
+
+
+def _is_locked_valid(lock, datapackage, resource):
+    """
+    Return True if local resource and resources referenced by its foreign
+    keys are unchanged since the resource was validated.
+    """
+    if resource.remote_data_path:
+        return False
+    references = _references(datapackage, resource)
+    # Remote or missing references can change at any time.
+    if references is None:
+        return False
+    locked = lock.files.get(resource.descriptor['path'], {}).get('references', {})
+    return sorted(locked) == _lock_references(datapackage, resource) \
+        and lock.is_valid(resource.descriptor['path'])
+
+
+def _lock_references(datapackage, resource):
+    """
+    Return paths of files validation of the resource depends on: local
+    resources referenced by foreign keys and datapackage.json with the schema.
+    """
+    return sorted((_references(datapackage, resource) or []) + ['datapackage.json'])
+
+
+def _references(datapackage, resource):
+    """
+    Return paths of other local resources referenced by foreign keys of the
+    resource, or None if some reference is remote or missing.
+    """
+    paths = set()
+    for _, reference, _ in foreign_keys(datapackage, resource):
+        if reference is None or reference.remote_data_path:
+            return None
+        if reference is not resource:
+            paths.add(reference.descriptor['path'])
+    return sorted(paths)
+
+
+def _data_path(resource, http_cache=None, lines=None):
+    """
+    Return path or url of resource data. Remote data is fetched into
+    `http_cache`, only the first `lines` lines if given.
+    """
+    if resource.remote_data_path and http_cache is not None:
+        try:
+            return http_cache.fetch(resource.remote_data_path, lines=lines)
+        except requests.RequestException as e:
+            raise DataValidationError('Could not fetch %s: %s' % (resource.remote_data_path, e))
+    return resource.remote_data_path or resource.local_data_path
+
+
+def _key_indexes(validator, datapackage, resource, http_cache=None):
+    """
+    Return foreign keys of the resource with indexes of referenced keys,
+    for DataValidator.validate_table().
+    """
+    result = []
+    for fields, reference, reference_fields in foreign_keys(datapackage, resource):
+        if reference is None:
+            raise ResourceDoesNotExist('Foreign key references missing resource')
+        try:
+            index = validator.key_index(_data_path(reference, http_cache),
+                                        reference.descriptor.get('schema'), reference_fields)
+        except ValueError as e:
+            raise DataValidationError(str(e))
+        result.append({
+            'fields': fields,
+            'index': index,
+            'resource': reference.descriptor.get('name') or _data_path(reference),
+        })
+    return result
 
 
 def print_inspection_report(report, print_json=False):
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json as json_module
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from os.path import isdir, join
+
+from dpm.client import BaseClient, Client, DpmException
+from dpm.utils.click import parse_size
+from dpm.utils.gitclone import DEFAULT_CACHE_DIR, GitError, check_url, sparse_clone
+from dpm.utils.http import PooledSession
+from dpm.utils.scheduler import TransferScheduler
+from dpm.utils.uploads import UploadIndex
+
+
+class AsyncClient(BaseClient):
+    """
+    Run registry operations for many data packages concurrently.
+
+    Every operation is submitted to a shared thread pool and returns a
+    `concurrent.futures.Future`. All operations share one pooled HTTP session
+    and one auth token, so configuration, authentication and connection setup
+    are done once per run instead of once per package. Uploads of all packages
+    go through one TransferScheduler, which caps their number and bandwidth.
+
+    Operations that only need the package name (tag, delete, undelete, purge)
+    accept either a data package directory or a package name. Publish and
+    validate need a data package directory.
+
+    Client stays the blocking core and AsyncClient wraps it, not the other
+    way round: dpm supports Python 2.7, which has no asyncio, and the
+    requests stack is blocking. Request, auth and retry logic is shared
+    through BaseClient, so each operation here runs the same code as the
+    dpm command for one package, just in a worker thread.
+
+    Usage:
+        with AsyncClient(config, max_workers=8) as client:
+            futures = [client.delete(name) for name in names]
+            for future in as_completed(futures):
+                future.result()
+    """
+
+    def __init__(self, config=None, max_workers=8, max_connections=None, datavalidate=False,
+                 scheduler=None, compress=None, profiler=None, hooks=None, retries=0,
+                 dedup=False):
+        max_connections = max_connections or max_workers
+        super(AsyncClient, self).__init__(
+            config=config, session=PooledSession(max_connections=max_connections),
+            profiler=profiler, hooks=hooks, retries=retries)
+        self.datavalidate = datavalidate
+        self.compress = compress
+        self.scheduler = scheduler or TransferScheduler(
+            bandwidth=parse_size((config or {}).get('upload_rate') or 0) or None)
+        self.dedup = dedup
+        # Shared by all packages, so identical files are uploaded once per run.
+        self.upload_index = UploadIndex() if dedup else None
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._auth_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Wait for pending operations and release pooled connections.
+        """
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def _ensure_auth(self):
+        # Many workers may ask for the token at once, only one should log in.
+        with self._auth_lock:
+            return super(AsyncClient, self)._ensure_auth()
+
+    def client(self, path):
+        """
+        Return blocking Client for the data package at `path`, which shares
+        session and auth token with this AsyncClient.
+        """
+        client = Client(path, config=self.config, datavalidate=self.datavalidate,
+                        session=self.session, scheduler=self.scheduler,
+                        compress=self.compress, profiler=self.profiler,
+                        hooks=self.hooks, retries=self.retries, dedup=self.dedup,
+                        upload_index=self.upload_index)
+        client.token = self.token
+        return client
+
+    def package_name(self, target):
+        """
+        Return package name for `target`, which is either a data package
+        directory or a package name.
+        """
+        if not isdir(target):
+            return target
+        try:
+            with io.open(join(target, 'datapackage.json'), encoding='utf-8') as f:
+                return json_module.load(f)['name']
+        except (IOError, OSError, ValueError, KeyError) as e:
+            raise DpmException('Could not read package name from %s: %s' % (target, e))
+
+    def batch(self, operation, targets, *args):
+        """
+        Run `operation` (name of the AsyncClient method) for every target.
+
+        Yield (target, result, exception) tuples in the order operations
+        complete. Exception is None for successful operations.
+        """
+        futures = {}
+        for target in targets:
+            futures[getattr(self, operation)(target, *args)] = target
+        for future in as_completed(futures):
+            exception = future.exception()
+            result = None if exception else future.result()
+            yield futures[future], result, exception
+
+    def import_git(self, urls, cache_dir=DEFAULT_CACHE_DIR, clone_workers=4, validate=True):
+        """
+        Clone data package git repositories at `urls` and publish them.
+        Repositories are cloned into `cache_dir` on a pool of `clone_workers`
+        threads, and every clone is published on the pool of this client as
+        soon as it is ready. `urls` can be a lazy iterable: only a few urls
+        per worker are taken ahead. Repeated urls are imported once. Urls
+        with schemes other than gitclone.URL_SCHEMES fail with GitError.
+
+        Yield (url, result, exception) tuples in the order imports complete.
+        """
+        urls = iter(urls)
+        limit = (clone_workers + self.max_workers) * 2
+        seen = set()
+        clones = {}
+        publishes = {}
+        with ThreadPoolExecutor(max_workers=clone_workers) as cloner:
+            while True:
+                while len(clones) + len(publishes) < limit:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    if url in seen:
+                        continue
+                    seen.add(url)
+                    try:
+                        check_url(url)
+                    except GitError as e:
+                        yield url, None, e
+                        continue
+                    clones[cloner.submit(sparse_clone, url, cache_dir)] = url
+                if not clones and not publishes:
+                    return
+                done, _ = wait(list(clones) + list(publishes), return_when=FIRST_COMPLETED)
+                for future in done:
+                    exception = future.exception()
+                    if future in clones:
+                        url = clones.pop(future)
+                        if exception is None:
+                            publishes[self.publish(future.result(), validate=validate)] = url
+                            continue
+                    else:
+                        url = publishes.pop(future)
+                    yield url, None if exception else future.result(), exception
+
+    def validate(self, path):
+        return self.executor.submit(lambda: self.client(path).validate())
+
+    def publish(self, path, publisher=None, validate=True):
+        def publish():
+            self._ensure_auth()
+            return self.client(path).publish(publisher=publisher, validate=validate)
+        return self.executor.submit(publish)
+
+    def tag(self, target, tag_string):
+        return self.executor.submit(
+            lambda: self._package_request('POST', self.package_name(target), 'tag',
+                                          json={'version': tag_string}))
+
+    def purge(self, target):
+        return self.executor.submit(
+            lambda: self._package_request('DELETE', self.package_name(target), 'purge'))
+
+    def delete(self, target):
+        return self.executor.submit(
+            lambda: self._package_request('DELETE', self.package_name(target)))
+
+    def undelete(self, target):
+        return self.executor.submit(
+            lambda: self._package_request('POST', self.package_name(target), 'undelete'))
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Callbacks for monitoring client operations, and built-in metrics emitters.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import os
+import socket
+import threading
+from collections import defaultdict
+
+
+class Hooks(object):
+    """
+    Base class for client hooks. Subclass it and override the callbacks you
+    need, then register the instance on the client:
+
+        client.hooks.register(MyHooks())
+
+    Callbacks are invoked from the thread doing the work, so they should be
+    fast and thread-safe.
+    """
+
+    def on_request_start(self, method, url):
+        """ HTTP request to the registry server or bitstore is about to be sent. """
+
+    def on_request_end(self, method, url, status_code, elapsed, error=None):
+        """
+        HTTP request finished. `status_code` is None and `error` is the
+        exception if no response was received. `elapsed` is in seconds.
+        """
+
+    def on_upload_progress(self, path, sent, total, nbytes):
+        """
+        `nbytes` more bytes of file `path` were uploaded, `sent` of `total`
+        so far. Files of different packages can have the same `path`, so
+        sum `nbytes` to count uploaded bytes.
+        """
+
+    def on_validation_table_done(self, report):
+        """ Data validation of a table finished, `report` is the table report. """
+
+    def on_retry(self, method, url, attempt, error):
+        """ Request failed with `error` and is going to be retried. """
+
+
+class HookRegistry(object):
+    """
+    Dispatches client events to registered hooks. Evaluates to False when no
+    hooks are registered, so clients can skip preparing event data:
+
+        if self.hooks:
+            self.hooks.on_request_start(method, url)
+    """
+
+    def __init__(self, hooks=()):
+        self._hooks = list(hooks)
+
+    def register(self, hook):
+        self._hooks.append(hook)
+        return hook
+
+    def unregister(self, hook):
+        self._hooks.remove(hook)
+
+    def __bool__(self):
+        return bool(self._hooks)
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(self._hooks)
+
+    def on_request_start(self, *args):
+        for hook in self._hooks:
+            hook.on_request_start(*args)
+
+    def on_request_end(self, *args, **kwargs):
+        for hook in self._hooks:
+            hook.on_request_end(*args, **kwargs)
+
+    def on_upload_progress(self, *args):
+        for hook in self._hooks:
+            hook.on_upload_progress(*args)
+
+    def on_validation_table_done(self, *args):
+        for hook in self._hooks:
+            hook.on_validation_table_done(*args)
+
+    def on_retry(self, *args):
+        for hook in self._hooks:
+            hook.on_retry(*args)
+
+
+class StatsdHooks(Hooks):
+    """
+    Send metrics to statsd over UDP:
+
+        <prefix>.request.time       timer, per request
+        <prefix>.request.<status>   counter, per response status or 'error'
+        <prefix>.upload.bytes       counter
+        <prefix>.retry              counter
+        <prefix>.validation.rows    counter
+        <prefix>.validation.errors  counter
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='dpm'):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, name, value, kind):
+        packet = '%s.%s:%s|%s' % (self.prefix, name, value, kind)
+        try:
+            self._socket.sendto(packet.encode('utf-8'), self.address)
+        except (IOError, OSError):
+            # Metrics must never break the operation.
+            pass
+
+    def on_request_end(self, method, url, status_code, elapsed, error=None):
+        self._send('request.time', int(elapsed * 1000), 'ms')
+        self._send('request.%s' % (status_code or 'error'), 1, 'c')
+
+    def on_upload_progress(self, path, sent, total, nbytes):
+        self._send('upload.bytes', nbytes, 'c')
+
+    def on_validation_table_done(self, report):
+        self._send('validation.rows', report.get('row-count') or 0, 'c')
+        self._send('validation.errors', report.get('error-count') or 0, 'c')
+
+    def on_retry(self, method, url, attempt, error):
+        self._send('retry', 1, 'c')
+
+
+class PrometheusTextfileHooks(Hooks):
+    """
+    Collect metrics and write them in Prometheus text format, to be picked up
+    by node_exporter textfile collector. The file is written on flush().
+
+        dpm_request_duration_seconds  histogram by method
+        dpm_requests_total            counter by method and status
+        dpm_upload_bytes_total        counter
+        dpm_retries_total             counter
+        dpm_validated_rows_total      counter
+        dpm_validation_errors_total   counter
+    """
+    buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._histogram = defaultdict(lambda: [[0] * len(self.buckets), 0, 0])
+        self._requests = defaultdict(int)
+        self._counters = defaultdict(int)
+
+    def on_request_end(self, method, url, status_code, elapsed, error=None):
+        with self._lock:
+            counts, _, _ = histogram = self._histogram[method]
+            for idx, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    counts[idx] += 1
+            histogram[1] += elapsed
+            histogram[2] += 1
+            self._requests[(method, status_code or 'error')] += 1
+
+    def on_upload_progress(self, path, sent, total, nbytes):
+        with self._lock:
+            self._counters['dpm_upload_bytes_total'] += nbytes
+
+    def on_validation_table_done(self, report):
+        with self._lock:
+            self._counters['dpm_validated_rows_total'] += report.get('row-count') or 0
+            self._counters['dpm_validation_errors_total'] += report.get('error-count') or 0
+
+    def on_retry(self, method, url, attempt, error):
+        with self._lock:
+            self._counters['dpm_retries_total'] += 1
+
+    def render(self):
+        lines = [
+            '# HELP dpm_request_duration_seconds Latency of registry and bitstore requests.',
+            '# TYPE dpm_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for method, (counts, total, count) in sorted(self._histogram.items()):
+                for bound, value in zip(self.buckets, counts):
+                    lines.append('dpm_request_duration_seconds_bucket{method="%s",le="%s"} %s'
+                                 % (method, bound, value))
+                lines.append('dpm_request_duration_seconds_bucket{method="%s",le="+Inf"} %s'
+                             % (method, count))
+                lines.append('dpm_request_duration_seconds_sum{method="%s"} %s'
+                             % (method, total))
+                lines.append('dpm_request_duration_seconds_count{method="%s"} %s'
+                             % (method, count))
+            lines.append('# TYPE dpm_requests_total counter')
+            for (method, status), value in sorted(self._requests.items(), key=str):
+                lines.append('dpm_requests_total{method="%s",status="%s"} %s'
+                             % (method, status, value))
+            for name in ('dpm_upload_bytes_total', 'dpm_retries_total',
+                         'dpm_validated_rows_total', 'dpm_validation_errors_total'):
+                lines.append('# TYPE %s counter' % name)
+                lines.append('%s %s' % (name, self._counters[name]))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """
+        Write metrics to the file. Write to a temp file and rename, so the
+        collector never reads a partially written file.
+        """
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        with io.open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.rename(tmp_path, self.path)
+
+
+def hooks_from_url(url):
+    """
+    Create built-in metrics hook from url:
+
+        statsd://host:port[/prefix]
+        prometheus:///path/to/file.prom
+    """
+    if url.startswith('statsd://'):
+        address, _, prefix = url[len('statsd://'):].partition('/')
+        host, _, port = address.partition(':')
+        return StatsdHooks(host or 'localhost', int(port or 8125), prefix or 'dpm')
+    if url.startswith('prometheus://'):
+        return PrometheusTextfileHooks(url[len('prometheus://'):])
+    raise ValueError('Unsupported metrics url: %s. Use statsd://host:port or '
+                     'prometheus:///path/to/file.prom' % url)
@@ -80,6 +80,10 @@ def read_config(config_path=None):
                   or config.get('server') \
                   or DEFAULT_SERVER,
         'username': os.environ.get('DPM_USERNAME') or config.get('username'),
-        'access_token': os.environ.get('DPM_ACCESS_TOKEN') or config.get('access_token')
+        'access_token': os.environ.get('DPM_ACCESS_TOKEN') or config.get('access_token'),
+        # Max upload bandwidth in bytes per second, e.g. 10M. Unlimited if not set.
+        'upload_rate': os.environ.get('DPM_UPLOAD_RATE') or config.get('upload_rate'),
+        # Max size of the local cache of remote resources, e.g. 500M. 1G if not set.
+        'http_cache_size': os.environ.get('DPM_HTTP_CACHE_SIZE') or config.get('http_cache_size')
     }
 
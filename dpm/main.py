@@ -5,6 +5,14 @@
 Usage:
   dpm publish
   dpm validate
+  dpm lock
+  dpm watch
+  dpm check
+  dpm infer <file>
+  dpm fix [<dir>...]
+  dpm batch <operation>
+  dpm publish-many <dir>...
+  dpm import-git <url>...
 
 """
 from __future__ import division
@@ -12,22 +20,37 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import datetime
+import io
+import itertools
 import json as json_module
+import logging
 import os
 import sys
 from functools import wraps
 from os.path import exists, isfile, abspath
 
 import click
-import goodtables
 import requests
 from datapackage import DataPackage
-from datapackage.exceptions import ValidationError
-
-from .utils.click import echo
+from datapackage.exceptions import DataPackageException, ValidationError
+
+from .utils.click import echo, format_size, parse_size, ByteSize
+from .utils.compat import monotonic
+from .utils import infer
+from .utils.file import find_datapackages, write_json
+from .utils.fixers import FIXERS, FixCache, fix_packages
+from .utils.gitclone import DEFAULT_CACHE_DIR, read_url_list
+from .utils.linkcheck import LinkChecker
+from .utils.profile import Profiler
+from .utils.scheduler import TransferScheduler
+from .utils.validation import DataValidator
+from .utils.watch import changes, make_watcher
 from . import config
 from . import __version__
 from . import client as dprclient
+from .client.async_client import AsyncClient
+from .client.hooks import HookRegistry, hooks_from_url
 
 
 # Disable click warning. We are trying to be python3-compatible
@@ -70,9 +93,49 @@ DATAVALIDATE = True
               help='Use custom config file. Default %s' % config.configfile)
 @click.option('--debug', is_flag=True, default=False,
               help='Show debug messages')
+@click.option('--profile', is_flag=True, default=False,
+              help='Print time spent in every phase of the operation and on every file.')
+@click.option('--profile-output', type=click.Path(dir_okay=False), default=None,
+              help='Save timing report to the file.')
+@click.option('--profile-format', type=click.Choice(['json', 'chrome']), default='json',
+              help='Format of --profile-output: json report or Chrome trace events.')
+@click.option('--metrics', 'metrics_url', default=None, metavar='URL',
+              help='Export request, upload and validation metrics to '
+                   'statsd://host:port[/prefix] or prometheus:///path/to/file.prom')
+@click.option('--retries', default=0,
+              help='Retry registry requests failed with network error or 502-504 '
+                   'status this many times. Default 0.')
 @click.pass_context
-def cli(ctx, config_path, debug):
-    if ctx.invoked_subcommand in ('configure', 'datavalidate', 'help'):
+def cli(ctx, config_path, debug, profile, profile_output, profile_format, metrics_url,
+        retries):
+    if debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    hooks = ctx.meta['hooks'] = HookRegistry()
+    ctx.meta['retries'] = retries
+    if metrics_url:
+        try:
+            metrics = hooks.register(hooks_from_url(metrics_url))
+        except ValueError as e:
+            echo('[ERROR] %s\n' % str(e))
+            sys.exit(1)
+        if hasattr(metrics, 'flush'):
+            ctx.call_on_close(metrics.flush)
+
+    profiler = None
+    if profile or profile_output:
+        profiler = ctx.meta['profiler'] = Profiler()
+
+        def report_profile():
+            if profile:
+                echo('\nPROFILE', bold=True)
+                echo(profiler.format_table())
+            if profile_output:
+                profiler.dump(profile_output, format=profile_format)
+        ctx.call_on_close(report_profile)
+
+    if ctx.invoked_subcommand in ('configure', 'datavalidate', 'help', 'batch',
+                                  'publish-many', 'infer', 'check', 'import-git', 'fix'):
         # subcommand does not require Client isntance.
         return
 
@@ -81,7 +144,10 @@ def cli(ctx, config_path, debug):
         client = dprclient.Client(
             '.',
             config=config.read_config(config_path),
-            datavalidate=DATAVALIDATE)
+            datavalidate=DATAVALIDATE,
+            profiler=profiler,
+            hooks=hooks,
+            retries=retries)
     except Exception as e:
         echo('[ERROR] %s\n' % str(e))
         sys.exit(1)
@@ -104,12 +170,24 @@ def configure():
     config.prompt_config(click.get_current_context().parent.params['config_path'])
 
 
+def verify_option(f):
+    """
+    Decorator for subcommands, that adds --verify option to ignore digests and
+    validation status stored in datapackage.lock.
+    """
+    return click.option('--verify', is_flag=True, default=False,
+                        help='Recompute digests and revalidate data of all files, '
+                             'ignoring datapackage.lock.')(f)
+
+
 @cli.command()
-def validate():
+@verify_option
+def validate(verify):
     """
     Validate datapackage in the current dir. Print validation errors if found.
     """
     client = click.get_current_context().meta['client']
+    client.lockfile.verify = verify
 
     try:
         client.validate()
@@ -154,14 +232,341 @@ def undelete():
 
 
 @cli.command()
+@click.option('--limit-rate', type=ByteSize(), default=None,
+              help='Max upload bandwidth in bytes per second, e.g. 500K or 10M. '
+                   'Default: upload_rate from config, or unlimited.')
+@click.option('--compress', type=click.Choice(['gzip', 'zstd']), default=None,
+              help='Compress text resources (csv, json, ...) before upload.')
+@click.option('--convert', type=click.Choice(['parquet']), default=None,
+              help='Convert csv resources to compressed Parquet before upload. '
+                   'Requires pyarrow.')
+@click.option('--convert-mode', type=click.Choice(['add', 'replace']), default='add',
+              help='Publish converted resources in addition to csv ones (default), '
+                   'or instead of them.')
+@click.option('--dedup', is_flag=True, default=False,
+              help='Ask the server to copy files with the same content as a file '
+                   'uploaded before instead of uploading them. The server must '
+                   'support aliases.')
+@verify_option
 @echo_errors
-def publish():
+def publish(limit_rate, compress, convert, convert_mode, dedup, verify):
     """
     Publish datapackage to the registry server.
     """
     client = click.get_current_context().meta['client']
+    client.lockfile.verify = verify
+    if limit_rate:
+        client.scheduler = TransferScheduler(bandwidth=limit_rate)
+    client.compress = compress
+    client.convert = convert
+    client.convert_mode = convert_mode
+    client.dedup = dedup
     puburl = client.publish()
     echo('Datapackage successfully published. It is available at %s' % puburl)
+    echo_upload_stats(client.scheduler.stats())
+
+
+@cli.command()
+@verify_option
+@echo_errors
+def lock(verify):
+    """
+    Write datapackage.lock with size, mtime, md5, sha256 and validation status
+    of every file of the datapackage. publish and validate trust the lock for
+    unchanged files.
+    """
+    client = click.get_current_context().meta['client']
+    client.lockfile.verify = verify
+    try:
+        lockfile = client.lock()
+    except (ValidationError, dprclient.ResourceDoesNotExist) as e:
+        echo('[ERROR] %s\n' % str(e))
+        sys.exit(1)
+    echo('%s: %s files, %s updated' % (
+        os.path.basename(lockfile.path), len(lockfile.files), len(lockfile.recomputed)))
+    if any(entry.get('valid') is False for entry in lockfile.files.values()):
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, file_okay=False))
+@click.option('--fixer', 'fixers', multiple=True, type=click.Choice(list(FIXERS)),
+              help='Fixer to apply, can be repeated. Default: all.')
+@click.option('--show', is_flag=True, default=False,
+              help='Print fixed datapackage.json instead of writing it.')
+@click.option('--jobs', '-j', default=8,
+              help='Number of datapackages processed concurrently. Default 8.')
+@click.option('--no-cache', is_flag=True, default=False,
+              help='Check all datapackages, even unchanged since the last run.')
+def fix(paths, fixers, show, jobs, no_cache):
+    """
+    Fix common issues in datapackage.json of all datapackages found in PATHS,
+    current dir by default: metadata objects instead of lists, unsupported
+    date formats and number types. Files are written atomically, and files
+    unchanged since the last run are skipped.
+    """
+    dirs = list(find_datapackages(paths or ['.']))
+    if not dirs:
+        echo('[ERROR] no datapackages found.')
+        sys.exit(1)
+
+    cache = None if show or no_cache else FixCache()
+    counts = {'fixed': 0, 'unchanged': 0, 'cached': 0, 'error': 0}
+    for path, status, descriptor, error in fix_packages(dirs, fixers or tuple(FIXERS),
+                                                        cache=cache, dry_run=show,
+                                                        max_workers=jobs):
+        counts[status] += 1
+        if error is not None:
+            echo('[ERROR] %s: %s' % (path, error))
+        elif show:
+            echo(json_module.dumps(descriptor, indent=2))
+        elif status == 'fixed':
+            echo('[FIXED] %s' % path)
+    if cache is not None:
+        cache.save()
+    if not show:
+        echo('%(fixed)s fixed, %(unchanged)s unchanged, %(cached)s cached, '
+             '%(error)s errors' % counts)
+    if counts['error']:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--publisher', default=None,
+              help='Publisher of packages to check. Default: username from config.')
+@click.option('--jobs', '-j', default=16, help='Number of concurrent requests. Default 16.')
+@click.option('--per-host', default=8, help='Max concurrent requests to one host. Default 8.')
+@click.option('--timeout', default=10.0, help='Request timeout in seconds. Default 10.')
+@click.option('--link-retries', default=2,
+              help='Retries of failed or 5xx requests of every link. Default 2.')
+@click.option('--json', 'print_json', is_flag=True, default=False,
+              help='Print results as json lines.')
+@click.argument('urls', nargs=-1)
+@echo_errors
+def check(publisher, jobs, per_host, timeout, link_retries, print_json, urls):
+    """
+    Check that pages of published packages, or given URLS, respond with 2xx
+    status. Results are printed as they arrive. Exit code is 1 if some link
+    is broken.
+    """
+    ctx = click.get_current_context()
+    if not urls:
+        client = dprclient.BaseClient(
+            config=config.read_config(ctx.parent.params['config_path']),
+            hooks=ctx.meta['hooks'], retries=ctx.meta['retries'])
+        urls = (client.package_url(name, publisher)
+                for name in client.iter_packages(publisher))
+
+    checker = LinkChecker(max_workers=jobs, per_host=per_host, timeout=timeout,
+                          retries=link_retries)
+    counts = {'ok': 0, 'broken': 0}
+    for result in checker.check_all(urls):
+        counts['ok' if result['ok'] else 'broken'] += 1
+        if print_json:
+            echo(json_module.dumps(result))
+        elif result['ok']:
+            echo('OK     %s' % result['url'])
+        else:
+            echo('BROKEN %s (%s)' % (result['url'], result['status'] or result['error']))
+    if not print_json:
+        echo('\n%(ok)s ok, %(broken)s broken' % counts)
+    if counts['broken']:
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('--publish', 'republish', is_flag=True, default=False,
+              help='Publish changed files when the datapackage is valid.')
+@click.option('--debounce', default=1.0,
+              help='Wait until there are no changes for this many seconds. Default 1.')
+@click.option('--poll', is_flag=True, default=False,
+              help='Poll files for changes instead of using inotify.')
+@click.option('--interval', default=1.0,
+              help='Seconds between polls. Default 1.')
+@echo_errors
+def watch(republish, debounce, poll, interval):
+    """
+    Watch datapackage in the current dir. Validate resources when they or
+    datapackage.json are changed, and optionally publish changed files.
+    """
+    client = click.get_current_context().meta['client']
+    watcher = make_watcher(client.datapackage.base_path, polling=poll, interval=interval)
+    echo('Watching %s for changes (%s). Press Ctrl+C to stop.' % (
+        client.datapackage.base_path, type(watcher).__name__))
+    try:
+        for changed in changes(watcher, debounce=debounce):
+            watch_update(client, changed, republish)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def watch_update(client, changed, republish=False):
+    """
+    Validate resources affected by `changed` files and publish the changed
+    files if `republish` is True. Return True if the datapackage is valid.
+    Changes of other published files, e.g. README.md, are only published.
+    Affected resources are published too, so resources added or changed in
+    datapackage.json are uploaded with it.
+    """
+    echo('\nChanged: %s' % ', '.join(sorted(changed)))
+    try:
+        resources = client.affected_resources(changed)
+        if resources or 'datapackage.json' in changed:
+            client.validate(resources=resources)
+            echo('Valid: %s' % (', '.join(resources) or 'datapackage.json'))
+        if republish and set(changed) & set(client.file_list()):
+            puburl = client.publish(validate=False, files=set(changed) | set(resources))
+            echo('Published %s' % puburl)
+    except dprclient.DataValidationError as e:
+        echo(str(e))
+        return False
+    except (ValidationError, DataPackageException, dprclient.DpmException, ValueError,
+            requests.ConnectionError) as e:
+        # Keep watching, the next change may fix it.
+        echo('[ERROR] %s' % str(e))
+        return False
+    return True
+
+
+def echo_upload_stats(stats):
+    """
+    Print upload statistics collected by TransferScheduler.
+    """
+    message = 'Uploaded %s files (%s) in %.1fs' % (
+        stats['files'], format_size(stats['bytes']), stats['time'])
+    if stats['bytes-per-second']:
+        message += ', %s/s' % format_size(stats['bytes-per-second'])
+    if stats['bandwidth-limit']:
+        message += ', limited to %s/s, throttled for %.1fs' % (
+            format_size(stats['bandwidth-limit']), stats['throttle-time'])
+    if stats['queue-time']:
+        message += ', queued for %.1fs' % stats['queue-time']
+    if stats['skipped-files']:
+        message += ', skipped %s duplicate files (%s)' % (
+            stats['skipped-files'], format_size(stats['skipped-bytes']))
+    echo(message)
+
+
+@cli.command('publish-many')
+@click.argument('paths', nargs=-1, required=True,
+                type=click.Path(exists=True, file_okay=False))
+@click.option('--jobs', '-j', default=4,
+              help='Number of datapackages processed concurrently. Default 4.')
+@click.option('--max-uploads', type=int, default=None,
+              help='Max number of concurrent file uploads. Default: unlimited.')
+@click.option('--limit-rate', type=ByteSize(), default=None,
+              help='Max total upload bandwidth in bytes per second, e.g. 500K or 10M. '
+                   'Default: upload_rate from config, or unlimited.')
+@click.option('--compress', type=click.Choice(['gzip', 'zstd']), default=None,
+              help='Compress text resources (csv, json, ...) before upload.')
+@click.option('--dedup', is_flag=True, default=False,
+              help='Ask the server to copy files with the same content as a file '
+                   'uploaded before instead of uploading them. The server must '
+                   'support aliases.')
+@echo_errors
+def publish_many(paths, jobs, max_uploads, limit_rate, compress, dedup):
+    """
+    Publish all datapackages found in PATHS to the registry server.
+    Datapackages are validated first, and only valid ones are published.
+    """
+    config_path = click.get_current_context().parent.params['config_path']
+    try:
+        conf = config.read_config(config_path)
+    except Exception as e:
+        echo('[ERROR] %s\n' % str(e))
+        sys.exit(1)
+
+    dirs = list(find_datapackages(paths))
+    if not dirs:
+        echo('[ERROR] no datapackages found.')
+        sys.exit(1)
+
+    start = monotonic()
+    scheduler = TransferScheduler(
+        max_uploads=max_uploads,
+        bandwidth=limit_rate or parse_size(conf.get('upload_rate') or 0) or None)
+    failed = 0
+    meta = click.get_current_context().meta
+    with AsyncClient(conf, max_workers=jobs, datavalidate=DATAVALIDATE,
+                     scheduler=scheduler, compress=compress, profiler=meta.get('profiler'),
+                     hooks=meta.get('hooks'), retries=meta.get('retries', 0),
+                     dedup=dedup) as client:
+        echo('Validating %s datapackages ...' % len(dirs))
+        valid = []
+        for path, _, error in client.batch('validate', dirs):
+            if error is None:
+                valid.append(path)
+            else:
+                failed += 1
+                echo('[ERROR] %s: %s' % (path, error))
+
+        echo('Publishing %s datapackages ...' % len(valid))
+        for path, url, error in client.batch('publish', valid, None, False):
+            if error is None:
+                echo('[OK] %s: %s' % (path, url))
+            else:
+                failed += 1
+                echo('[ERROR] %s: %s' % (path, getattr(error, 'message', None) or error))
+
+    elapsed = max(monotonic() - start, 1e-6)
+    published = len(dirs) - failed
+    echo('\nPublished %s of %s datapackages in %.1fs (%.1f packages/min, %.2f MB/s)' % (
+        published, len(dirs), elapsed,
+        published * 60 / elapsed, scheduler.bytes / elapsed / 1024 / 1024))
+    echo_upload_stats(scheduler.stats())
+    if failed:
+        sys.exit(1)
+
+
+@cli.command('import-git')
+@click.argument('urls', nargs=-1)
+@click.option('--from', 'url_list', default=None, metavar='FILE',
+              help='Read git urls, one per line, from a file, http(s) url, or - for stdin.')
+@click.option('--jobs', '-j', default=4,
+              help='Number of datapackages published concurrently. Default 4.')
+@click.option('--clone-jobs', default=4,
+              help='Number of repositories cloned concurrently. Default 4.')
+@click.option('--cache-dir', default=DEFAULT_CACHE_DIR,
+              help='Directory of repository clones, reused by later imports. '
+                   'Default %s' % DEFAULT_CACHE_DIR)
+@echo_errors
+def import_git(urls, url_list, jobs, clone_jobs, cache_dir):
+    """
+    Clone datapackages from git repositories at URLS and publish them.
+    Only datapackage.json, readme and resources are cloned, and clones are
+    kept in the cache dir to be updated with git fetch next time.
+    """
+    if url_list:
+        urls = itertools.chain(urls, read_url_list(url_list))
+    elif not urls:
+        echo('[ERROR] no git urls given.')
+        sys.exit(1)
+
+    config_path = click.get_current_context().parent.params['config_path']
+    try:
+        conf = config.read_config(config_path)
+    except Exception as e:
+        echo('[ERROR] %s\n' % str(e))
+        sys.exit(1)
+
+    imported = failed = 0
+    meta = click.get_current_context().meta
+    with AsyncClient(conf, max_workers=jobs, datavalidate=DATAVALIDATE,
+                     profiler=meta.get('profiler'), hooks=meta.get('hooks'),
+                     retries=meta.get('retries', 0)) as client:
+        for url, puburl, error in client.import_git(urls, cache_dir=cache_dir,
+                                                    clone_workers=clone_jobs):
+            if error is None:
+                imported += 1
+                echo('[OK] %s: %s' % (url, puburl))
+            else:
+                failed += 1
+                echo('[ERROR] %s: %s' % (url, getattr(error, 'message', None) or error))
+    echo('\nImported %s of %s datapackages' % (imported, imported + failed))
+    if failed:
+        sys.exit(1)
 
 
 @cli.command()
@@ -177,19 +582,103 @@ def tag(tag_string):
 
 
 
+@cli.command()
+@click.argument('operation', type=click.Choice(['tag', 'delete', 'undelete', 'purge']))
+@click.option('--file', 'targets', type=click.File('r'), default='-',
+              help='File with package names or datapackage dirs, one per line. '
+                   'Default: read from stdin.')
+@click.option('--tag', 'tag_string', help='Tag to assign when OPERATION is tag.')
+@click.option('--jobs', '-j', default=8, help='Number of concurrent operations. Default 8.')
+@click.option('--json', 'print_json', is_flag=True, default=False,
+              help='Print json report instead of human-readable.')
+@echo_errors
+def batch(operation, targets, tag_string, jobs, print_json):
+    """
+    Run OPERATION for many datapackages on the registry server. Datapackages are
+    given by name or by path to the datapackage dir, one per line.
+    """
+    if operation == 'tag' and not tag_string:
+        echo('[ERROR] --tag is required for tag operation.')
+        sys.exit(1)
+    args = (tag_string,) if operation == 'tag' else ()
+
+    config_path = click.get_current_context().parent.params['config_path']
+    try:
+        conf = config.read_config(config_path)
+    except Exception as e:
+        echo('[ERROR] %s\n' % str(e))
+        sys.exit(1)
+
+    targets = (line.strip() for line in targets)
+    results = []
+    meta = click.get_current_context().meta
+    with AsyncClient(conf, max_workers=jobs, hooks=meta.get('hooks'),
+                     retries=meta.get('retries', 0)) as client:
+        for target, _, error in client.batch(operation, filter(None, targets), *args):
+            message = None
+            if error is not None:
+                message = getattr(error, 'message', None) or str(error) or repr(error)
+            results.append({'target': target, 'ok': error is None, 'error': message})
+            if print_json:
+                continue
+            if error is None:
+                echo('[OK] %s' % target)
+            else:
+                echo('[ERROR] %s: %s' % (target, message))
+
+    failed = len([result for result in results if not result['ok']])
+    summary = {
+        'operation': operation,
+        'total': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+    }
+    if print_json:
+        echo(json_module.dumps(dict(summary, results=results), indent=4))
+    else:
+        echo('\n%(operation)s: %(succeeded)s succeeded, %(failed)s failed' % summary)
+    if failed:
+        sys.exit(1)
+
+
+def sample_options(f):
+    """
+    Decorator for subcommands, that adds options of schema inference sample.
+    """
+    f = click.option('--sample-head', default=infer.DEFAULT_HEAD_ROWS,
+                     help='Rows from the start of the file to infer schema from. '
+                          'Default %s.' % infer.DEFAULT_HEAD_ROWS)(f)
+    f = click.option('--sample-blocks', default=infer.DEFAULT_BLOCKS,
+                     help='Blocks of rows at random offsets to infer schema from. '
+                          'Default %s.' % infer.DEFAULT_BLOCKS)(f)
+    f = click.option('--sample-block-rows', default=infer.DEFAULT_BLOCK_ROWS,
+                     help='Rows in every random block. '
+                          'Default %s.' % infer.DEFAULT_BLOCK_ROWS)(f)
+    return f
+
+
 @cli.command()
 @click.option('--json', 'print_json', is_flag=True, default=False,
               help='Print raw json report instead of human-readable.')
+@sample_options
+@click.option('--row-limit', default=dprclient.DATA_ROW_LIMIT,
+              help='Number of rows to validate in every table, 0 for all rows. '
+                   'Default %s.' % dprclient.DATA_ROW_LIMIT)
+@click.option('--memory-budget', type=ByteSize(), default=None,
+              help='Memory for duplicate row and unique value checks of a table, '
+                   'e.g. 512M. Default: unlimited.')
+@click.option('--reader', type=click.Choice(['csv', 'mmap']), default='csv',
+              help='Csv reader: tabulator parser (default), or memory-mapped reader, '
+                   'faster for big local files.')
 @click.argument('filepath', type=click.Path(exists=True), required=False)
-def datavalidate(filepath, print_json):
+def datavalidate(filepath, print_json, sample_head, sample_blocks, sample_block_rows,
+                 row_limit, memory_budget, reader):
     """
     Validate csv file data, given its path. Print validation report. If the file is
     a resource of the datapackage in current dir, will use datapackage.json schema for
     validation; otherwise infer the schema automatically.
     If no file path is given, validate all resources data in datapackage.json.
     """
-    inspector = goodtables.Inspector(infer_schema=True)
-
     if exists('datapackage.json'):
         dp = DataPackage('datapackage.json')
     else:
@@ -209,17 +698,60 @@ def datavalidate(filepath, print_json):
                     schema = resource.descriptor.get('schema')
                     break
 
-        report = inspector.inspect(filepath, schema=schema)
+        start = datetime.datetime.now()
+        if schema is None:
+            schema = infer.infer_schema(filepath, head=sample_head, blocks=sample_blocks,
+                                        block_rows=sample_block_rows)
+        validator = DataValidator(row_limit=row_limit, memory_budget=memory_budget,
+                                  reader=reader)
+        report = validator.report([validator.validate_table(filepath, schema)], start)
     else:
         # Validate whole datapackage
         dprclient.validate_metadata(dp)
-        report = dprclient.validate_data(dp)
+        hooks = click.get_current_context().meta.get('hooks')
+        report = dprclient.validate_data(dp, hooks=hooks, memory_budget=memory_budget,
+                                         row_limit=row_limit, reader=reader)
 
     dprclient.print_inspection_report(report, print_json)
     if not report['valid']:
         sys.exit(1)
 
 
+@cli.command('infer')
+@sample_options
+@click.option('--write', is_flag=True, default=False,
+              help='Save schema to the resource in datapackage.json of current dir. '
+                   'Add the resource if it is missing.')
+@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+def infer_command(filepath, sample_head, sample_blocks, sample_block_rows, write):
+    """
+    Infer schema of csv file from a sample of rows: the first rows and blocks of
+    rows at random offsets. Print the schema.
+    """
+    schema = infer.infer_schema(filepath, head=sample_head, blocks=sample_blocks,
+                                block_rows=sample_block_rows)
+    echo(json_module.dumps(schema, indent=2))
+    if not write:
+        return
+
+    if not exists('datapackage.json'):
+        echo('[ERROR] no datapackage.json in current dir.')
+        sys.exit(1)
+    with io.open('datapackage.json', encoding='utf-8') as f:
+        descriptor = json_module.load(f)
+    path = os.path.relpath(filepath).replace(os.sep, '/')
+    resources = descriptor.setdefault('resources', [])
+    for resource in resources:
+        if os.path.normpath(resource.get('path', '')) == os.path.normpath(path):
+            resource['schema'] = schema
+            break
+    else:
+        name = os.path.splitext(os.path.basename(path))[0].lower()
+        resources.append({'name': name, 'path': path, 'schema': schema})
+    write_json('datapackage.json', descriptor)
+    echo('Schema saved to datapackage.json')
+
+
 
 if __name__ == '__main__':
     cli()
@@ -10,6 +10,7 @@ from __future__ import unicode_literals
 
 import re
 import click
+import six
 
 
 def echo(message, nl=True, **kwargs):
@@ -26,3 +27,48 @@ def echo(message, nl=True, **kwargs):
             click.secho(x, **dict(kwargs, nl=False))
     click.echo('', nl=nl)  # new line
 
+
+
+SIZE_SUFFIXES = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """
+    Parse human-readable size like 512, 10K, 1.5M or 2G into number of bytes.
+    Suffixes are powers of 1024, optional trailing 'B' is ignored.
+    """
+    if isinstance(value, six.integer_types):
+        return value
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', value, re.IGNORECASE)
+    if not match:
+        raise ValueError('Invalid size: %s' % value)
+    number, suffix = match.groups()
+    return int(float(number) * SIZE_SUFFIXES[suffix.upper()])
+
+
+def format_size(nbytes):
+    """
+    Format number of bytes as human-readable size, e.g. 1.5M.
+    """
+    for suffix in ('', 'K', 'M', 'G'):
+        if abs(nbytes) < 1024:
+            break
+        nbytes /= 1024
+    else:
+        suffix = 'T'
+    if suffix:
+        return '%.1f%s' % (nbytes, suffix)
+    return '%d' % nbytes
+
+
+class ByteSize(click.ParamType):
+    """
+    Click parameter type for sizes like 10M, see parse_size().
+    """
+    name = 'size'
+
+    def convert(self, value, param, ctx):
+        try:
+            return parse_size(value)
+        except ValueError:
+            self.fail('%s is not a valid size, use e.g. 512K or 10M' % value, param, ctx)
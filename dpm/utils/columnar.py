@@ -0,0 +1,614 @@
+# -*- coding: utf-8 -*-
+"""
+Validation of columnar tables, Parquet and Arrow IPC files, against table
+schema without parsing rows.
+
+Header and types are checked against the column metadata of the file. For
+Parquet files, required, minimum and maximum constraints are first checked
+against the statistics of row groups, and a column is read only if the
+statistics can not rule out a violation. Other checks run on whole columns
+with numpy. Arrow files are memory-mapped, so reading them costs no copies.
+
+csv_to_parquet() converts csv tables to Parquet for publishing.
+
+Requires the optional pyarrow and numpy packages.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import json
+import os
+import re
+import sys
+
+import requests
+from goodtables.spec import spec
+from jsontableschema import Schema
+from six.moves.urllib.parse import urlsplit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Media types of columnar formats.
+MEDIA_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+EXTENSIONS = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+NUMERIC_TYPES = ('integer', 'number')
+# Default trueValues and falseValues of table schema.
+TRUE_VALUES = ['true', 'True', 'TRUE', '1']
+FALSE_VALUES = ['false', 'False', 'FALSE', '0']
+# Oldest versions with the features used here, e.g. csv encoding in pyarrow
+# and unpackbits() bitorder in numpy. Both need Python 3.5 or later.
+MIN_VERSIONS = {'numpy': (1, 17), 'pyarrow': (1, 0)}
+# Bytes of csv parsed at a time, and rows in every Parquet row group
+# written by csv_to_parquet().
+BLOCK_SIZE = 4 * 1024 * 1024
+ROW_GROUP_ROWS = 128 * 1024
+
+
+def table_format(path):
+    """
+    Return columnar format of the file at `path` (path or url) by its
+    extension, or None.
+    """
+    if not path:
+        return None
+    if '://' in path:
+        path = urlsplit(path).path
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def resource_format(descriptor, path=None):
+    """
+    Return columnar format of a resource from its `descriptor` format or
+    mediatype, or from extension of the data `path`. None for other formats.
+    """
+    format = (descriptor.get('format') or '').lower()
+    if format in MEDIA_TYPES:
+        return format
+    for name, media_type in MEDIA_TYPES.items():
+        if descriptor.get('mediatype') == media_type:
+            return name
+    return table_format(path)
+
+
+def _version(module):
+    return tuple(int(part) for part in re.findall(r'\d+', module.__version__)[:2])
+
+
+def _require():
+    if sys.version_info < (3, 5):
+        raise ValueError('Parquet and Arrow tables require Python 3.5 or later')
+    # pyarrow can not be imported without numpy either, so check it first.
+    for name, module in (('numpy', numpy), ('pyarrow', pyarrow)):
+        if module is None or _version(module) < MIN_VERSIONS[name]:
+            version = '.'.join(str(part) for part in MIN_VERSIONS[name])
+            raise ValueError(
+                'Parquet and Arrow tables require the %s package, version %s or later. '
+                'Install it with: pip install "%s>=%s"' % (name, version, name, version))
+
+
+def _compatible(field_type, arrow_type):
+    """
+    Return True if values of `arrow_type` can be values of table schema
+    `field_type`.
+    """
+    types = pyarrow.types
+    if types.is_null(arrow_type):
+        return True
+    if types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if field_type == 'integer':
+        return types.is_integer(arrow_type)
+    if field_type == 'number':
+        return types.is_integer(arrow_type) or types.is_floating(arrow_type) \
+            or types.is_decimal(arrow_type)
+    if field_type == 'boolean':
+        return types.is_boolean(arrow_type)
+    if field_type in ('date', 'datetime'):
+        return types.is_date(arrow_type) or types.is_timestamp(arrow_type)
+    if field_type == 'time':
+        return types.is_time(arrow_type)
+    if field_type in ('object', 'array', 'geojson'):
+        return types.is_string(arrow_type) or types.is_struct(arrow_type) \
+            or types.is_list(arrow_type) or types.is_map(arrow_type)
+    if field_type == 'string':
+        return types.is_string(arrow_type) or types.is_large_string(arrow_type)
+    # any, geopoint, duration...
+    return True
+
+
+class ColumnarTable(object):
+    """
+    Parquet or Arrow IPC file at `source`, path or url. Local files are
+    memory-mapped, remote ones are downloaded into memory.
+    """
+
+    def __init__(self, source, format):
+        _require()
+        self.source = source
+        self.format = format
+        if '://' in source:
+            response = requests.get(source)
+            response.raise_for_status()
+            self._file = pyarrow.BufferReader(response.content)
+        else:
+            self._file = pyarrow.memory_map(source[len('file://'):]
+                                            if source.startswith('file://') else source)
+        if format == 'parquet':
+            self._parquet = pyarrow.parquet.ParquetFile(self._file)
+            self.schema = self._parquet.schema.to_arrow_schema()
+            self.num_rows = self._parquet.metadata.num_rows
+        else:
+            self._reader = pyarrow.ipc.open_file(self._file)
+            self.schema = self._reader.schema
+            self.num_rows = sum(self._reader.get_batch(i).num_rows
+                                for i in range(self._reader.num_record_batches))
+        self.headers = list(self.schema.names)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _groups(self, row_limit=None):
+        """
+        Return count of row groups or record batches holding the first
+        `row_limit` rows.
+        """
+        if self.format == 'parquet':
+            sizes = [self._parquet.metadata.row_group(i).num_rows
+                     for i in range(self._parquet.num_row_groups)]
+        else:
+            sizes = [self._reader.get_batch(i).num_rows
+                     for i in range(self._reader.num_record_batches)]
+        rows = 0
+        for count, size in enumerate(sizes, start=1):
+            rows += size
+            if row_limit and rows >= row_limit:
+                return count
+        return len(sizes)
+
+    def statistics(self, name, row_limit=None):
+        """
+        Return (null count, min, max) of column `name` over row groups with
+        the first `row_limit` rows from Parquet metadata, or None if they
+        are not available.
+        """
+        if self.format != 'parquet':
+            return None
+        nulls, low, high = 0, None, None
+        for i in range(self._groups(row_limit)):
+            group = self._parquet.metadata.row_group(i)
+            columns = [group.column(j) for j in range(group.num_columns)]
+            column = next((column for column in columns if column.path_in_schema == name), None)
+            stats = column.statistics if column is not None else None
+            if stats is None or stats.null_count is None or not stats.has_min_max:
+                return None
+            nulls += stats.null_count
+            low = stats.min if low is None else min(low, stats.min)
+            high = stats.max if high is None else max(high, stats.max)
+        return nulls, low, high
+
+    def read(self, columns, row_limit=None):
+        """
+        Return pyarrow.Table of `columns` in the first `row_limit` rows.
+        """
+        groups = self._groups(row_limit)
+        if self.format == 'parquet' and groups == self._parquet.num_row_groups:
+            table = self._parquet.read(columns=columns)
+        elif self.format == 'parquet':
+            table = pyarrow.concat_tables([self._parquet.read_row_group(i, columns=columns)
+                                           for i in range(groups)])
+        else:
+            batches = [self._reader.get_batch(i) for i in range(groups)]
+            table = pyarrow.Table.from_batches(batches, schema=self.schema)
+            table = pyarrow.Table.from_arrays([table.column(name) for name in columns],
+                                              names=list(columns))
+        if row_limit and table.num_rows > row_limit:
+            table = table.slice(0, row_limit)
+        return table
+
+
+def _null_mask(column):
+    """
+    Return numpy bool array, True for null values of pyarrow.ChunkedArray.
+    """
+    masks = []
+    for chunk in column.chunks:
+        validity = chunk.buffers()[0]
+        if not chunk.null_count or validity is None:
+            masks.append(numpy.full(len(chunk), chunk.null_count > 0, dtype=bool))
+            continue
+        bits = numpy.unpackbits(numpy.frombuffer(validity, dtype=numpy.uint8),
+                                bitorder='little')
+        masks.append(bits[chunk.offset:chunk.offset + len(chunk)] == 0)
+    return numpy.concatenate(masks) if masks else numpy.zeros(0, dtype=bool)
+
+
+def _values(column):
+    """
+    Return numpy array of values of pyarrow.ChunkedArray. Values of null
+    rows are undefined.
+    """
+    arrays = []
+    for chunk in column.chunks:
+        if pyarrow.types.is_dictionary(chunk.type):
+            chunk = chunk.dictionary_decode()
+        arrays.append(chunk.to_numpy(zero_copy_only=False))
+    return numpy.concatenate(arrays) if arrays else numpy.zeros(0)
+
+
+def _codes(values, nulls):
+    """
+    Return int array with equal codes for equal values, -1 for nulls.
+    """
+    codes = numpy.full(len(values), -1, dtype=numpy.int64)
+    present = values[~nulls]
+    try:
+        _, inverse = numpy.unique(present, return_inverse=True)
+    except TypeError:
+        # Nested values, e.g. lists, are not orderable.
+        _, inverse = numpy.unique(
+            numpy.array([json.dumps(value, sort_keys=True, default=str) for value in present]),
+            return_inverse=True)
+    codes[~nulls] = inverse
+    return codes
+
+
+def _duplicates(codes, rows):
+    """
+    Yield (row, first row) for `rows` whose `codes` (one array per column)
+    equal codes of an earlier row.
+    """
+    if not len(rows):
+        return
+    codes = numpy.vstack([column[rows] for column in codes])
+    # lexsort is stable, so rows of equal keys stay in order.
+    order = numpy.lexsort(codes[::-1])
+    ordered = codes[:, order]
+    same = numpy.concatenate([[False], (ordered[:, 1:] == ordered[:, :-1]).all(axis=0)])
+    group = numpy.cumsum(~same) - 1
+    firsts = order[numpy.flatnonzero(~same)][group]
+    for position in numpy.flatnonzero(same):
+        yield int(rows[order[position]]), int(rows[firsts[position]])
+
+
+def _error(code, row, column_number, message=None, **kwargs):
+    return {
+        'code': code,
+        'message': message or spec['errors'][code]['message'].format(
+            row_number=_row_number(row), column_number=column_number, **kwargs),
+        'row-number': _row_number(row),
+        'column-number': column_number,
+        'row': None,
+    }
+
+
+def _row_number(row):
+    # Rows are numbered as in csv tables, where row 1 is the header.
+    return None if row is None else row + 2
+
+
+def _header_errors(headers, fields):
+    for number, name in enumerate(headers, start=1):
+        if number > len(fields):
+            yield _error('extra-header', None, number)
+        elif fields[number - 1].name != name:
+            yield _error('non-matching-header', None, number,
+                         field_name='"%s"' % fields[number - 1].name)
+    for number in range(len(headers) + 1, len(fields) + 1):
+        yield _error('missing-header', None, number)
+
+
+def _type_errors(table, fields):
+    for number, (name, field) in enumerate(zip(table.headers, fields), start=1):
+        arrow_type = table.schema.field(name).type
+        if field.name == name and not _compatible(field.type, arrow_type):
+            message = 'Column %s has values of type %s, not castable to %s' % (
+                number, arrow_type, field.type)
+            yield _error('non-castable-value', None, number, message)
+
+
+def _constraint_limit(field, name):
+    value = field.constraints.get(name)
+    if value is None or field.type not in NUMERIC_TYPES:
+        return None
+    return float(value)
+
+
+def _needs_data(table, field, row_limit):
+    """
+    Return True if checks of the `field` column need its values, i.e.
+    Parquet statistics can not show the column is valid.
+    """
+    constraints = field.constraints
+    if constraints.get('unique') or constraints.get('enum') is not None:
+        return True
+    limits = [_constraint_limit(field, 'minimum'), _constraint_limit(field, 'maximum')]
+    if not constraints.get('required') and limits == [None, None]:
+        return False
+    stats = table.statistics(field.name, row_limit)
+    if stats is None:
+        return True
+    nulls, low, high = stats
+    if constraints.get('required') and nulls:
+        return True
+    if limits[0] is not None and (low is None or low < limits[0]):
+        return True
+    if limits[1] is not None and (high is None or high > limits[1]):
+        return True
+    return False
+
+
+def _column_errors(number, field, values, nulls, error_limit):
+    """
+    Yield required, minimum, maximum and enum errors of a column.
+    """
+    constraints = field.constraints
+    if constraints.get('required'):
+        for row in numpy.flatnonzero(nulls)[:error_limit]:
+            yield _error('required-constraint', row, number)
+    numeric = field.type in NUMERIC_TYPES and values.dtype.kind in 'iuf'
+    for name, fails in (('minimum', numpy.less), ('maximum', numpy.greater)):
+        limit = _constraint_limit(field, name)
+        if limit is None or not numeric:
+            continue
+        with numpy.errstate(invalid='ignore'):
+            failed = fails(values, limit) & ~nulls
+        for row in numpy.flatnonzero(failed)[:error_limit]:
+            yield _error('%s-constraint' % name, row, number, value=values[row],
+                         constraint=constraints[name])
+    enum = constraints.get('enum')
+    if enum is not None and (numeric or field.type in ('string', 'boolean')):
+        allowed = [field.cast_value(value, skip_constraints=True) for value in enum]
+        failed = ~numpy.isin(values, numpy.array(allowed, dtype=values.dtype)) & ~nulls
+        for row in numpy.flatnonzero(failed)[:error_limit]:
+            yield _error('enumerable-constraint', row, number, value=values[row],
+                         constraint=', '.join('%s' % value for value in enum))
+
+
+def _foreign_key_errors(rows, foreign_keys, headers, fields_by_name, error_limit):
+    """
+    Yield foreign-key errors of `rows`, dict of column name to values list.
+    """
+    from .validation import key_fingerprint
+    for foreign_key in foreign_keys or []:
+        names = foreign_key['fields']
+        if any(name not in rows for name in names):
+            continue
+        key_fields = [fields_by_name.get(name) for name in names]
+        found = 0
+        for row, values in enumerate(zip(*[rows[name] for name in names])):
+            if any(value in (None, '') for value in values):
+                continue
+            if key_fingerprint(key_fields, values) not in foreign_key['index']:
+                numbers = [headers.index(name) + 1 for name in names]
+                message = 'Row %s has foreign key violation in columns %s: %s not found in %s' % (
+                    _row_number(row), ', '.join(str(number) for number in numbers),
+                    ', '.join('%s' % value for value in values), foreign_key['resource'])
+                yield _error('foreign-key', row, numbers[0], message)
+                found += 1
+                if found >= error_limit:
+                    break
+
+
+def validate_table(source, schema=None, format=None, row_limit=None, error_limit=1000,
+                   foreign_keys=None, duplicate_rows=False):
+    """
+    Validate Parquet or Arrow table at `source` against `schema` descriptor
+    and `foreign_keys` (see dpm.utils.validation.ForeignKeyCheck). Return
+    table report as goodtables does for csv tables. duplicate-row check
+    reads every column, so it runs only with `duplicate_rows`.
+    """
+    start = datetime.datetime.now()
+    format = format or table_format(source)
+    schema = Schema(schema) if schema else None
+    fields = schema.fields if schema else []
+    errors = []
+    with ColumnarTable(source, format) as table:
+        row_count = min(table.num_rows, row_limit) if row_limit else table.num_rows
+        errors.extend(_header_errors(table.headers, fields))
+        errors.extend(_type_errors(table, fields))
+        # Fields matching columns by position, as goodtables does.
+        matched = [(number, field) for number, (name, field)
+                   in enumerate(zip(table.headers, fields), start=1) if field.name == name]
+        fields_by_name = dict((field.name, field) for _, field in matched)
+        primary_key = schema.primary_key if schema else []
+        key_names = set(primary_key or [])
+        for foreign_key in foreign_keys or []:
+            key_names.update(foreign_key['fields'])
+
+        names = [field.name for _, field in matched
+                 if _needs_data(table, field, row_limit) or field.name in key_names]
+        data = table.read(table.headers if duplicate_rows else names, row_limit)
+        columns = dict((name, (_values(data.column(name)), _null_mask(data.column(name))))
+                       for name in data.column_names)
+
+        for number, field in matched:
+            if field.name in columns:
+                values, nulls = columns[field.name]
+                errors.extend(_column_errors(number, field, values, nulls, error_limit))
+                if field.constraints.get('unique'):
+                    rows = numpy.flatnonzero(~nulls)
+                    for row, first in _duplicates([_codes(values, nulls)], rows):
+                        errors.append(_error('unique-constraint', row, number,
+                                             row_numbers='%s, %s' % (_row_number(first),
+                                                                     _row_number(row))))
+
+        codes = dict((name, _codes(*columns[name])) for name in columns)
+        if duplicate_rows and table.headers:
+            for row, first in _duplicates([codes[name] for name in table.headers],
+                                          numpy.arange(row_count)):
+                errors.append(_error('duplicate-row', row, None,
+                                     row_numbers=_row_number(first)))
+        if primary_key and all(name in codes for name in primary_key):
+            present = ~numpy.any([columns[name][1] for name in primary_key], axis=0)
+            positions = [str(table.headers.index(name) + 1) for name in primary_key]
+            for row, first in _duplicates([codes[name] for name in primary_key],
+                                          numpy.flatnonzero(present)):
+                message = 'Rows %s, %s has primary key violation in columns %s' % (
+                    _row_number(first), _row_number(row), ', '.join(positions))
+                errors.append(_error('primary-key', row, None, message))
+        if foreign_keys:
+            rows = dict((name, data.column(name).to_pylist()) for name in key_names
+                        if name in columns)
+            errors.extend(_foreign_key_errors(rows, foreign_keys, table.headers,
+                                              fields_by_name, error_limit))
+        headers = table.headers
+
+    errors.sort(key=lambda error: (error['row-number'] or 0, error['column-number'] or 0))
+    errors = errors[:error_limit]
+    return {
+        'time': round((datetime.datetime.now() - start).total_seconds(), 3),
+        'valid': not errors,
+        'error-count': len(errors),
+        'row-count': row_count,
+        'headers': headers,
+        'source': source,
+        'format': format,
+        'errors': errors,
+    }
+
+
+def iter_keys(source, fields, format=None):
+    """
+    Yield lists of `fields` values of every row of the table at `source`.
+    Raise ValueError if some fields are missing.
+    """
+    with ColumnarTable(source, format or table_format(source)) as table:
+        missing = [name for name in fields if name not in table.headers]
+        if missing:
+            raise ValueError('Referenced fields %s are missing in %s' % (
+                ', '.join(missing), source))
+        data = table.read(list(fields))
+        columns = [data.column(name).to_pylist() for name in fields]
+    for values in zip(*columns):
+        yield list(values)
+
+
+def _csv_type(field):
+    """
+    Return arrow type to parse csv values of table schema `field` as.
+    Dates are parsed as timestamps, csv reader does not support dates.
+    """
+    return {
+        'integer': pyarrow.int64(),
+        'number': pyarrow.float64(),
+        'boolean': pyarrow.bool_(),
+        'date': pyarrow.timestamp('s'),
+        'datetime': pyarrow.timestamp('s'),
+    }.get(field.get('type'), pyarrow.string())
+
+
+def _csv_options(fields, dialect, encoding):
+    """
+    Return read, parse and convert options of pyarrow csv reader for csv
+    `dialect` descriptor, `encoding` and table schema `fields`. Raise
+    ValueError for settings the reader does not support.
+    """
+    dialect = dialect or {}
+    for key in ('skipInitialSpace', 'commentChar'):
+        if dialect.get(key):
+            raise ValueError('dialect %s is not supported' % key)
+    read_options = pyarrow.csv.ReadOptions(block_size=BLOCK_SIZE, encoding=encoding or 'utf8')
+    if dialect.get('header') is False:
+        if not fields:
+            raise ValueError('csv without header requires schema fields')
+        read_options.column_names = [field['name'] for field in fields]
+    parse_options = pyarrow.csv.ParseOptions(
+        delimiter=dialect.get('delimiter', ','),
+        quote_char=dialect.get('quoteChar', '"') or False,
+        double_quote=dialect.get('doubleQuote', True),
+        escape_char=dialect.get('escapeChar') or False)
+
+    # Timestamp parsers apply to all columns, so every column accepts
+    # formats of all date fields.
+    parsers = []
+    for field in fields:
+        format = field.get('format') or 'default'
+        if field.get('type') not in ('date', 'datetime'):
+            continue
+        if format == 'any':
+            raise ValueError('date format "any" of field %s is not supported' % field['name'])
+        if format == 'default':
+            parser = pyarrow.csv.ISO8601
+        else:
+            parser = format[len('fmt:'):] if format.startswith('fmt:') else format
+        if parser not in parsers:
+            parsers.append(parser)
+    return read_options, parse_options, parsers
+
+
+def csv_to_parquet(source, target, schema=None, dialect=None, encoding=None,
+                   compression='zstd', row_group_rows=ROW_GROUP_ROWS):
+    """
+    Convert csv file at `source` to Parquet file `target`, with column types
+    of table `schema` descriptor, and csv `dialect` descriptor and `encoding`
+    of the resource. The csv is parsed in blocks and written a row group at
+    a time, so memory use is bounded by `row_group_rows`.
+    Raise ValueError if values do not match their types, or if the dialect
+    or date formats are not supported.
+    """
+    _require()
+    schema = schema or {}
+    fields = schema.get('fields') or []
+    dates = [field['name'] for field in fields if field.get('type') == 'date']
+    read_options, parse_options, parsers = _csv_options(fields, dialect, encoding)
+    null_values = list(schema.get('missingValues', ['']))
+    if (dialect or {}).get('nullSequence') is not None:
+        null_values.append(dialect['nullSequence'])
+    options = pyarrow.csv.ConvertOptions(
+        column_types=dict((field['name'], _csv_type(field)) for field in fields),
+        null_values=null_values, strings_can_be_null=True,
+        true_values=TRUE_VALUES, false_values=FALSE_VALUES, timestamp_parsers=parsers)
+
+    def write(writer, batches):
+        table = pyarrow.Table.from_batches(batches, schema=reader.schema)
+        columns = [table.column(name).cast(pyarrow.date32()) if name in dates
+                   else table.column(name) for name in table.column_names]
+        table = pyarrow.Table.from_arrays(columns, names=table.column_names)
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(target, table.schema, compression=compression)
+        writer.write_table(table)
+        return writer
+
+    writer = None
+    try:
+        reader = pyarrow.csv.open_csv(source, read_options=read_options,
+                                      parse_options=parse_options, convert_options=options)
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= row_group_rows:
+                writer = write(writer, batches)
+                batches, rows = [], 0
+        if batches or writer is None:
+            writer = write(writer, batches)
+    except pyarrow.ArrowException as e:
+        raise ValueError('Could not convert %s to Parquet: %s' % (source, e))
+    finally:
+        if writer is not None:
+            writer.close()
@@ -10,6 +10,7 @@ from __future__ import unicode_literals
 import os
 import os.path
 import sys
+import time
 
 
 def expanduser(path):
@@ -27,4 +28,7 @@ def expanduser(path):
 # windows detection, covers cpython and ironpython
 WINDOWS = (sys.platform.startswith("win") or
            (sys.platform == 'cli' and os.name == 'nt'))
- 
+
+
+# Clock for measuring intervals, time.monotonic is not available in python 2
+monotonic = getattr(time, 'monotonic', time.time)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Content-Encoding values of supported compression methods.
+ENCODINGS = {
+    'gzip': 'gzip',
+    'zstd': 'zstd',
+}
+
+# Resources with these extensions are text and worth compressing.
+TEXT_EXTENSIONS = ('.csv', '.tsv', '.txt', '.json', '.geojson', '.ndjson')
+
+
+def is_text(path):
+    return path.lower().endswith(TEXT_EXTENSIONS)
+
+
+def check_compression(method):
+    """
+    Raise ValueError if compression `method` is not available.
+    """
+    if method not in ENCODINGS:
+        raise ValueError('Unsupported compression method: %s' % method)
+    if method == 'zstd' and zstandard is None:
+        raise ValueError('zstd compression requires the zstandard package. '
+                         'Install it with: pip install zstandard')
+
+
+def _compressor(method):
+    check_compression(method)
+    if method == 'gzip':
+        # wbits=31 writes gzip header and trailer. The header mtime is 0,
+        # so the same input always gives the same bytes and MD5.
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    return zstandard.ZstdCompressor().compressobj()
+
+
+def compress_file(src, dst, method='gzip', chunk_size=1024 * 1024):
+    """
+    Compress file `src` into `dst` chunk by chunk.
+
+    :return: (base64-encoded MD5, size) of the compressed file, i.e. of the
+        bytes that will be uploaded.
+    """
+    compressor = _compressor(method)
+    hash_md5 = hashlib.md5()
+    size = 0
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        for chunk in iter(lambda: fin.read(chunk_size), b''):
+            data = compressor.compress(chunk)
+            if data:
+                hash_md5.update(data)
+                fout.write(data)
+                size += len(data)
+        data = compressor.flush()
+        hash_md5.update(data)
+        fout.write(data)
+        size += len(data)
+    return base64.b64encode(hash_md5.digest()).decode(), size
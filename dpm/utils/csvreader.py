@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped csv parser for tabulator, an alternative to its csv module
+based parser for big local files:
+
+    Stream('data.csv', headers=1, custom_parsers={'csv': MmapCSVParser})
+
+Rows are found by scanning the mapped file for line ends with mmap.find(),
+and lines without quotes are split on the delimiter directly. Only lines
+with quotes, which can contain delimiters and line breaks, go through the
+csv module. As in the csv module, only a quote at the start of a field opens
+a quoted value, other quotes are part of the value.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import csv
+import io
+import mmap
+import os
+
+import six
+from tabulator.exceptions import FormatError
+from tabulator.parsers.api import Parser
+
+# Lines used to detect the dialect, as in tabulator.
+SAMPLE_LINES = 100
+BOM = b'\xef\xbb\xbf'
+
+
+class MmapCSVParser(Parser):
+    """
+    tabulator parser of csv files. Local files are memory-mapped, other
+    sources are read with the tabulator loader into memory.
+    """
+
+    options = ['delimiter', 'quotechar']
+
+    def __init__(self, delimiter=None, quotechar='"'):
+        self.__delimiter = delimiter
+        self.__quotechar = quotechar
+        self.__file = None
+        self.__buffer = None
+        self.__encoding = None
+        self.__extended_rows = None
+
+    @property
+    def closed(self):
+        return self.__buffer is None
+
+    def open(self, source, encoding, loader):
+        self.close()
+        self.__encoding = encoding or 'utf-8'
+        if self.__encoding.lower().replace('_', '-') in ('utf-8-sig', 'utf8-sig'):
+            self.__encoding = 'utf-8'
+        path = source[len('file://'):] if source.startswith('file://') else source
+        if os.path.isfile(path) and os.path.getsize(path):
+            self.__file = io.open(path, 'rb')
+            self.__buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            chars = loader.load(source, encoding, mode='b')
+            try:
+                self.__buffer = chars.read()
+            finally:
+                chars.close()
+        self.reset()
+
+    def close(self):
+        if self.__buffer is not None and not isinstance(self.__buffer, bytes):
+            self.__buffer.close()
+        if self.__file is not None:
+            self.__file.close()
+        self.__buffer = self.__file = None
+
+    def reset(self):
+        self.__extended_rows = self.__iter_extended_rows()
+
+    @property
+    def extended_rows(self):
+        return self.__extended_rows
+
+    def __lines(self):
+        """
+        Yield lines of the file as bytes, without line ends.
+        """
+        buffer = self.__buffer
+        size = len(buffer)
+        start = len(BOM) if buffer[:len(BOM)] == BOM else 0
+        while start < size:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                end = size
+            line = buffer[start:end]
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            yield line
+            start = end + 1
+
+    def __dialect(self):
+        sample = []
+        for line in self.__lines():
+            sample.append(line.decode(self.__encoding, 'replace'))
+            if len(sample) >= SAMPLE_LINES:
+                break
+        try:
+            dialect = csv.Sniffer().sniff('\n'.join(sample), str(self.__delimiter or ','))
+            delimiter = dialect.delimiter
+        except csv.Error:
+            delimiter = ','
+        return (self.__delimiter or delimiter), self.__quotechar
+
+    def __iter_extended_rows(self):
+        delimiter, quotechar = self.__dialect()
+        encoding = self.__encoding
+        byte_delimiter = delimiter.encode(encoding)
+        byte_quote = quotechar.encode(encoding)
+        pending = []
+        in_quotes = False
+        number = 0
+        for line in self.__lines():
+            if pending or byte_quote in line:
+                # Quoted values can span lines, collect the whole row.
+                pending.append(line)
+                in_quotes = _in_quotes(line, byte_delimiter, byte_quote, in_quotes)
+                if in_quotes:
+                    continue
+                values = _parse_row(pending, number + 1, encoding, delimiter, quotechar)
+                pending = []
+            elif line:
+                values = line.decode(encoding).split(delimiter) if six.PY3 else \
+                    [value.decode(encoding) for value in line.split(byte_delimiter)]
+            else:
+                values = []
+            number += 1
+            yield (number, None, values)
+        if pending:
+            number += 1
+            yield (number, None, _parse_row(pending, number, encoding, delimiter, quotechar))
+
+
+def _in_quotes(line, delimiter, quotechar, in_quotes=False):
+    """
+    Return True if a quoted value is open at the end of `line`, which starts
+    inside a quoted value if `in_quotes`.
+    """
+    pos = 0
+    field_start = not in_quotes
+    while True:
+        if in_quotes:
+            end = line.find(quotechar, pos)
+            if end < 0:
+                return True
+            if line.startswith(quotechar, end + 1):
+                # Escaped quote.
+                pos = end + 2
+                continue
+            in_quotes = field_start = False
+            pos = end + 1
+        elif field_start and line.startswith(quotechar, pos):
+            in_quotes = True
+            pos += 1
+        else:
+            end = line.find(delimiter, pos)
+            if end < 0:
+                return False
+            field_start = True
+            pos = end + len(delimiter)
+
+
+def _parse_row(lines, number, encoding, delimiter, quotechar):
+    """
+    Return values of row `number` in `lines` with quoted values.
+    """
+    text = b'\n'.join(lines).decode(encoding)
+    try:
+        return next(_csv_reader(text, delimiter, quotechar), [])
+    except csv.Error as e:
+        raise FormatError('Could not parse row %s: %s' % (number, e))
+
+
+def _csv_reader(text, delimiter, quotechar):
+    if six.PY2:
+        reader = csv.reader([text.encode('utf-8')], delimiter=str(delimiter),
+                            quotechar=str(quotechar))
+        return ([value.decode('utf-8') for value in row] for row in reader)
+    return csv.reader([text], delimiter=delimiter, quotechar=quotechar)
@@ -4,9 +4,16 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import io
+import json
+import os
+import tempfile
+import uuid
 from builtins import open
 from os.path import getsize
 
+import six
+
 
 class ChunkReader(object):
     """
@@ -32,3 +39,94 @@ class ChunkReader(object):
             self.on_progress(128 * 1024)
         return self._file.read(128 * 1024)
 
+
+class MultipartReader(object):
+    """
+    Streaming multipart/form-data request body: form `fields` followed by the
+    contents of `fileobj`. Only one chunk of the file is kept in memory, so
+    large files can be uploaded without reading them whole.
+
+    `on_read` callback is called with the number of file bytes before they
+    are handed to the connection. It can block to throttle the upload.
+
+    Usage:
+        with open('/path/file.csv', 'rb') as f:
+            body = MultipartReader({'key': 'k'}, f, getsize('/path/file.csv'))
+            response = requests.post(url, data=body,
+                                     headers={'Content-Type': body.content_type})
+    """
+    on_read = None
+
+    def __init__(self, fields, fileobj, size, filename='file', name='file', boundary=None,
+                 file_type='application/octet-stream'):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+
+        head = []
+        for key, value in fields.items():
+            head.append('--%s\r\n'
+                        'Content-Disposition: form-data; name="%s"\r\n\r\n'
+                        '%s\r\n' % (self.boundary, key, value))
+        head.append('--%s\r\n'
+                    'Content-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                    'Content-Type: %s\r\n\r\n'
+                    % (self.boundary, name, filename, file_type))
+        self._head = ''.join(head).encode('utf-8')
+        self._tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+        self._file = fileobj
+        self._file_done = False
+        self.len = len(self._head) + size + len(self._tail)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.len
+
+        if self._head:
+            chunk, self._head = self._head[:size], self._head[size:]
+            return chunk
+
+        if not self._file_done:
+            chunk = self._file.read(size)
+            if chunk:
+                if self.on_read:
+                    self.on_read(len(chunk))
+                return chunk
+            self._file_done = True
+
+        chunk, self._tail = self._tail[:size], self._tail[size:]
+        return chunk
+
+
+def find_datapackages(paths):
+    """
+    Yield directories containing datapackage.json under given `paths`.
+    Directories inside a data package are not searched further.
+    """
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            if 'datapackage.json' in filenames:
+                del dirnames[:]
+                yield dirpath
+            else:
+                dirnames.sort()
+
+
+def write_json(path, data, indent=2):
+    """
+    Write `data` as json to `path` atomically: write a temporary file next to
+    it and rename it over the target, so readers never see a partial file.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix='.dpm-', suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with io.open(fd, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(json.dumps(data, indent=indent, ensure_ascii=False)))
+            f.write('\n')
+        # mkstemp creates private file, keep permissions of the target.
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        os.chmod(tmp_path, mode)
+        # os.replace overwrites existing file on Windows too, py3.3+
+        getattr(os, 'replace', os.rename)(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
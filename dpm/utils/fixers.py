@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Fixers of common issues in datapackage.json, run as a pipeline over many
+data packages:
+
+    dirs = find_datapackages(['/data'])
+    for path, status, descriptor, error in fix_packages(dirs, cache=FixCache()):
+        print(path, status)
+
+Every fixer changes the descriptor in place and returns True if it changed
+something. Fixed descriptors are written atomically. With a FixCache,
+datapackage.json files that did not change since the last run with the same
+fixers are skipped without parsing.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath, exists, join
+
+from .compat import expanduser
+from .file import write_json
+
+DEFAULT_CACHE_PATH = expanduser('~/.dpm/fix-cache.json')
+
+# Field types not supported yet, that should be numbers.
+UNSUPPORTED_NUMBER_TYPES = ('decimal', 'double', 'float', 'binary')
+
+
+def _fields(descriptor):
+    for resource in descriptor.get('resources') or []:
+        schema = resource.get('schema') if isinstance(resource, dict) else None
+        if isinstance(schema, dict):
+            for field in schema.get('fields') or []:
+                yield field
+
+
+def fix_list_metadata(descriptor):
+    """
+    Wrap metadata objects into lists, e.g. "licenses": {...} into
+    "licenses": [{...}], as required by the spec.
+    """
+    changed = False
+    for key, value in descriptor.items():
+        if isinstance(value, dict):
+            descriptor[key] = [value]
+            changed = True
+    return changed
+
+
+def fix_date_format(descriptor):
+    """
+    Use "any" format for date fields, as other formats are not supported yet.
+    """
+    changed = False
+    for field in _fields(descriptor):
+        if field.get('type') == 'date' and field.get('format') != 'any':
+            field['format'] = 'any'
+            changed = True
+    return changed
+
+
+def fix_number_type(descriptor):
+    """
+    Use "number" type for decimal, double, float and binary fields.
+    """
+    changed = False
+    for field in _fields(descriptor):
+        if field.get('type') in UNSUPPORTED_NUMBER_TYPES:
+            field['type'] = 'number'
+            changed = True
+    return changed
+
+
+FIXERS = OrderedDict([
+    ('list-metadata', fix_list_metadata),
+    ('date-format', fix_date_format),
+    ('number-type', fix_number_type),
+])
+
+
+def transform(descriptor, fixers=tuple(FIXERS)):
+    """
+    Apply `fixers` (names of FIXERS) to the descriptor in place. Return names
+    of fixers that changed it.
+    """
+    return [name for name in fixers if FIXERS[name](descriptor)]
+
+
+class FixCache(object):
+    """
+    sha256 of datapackage.json files after the last run, with names of the
+    fixers applied, stored as json at `path`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.entries = {}
+        self._lock = threading.Lock()
+        if exists(self.path):
+            try:
+                with io.open(self.path, encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # Corrupted cache is just a slower run.
+                pass
+
+    def is_fixed(self, path, digest, fixers):
+        entry = self.entries.get(abspath(path))
+        return entry is not None and entry == {'sha256': digest, 'fixers': list(fixers)}
+
+    def set(self, path, digest, fixers):
+        with self._lock:
+            self.entries[abspath(path)] = {'sha256': digest, 'fixers': list(fixers)}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            write_json(self.path, self.entries, indent=None)
+
+
+def fix_package(path, fixers=tuple(FIXERS), cache=None, dry_run=False):
+    """
+    Fix datapackage.json in data package directory `path`. Return
+    (status, descriptor): status is 'fixed', 'unchanged', or 'cached' if it
+    was skipped, when descriptor is None. With `dry_run` the fixed descriptor
+    is returned, but not written.
+    """
+    dppath = join(path, 'datapackage.json')
+    with io.open(dppath, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cache is not None and not dry_run and cache.is_fixed(dppath, digest, fixers):
+        return 'cached', None
+
+    descriptor = json.loads(content.decode('utf-8'), object_pairs_hook=OrderedDict)
+    if not isinstance(descriptor, dict):
+        raise ValueError('%s should contain a json object' % dppath)
+    applied = transform(descriptor, fixers)
+    if applied and not dry_run:
+        write_json(dppath, descriptor)
+        with io.open(dppath, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    if cache is not None and not dry_run:
+        cache.set(dppath, digest, fixers)
+    return ('fixed' if applied else 'unchanged'), descriptor
+
+
+def fix_packages(paths, fixers=tuple(FIXERS), cache=None, dry_run=False, max_workers=8):
+    """
+    Fix data packages in directories `paths` concurrently. Yield
+    (path, status, descriptor, exception) tuples in the order of `paths`.
+    """
+    def fix(path):
+        try:
+            status, descriptor = fix_package(path, fixers, cache=cache, dry_run=dry_run)
+        except (IOError, OSError, ValueError) as e:
+            return path, 'error', None, e
+        return path, status, descriptor, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(fix, paths):
+            yield result
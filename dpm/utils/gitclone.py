@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Shallow, sparse clones of data package git repositories, kept in a local
+cache and updated with `git fetch` when the repository is imported again.
+
+Only datapackage.json, readme and local resources are checked out, and with
+--filter=blob:none only their contents are downloaded, if the server
+supports partial clone.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import subprocess
+from os.path import exists, join
+
+import click
+import requests
+import six
+from six.moves.urllib.parse import urlsplit
+
+from .compat import expanduser
+
+DEFAULT_CACHE_DIR = expanduser('~/.dpm/git-cache')
+README_FILES = ('README', 'README.txt', 'README.md')
+# Schemes of repository urls accepted from url lists.
+URL_SCHEMES = ('https', 'http', 'ssh', 'git')
+
+
+class GitError(Exception):
+    pass
+
+
+def _git(args, cwd=None):
+    """
+    Run git command, return its output. Raise GitError if it fails.
+    """
+    try:
+        process = subprocess.Popen(['git'] + list(args), cwd=cwd,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise GitError('Could not run git: %s' % e)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise GitError('git %s failed: %s' % (args[0], stderr.decode('utf-8', 'replace').strip()))
+    return stdout
+
+
+def check_url(url):
+    """
+    Raise GitError unless `url` is a repository url with one of URL_SCHEMES.
+    Urls from lists must not be local paths or git options, e.g.
+    --upload-pack=<command>.
+    """
+    scheme = urlsplit(url).scheme if '://' in url else None
+    if scheme not in URL_SCHEMES:
+        raise GitError('Unsupported repository url: %s. Url should start with %s' % (
+            url, ', '.join('%s://' % scheme for scheme in URL_SCHEMES)))
+
+
+def cache_path(url, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return directory of the clone of `url` in `cache_dir`.
+    """
+    name = url.rstrip('/').split('/')[-1]
+    if name.endswith('.git'):
+        name = name[:-4]
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+    return join(cache_dir, '%s-%s' % (name, digest))
+
+
+def sparse_patterns(descriptor):
+    """
+    Return sparse-checkout patterns for datapackage.json, readme and local
+    resources of the `descriptor`.
+    """
+    paths = ['datapackage.json'] + list(README_FILES)
+    for resource in descriptor.get('resources', []):
+        path = resource.get('path')
+        if isinstance(path, six.string_types) and '://' not in path:
+            paths.append(os.path.normpath(path).replace(os.sep, '/'))
+    return ['/' + path for path in paths]
+
+
+def sparse_clone(url, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Clone data package repository at `url` into `cache_dir`, or update the
+    clone made before. Return path of the clone.
+    """
+    path = cache_path(url, cache_dir)
+    if exists(join(path, '.git')):
+        _git(['fetch', '--quiet', '--depth', '1', 'origin'], cwd=path)
+        revision = 'FETCH_HEAD'
+    else:
+        if not exists(cache_dir):
+            os.makedirs(cache_dir)
+        _git(['clone', '--quiet', '--depth', '1', '--filter=blob:none', '--no-checkout',
+              '--', url, path])
+        _git(['config', 'core.sparseCheckout', 'true'], cwd=path)
+        revision = 'HEAD'
+
+    try:
+        descriptor = json.loads(
+            _git(['show', '%s:datapackage.json' % revision], cwd=path).decode('utf-8'))
+    except ValueError as e:
+        raise GitError('Invalid datapackage.json in %s: %s' % (url, e))
+    with io.open(join(path, '.git', 'info', 'sparse-checkout'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(sparse_patterns(descriptor)) + '\n')
+    _git(['checkout', '--quiet', '--force', '--detach', revision], cwd=path)
+    return path
+
+
+def read_url_list(source):
+    """
+    Yield git urls listed one per line in `source`: local file, '-' for
+    stdin, or http(s) url. Blank lines and lines starting with # are skipped.
+    The list is streamed, not read whole.
+    """
+    if source.startswith(('http://', 'https://')):
+        response = requests.get(source, stream=True)
+        response.raise_for_status()
+        lines = response.iter_lines(decode_unicode=True)
+    elif source == '-':
+        lines = click.get_text_stream('stdin')
+    else:
+        if source.startswith('file://'):
+            source = source[len('file://'):]
+        lines = io.open(source, encoding='utf-8')
+    try:
+        for line in lines:
+            if isinstance(line, six.binary_type):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if hasattr(lines, 'close') and source != '-':
+            lines.close()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session that can be shared between threads. Keeps up to
+    `max_connections` connections per host alive and never has more than
+    `max_connections` requests in flight at the same time.
+
+    Usage:
+        session = PooledSession(max_connections=16)
+        with ThreadPoolExecutor(16) as executor:
+            executor.map(session.get, urls)
+    """
+
+    def __init__(self, max_connections=10):
+        super(PooledSession, self).__init__()
+        self.max_connections = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+        adapter = HTTPAdapter(pool_connections=max_connections,
+                              pool_maxsize=max_connections)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, *args, **kwargs):
+        with self._slots:
+            return super(PooledSession, self).request(*args, **kwargs)
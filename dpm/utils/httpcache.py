@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Local disk cache of remote resources, so validating a remote-backed data
+package again costs one HEAD request per resource instead of downloading
+every file.
+
+A cached file is reused while the ETag, Last-Modified and Content-Length of
+the remote file match the ones it was downloaded with. Content-Length is
+compared as sent by the server, which is the compressed size of files served
+with Content-Encoding, not the size of the cached file. When only the first
+rows are needed, e.g. validation with row limit, only the head of the file
+is downloaded with range requests. Least recently used files are removed
+when the cache grows over `max_size` bytes.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from os.path import exists, getsize, join
+
+import requests
+from six.moves.urllib.parse import urlsplit
+
+from .compat import expanduser
+from .file import write_json
+
+DEFAULT_CACHE_DIR = expanduser('~/.dpm/http-cache')
+DEFAULT_MAX_SIZE = 1024 ** 3
+CHUNK_SIZE = 64 * 1024
+# Bytes requested by the first range request for the head of a file. Every
+# next request asks for twice as many.
+RANGE_SIZE = 256 * 1024
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+_replace = getattr(os, 'replace', os.rename)
+
+
+class HTTPCache(object):
+    """
+    Cache of remote files in `cache_dir`, limited to `max_size` bytes.
+
+    Usage:
+        cache = HTTPCache()
+        path = cache.fetch('https://example.com/data.csv')
+        path = cache.fetch('https://example.com/big.csv', lines=1001)
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, session=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_size = max_size
+        self.session = session or requests.Session()
+        self.stats = {'hits': 0, 'downloads': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        # Keep extension, readers detect format by it.
+        extension = os.path.splitext(urlsplit(url).path)[1]
+        if not re.match(r'^\.\w{1,10}$', extension):
+            extension = ''
+        return (join(self.cache_dir, key + '.data' + extension),
+                join(self.cache_dir, key + '.json'))
+
+    def _load_meta(self, meta_path):
+        try:
+            with io.open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _validators(response):
+        return {
+            'etag': response.headers.get('ETag'),
+            'last-modified': response.headers.get('Last-Modified'),
+        }
+
+    def _is_fresh(self, url, meta):
+        """
+        Return True if the remote file did not change since `meta` was saved.
+        """
+        response = self.session.head(url, allow_redirects=True)
+        if response.status_code != 200:
+            return False
+        validators = self._validators(response)
+        if not any(validators.values()):
+            # Nothing to compare, the file may have changed.
+            return False
+        length = response.headers.get('Content-Length')
+        cached_length = meta.get('content-length')
+        return validators == meta['validators'] and \
+            (length is None or cached_length is None or int(length) == cached_length)
+
+    def fetch(self, url, lines=None):
+        """
+        Return path of local copy of the file at `url`. If `lines` is given,
+        the copy may contain only the first `lines` lines of the file.
+        """
+        data_path, meta_path = self._paths(url)
+        meta = self._load_meta(meta_path)
+        if meta and exists(data_path) and (meta['complete'] or lines is not None) \
+                and (meta['complete'] or meta['lines'] >= lines) \
+                and self._is_fresh(url, meta):
+            self.stats['hits'] += 1
+            meta['accessed'] = time.time()
+            write_json(meta_path, meta, indent=None)
+            return data_path
+
+        if not exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        fd, tmp_path = tempfile.mkstemp(prefix='.download-', dir=self.cache_dir)
+        try:
+            with io.open(fd, 'wb') as f:
+                if lines is None:
+                    meta = self._download(url, f)
+                else:
+                    meta = self._download_head(url, f, lines)
+            _replace(tmp_path, data_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        meta['url'] = url
+        meta['file'] = os.path.basename(data_path)
+        meta['accessed'] = time.time()
+        write_json(meta_path, meta, indent=None)
+        self.stats['downloads'] += 1
+        self._evict(keep=data_path)
+        return data_path
+
+    @staticmethod
+    def _content_length(response):
+        length = response.headers.get('Content-Length')
+        return int(length) if length else None
+
+    def _download(self, url, f):
+        response = self.session.get(url, stream=True)
+        response.raise_for_status()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            self.stats['bytes'] += len(chunk)
+        return {'validators': self._validators(response), 'complete': True,
+                'content-length': self._content_length(response), 'lines': None}
+
+    def _download_head(self, url, f, lines):
+        """
+        Download the file with range requests until it has `lines` lines.
+        The last incomplete line is dropped.
+        """
+        size = RANGE_SIZE
+        count = 0
+        tail = b''
+        while True:
+            start = f.tell() + len(tail)
+            response = self.session.get(
+                url, headers={'Range': 'bytes=%s-%s' % (start, start + size - 1)}, stream=True)
+            response.raise_for_status()
+            validators = self._validators(response)
+            match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+            if response.status_code != 206 or not match:
+                # Ranges are not supported, the whole file is sent.
+                f.seek(0)
+                f.truncate()
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    self.stats['bytes'] += len(chunk)
+                return {'validators': validators, 'complete': True,
+                        'content-length': self._content_length(response), 'lines': None}
+
+            self.stats['bytes'] += len(response.content)
+            data = tail + response.content
+            # Length of the whole file, as HEAD responses report it.
+            length = int(match.group(3)) if match.group(3) != '*' else None
+            complete = length is not None and int(match.group(2)) + 1 >= length
+            if complete:
+                f.write(data)
+                return {'validators': validators, 'complete': True, 'content-length': length,
+                        'lines': None}
+            end = data.rfind(b'\n') + 1
+            f.write(data[:end])
+            tail = data[end:]
+            count += data.count(b'\n', 0, end)
+            if count >= lines:
+                return {'validators': validators, 'complete': False, 'lines': count,
+                        'content-length': length}
+            size *= 2
+
+    def _evict(self, keep=None):
+        """
+        Remove least recently used files until the cache fits in max_size.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                meta_path = join(self.cache_dir, name)
+                meta = self._load_meta(meta_path)
+                if not meta or not meta.get('file') \
+                        or not exists(join(self.cache_dir, meta['file'])):
+                    continue
+                data_path = join(self.cache_dir, meta['file'])
+                size = getsize(data_path)
+                total += size
+                entries.append((meta.get('accessed', 0), size, data_path, meta_path))
+            for _, size, data_path, meta_path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                if data_path == keep:
+                    continue
+                for path in (meta_path, data_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Fast schema inference for csv files from a sample of rows.
+
+The sample is the head of the file plus rows from blocks at random offsets,
+so inference of a GB file reads only a few hundred KB. Types are inferred
+column by column: all sampled values of a column are joined into one string
+and values matching each candidate type are counted in one regex pass.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import csv
+import io
+import os
+import random
+import re
+
+import six
+
+# Candidate types from the most specific, with patterns matching lowercased
+# values that jsontableschema can cast with the default format.
+TYPE_PATTERNS = [
+    ('integer', r'[+-]?\d+'),
+    ('number', r'[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?'),
+    ('boolean', r'yes|y|true|t|no|n|false|f'),
+    ('date', r'\d{4}-\d{2}-\d{2}'),
+    ('datetime', r'\d{4}-\d{2}-\d{2}t\d{2}:\d{2}:\d{2}z'),
+]
+# Match values of a column joined by newlines.
+_COLUMN_PATTERNS = [
+    (name, re.compile(r'^(?:%s)$' % pattern, re.MULTILINE))
+    for name, pattern in TYPE_PATTERNS
+]
+
+# Values treated as missing, as in jsontableschema.
+NULL_VALUES = ('', 'null', 'none', 'nil', 'nan', '-')
+
+DEFAULT_HEAD_ROWS = 1000
+DEFAULT_BLOCKS = 10
+DEFAULT_BLOCK_ROWS = 100
+# Share of sampled values a type should match, as jsontableschema infers the
+# type of the majority of values.
+DEFAULT_CONFIDENCE = 0.5
+
+
+def _parse(lines, dialect):
+    """
+    Parse decoded csv `lines` into rows of text values.
+    """
+    if six.PY2:
+        reader = csv.reader((line.encode('utf-8') for line in lines), dialect)
+        return [[value.decode('utf-8') for value in row] for row in reader]
+    return list(csv.reader(lines, dialect))
+
+
+def _read_lines(f, count, encoding):
+    lines = []
+    for _ in range(count):
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line.decode(encoding, 'replace'))
+    return lines
+
+
+def sample_rows(path, head=DEFAULT_HEAD_ROWS, blocks=DEFAULT_BLOCKS,
+                block_rows=DEFAULT_BLOCK_ROWS, seed=0, encoding='utf-8'):
+    """
+    Return (headers, rows) sampled from csv file at `path`: first `head` rows
+    and `block_rows` rows from each of `blocks` random offsets in the rest of
+    the file.
+
+    Block rows that do not have as many values as headers, e.g. because the
+    block started inside a quoted value, are dropped.
+    """
+    size = os.path.getsize(path)
+    rnd = random.Random(seed)
+    with io.open(path, 'rb') as f:
+        head_lines = _read_lines(f, head + 1, encoding)
+        try:
+            dialect = csv.Sniffer().sniff(''.join(head_lines[:20]), delimiters=str(',;\t|'))
+        except csv.Error:
+            dialect = csv.excel
+        parsed = _parse(head_lines, dialect)
+        if not parsed:
+            return [], []
+        headers, rows = parsed[0], parsed[1:]
+
+        start = f.tell()
+        if blocks and start < size:
+            for offset in sorted(rnd.randint(start, size - 1) for _ in range(blocks)):
+                f.seek(offset)
+                # Skip partial line
+                f.readline()
+                block = _parse(_read_lines(f, block_rows, encoding), dialect)
+                rows.extend(row for row in block if len(row) == len(headers))
+    return headers, rows
+
+
+def infer_type(values, confidence=DEFAULT_CONFIDENCE):
+    """
+    Return the most specific type matching more than `confidence` share of
+    non-missing `values`.
+    """
+    values = [value.strip().lower() for value in values]
+    values = [value for value in values if value not in NULL_VALUES]
+    # Values with newlines would be counted as many values.
+    values = [value for value in values if '\n' not in value]
+    if not values:
+        return 'string'
+    column = '\n'.join(values)
+    for name, pattern in _COLUMN_PATTERNS:
+        if len(pattern.findall(column)) > confidence * len(values):
+            return name
+    return 'string'
+
+
+def infer_schema(path, head=DEFAULT_HEAD_ROWS, blocks=DEFAULT_BLOCKS,
+                 block_rows=DEFAULT_BLOCK_ROWS, confidence=DEFAULT_CONFIDENCE, seed=0,
+                 encoding='utf-8'):
+    """
+    Infer jsontableschema descriptor of csv file at `path` from a sample of
+    rows, see sample_rows().
+    """
+    headers, rows = sample_rows(path, head=head, blocks=blocks, block_rows=block_rows,
+                                seed=seed, encoding=encoding)
+    fields = []
+    for idx, name in enumerate(headers):
+        values = [row[idx] for row in rows if idx < len(row)]
+        fields.append({'name': name, 'type': infer_type(values, confidence),
+                       'format': 'default'})
+    return {'fields': fields}
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent checker of HTTP links, e.g. pages of published data packages.
+
+    checker = LinkChecker(max_workers=32, per_host=8)
+    for result in checker.check_all(urls):
+        print(result['url'], result['status'])
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from six.moves.urllib.parse import urlsplit
+
+from .compat import monotonic
+from .http import PooledSession
+
+# Statuses worth another attempt.
+RETRY_STATUSES = (429, 502, 503, 504)
+# Statuses of servers that do not support HEAD, retried with GET.
+HEAD_NOT_SUPPORTED = (403, 405, 501)
+RETRY_BACKOFF = 0.5
+
+
+class LinkChecker(object):
+    """
+    Check links with HEAD requests, falling back to GET if HEAD is not
+    supported, on a pool of `max_workers` threads sharing pooled connections.
+
+    :param per_host: max requests in flight to one host.
+    :param timeout: connect and read timeout of every request, in seconds.
+    :param retries: attempts after connection errors, timeouts and
+        RETRY_STATUSES responses, with exponential backoff.
+    """
+
+    def __init__(self, max_workers=16, per_host=4, timeout=10, retries=2, session=None):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.session = session or PooledSession(max_connections=max_workers)
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slots(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _request(self, method, url):
+        with self._host_slots(url):
+            response = self.session.request(method, url, timeout=self.timeout,
+                                            allow_redirects=True, stream=True)
+            # Body is not needed, release the connection.
+            response.close()
+            return response
+
+    def check(self, url):
+        """
+        Check `url`. Return dict with url, status (None if request failed),
+        ok flag, error message, method of the last request and elapsed seconds.
+        """
+        start = monotonic()
+        method = 'HEAD'
+        attempt = 0
+        while True:
+            status = error = None
+            try:
+                status = self._request(method, url).status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            except requests.RequestException as e:
+                # Invalid url, too many redirects etc. would fail again.
+                error = str(e)
+                break
+            if method == 'HEAD' and status in HEAD_NOT_SUPPORTED:
+                method = 'GET'
+                continue
+            if error is None and status not in RETRY_STATUSES or attempt >= self.retries:
+                break
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+        return {
+            'url': url,
+            'status': status,
+            'ok': status is not None and 200 <= status < 300,
+            'error': error,
+            'method': method,
+            'elapsed': round(monotonic() - start, 3),
+        }
+
+    def check_all(self, urls):
+        """
+        Check `urls` concurrently and yield results as they complete. `urls`
+        can be a lazy iterable: only a few urls per worker are taken ahead.
+        """
+        urls = iter(urls)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while True:
+                    for url in urls:
+                        pending.add(executor.submit(self.check, url))
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    if not pending:
+                        return
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                # Consumer stopped early, do not run the queued checks.
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+datapackage.lock: digests and validation status of data package files, so
+unchanged files are not hashed or validated again on every publish.
+
+    {
+      "version": 1,
+      "files": {
+        "data/table.csv": {
+          "size": 1024, "mtime": 1479800000.5,
+          "md5": "<base64>", "sha256": "<hex>", "valid": true
+        }
+      }
+    }
+
+A file is considered unchanged while its size and mtime match the entry.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import io
+import json
+import os
+from os.path import exists, join
+
+from .file import write_json
+
+LOCK_FILENAME = 'datapackage.lock'
+LOCK_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digests(path, chunk_size=CHUNK_SIZE):
+    """
+    Return (md5, sha256) of file at `path`, read once. md5 is base64-encoded
+    as for the bitstore, sha256 is hex.
+    """
+    hash_md5 = hashlib.md5()
+    hash_sha256 = hashlib.sha256()
+    with io.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hash_md5.update(chunk)
+            hash_sha256.update(chunk)
+    return base64.b64encode(hash_md5.digest()).decode(), hash_sha256.hexdigest()
+
+
+class Lockfile(object):
+    """
+    Lock file of the data package in `base_path`. Entries are looked up with
+    entry(), which recomputes digests of changed files, and saved with save().
+
+    :param verify: recompute all entries, ignoring the stored ones.
+    """
+
+    def __init__(self, base_path, verify=False):
+        self.base_path = base_path
+        self.path = join(base_path, LOCK_FILENAME)
+        self.verify = verify
+        self.files = {}
+        self.recomputed = []
+        self.changed = False
+        if exists(self.path):
+            with io.open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == LOCK_VERSION:
+                self.files = data.get('files', {})
+
+    def exists(self):
+        return exists(self.path)
+
+    def _stat(self, path):
+        stat = os.stat(join(self.base_path, path))
+        return stat.st_size, stat.st_mtime
+
+    def is_fresh(self, path):
+        """
+        Return True if stored entry of `path` matches the file on disk.
+        """
+        entry = self.files.get(path)
+        if self.verify or not entry or path in self.recomputed:
+            return path in self.recomputed
+        size, mtime = self._stat(path)
+        return entry['size'] == size and entry['mtime'] == mtime
+
+    def entry(self, path):
+        """
+        Return entry of file at `path`, relative to the data package.
+        Digests of new or changed files are recomputed and validation status
+        of them is reset.
+        """
+        if not self.is_fresh(path):
+            size, mtime = self._stat(path)
+            md5, sha256 = file_digests(join(self.base_path, path))
+            self.files[path] = {'size': size, 'mtime': mtime, 'md5': md5,
+                                'sha256': sha256, 'valid': None}
+            self.recomputed.append(path)
+            self.changed = True
+        return self.files[path]
+
+    def is_valid(self, path):
+        """
+        Return True if unchanged file at `path` is known to have valid data,
+        and files it was validated against are unchanged too.
+        """
+        if not self.is_fresh(path) or self.files[path].get('valid') is not True:
+            return False
+        references = self.files[path].get('references', {})
+        return all(self.entry(reference)['sha256'] == sha256
+                   for reference, sha256 in references.items())
+
+    def set_valid(self, path, valid, references=()):
+        """
+        Store validation status of file at `path`, validated against
+        `references` files, e.g. resources referenced by foreign keys.
+        """
+        entry = self.entry(path)
+        entry['valid'] = valid
+        entry['references'] = dict((reference, self.entry(reference)['sha256'])
+                                   for reference in references)
+        if not entry['references']:
+            del entry['references']
+        self.changed = True
+
+    def save(self):
+        write_json(self.path, {'version': LOCK_VERSION, 'files': self.files})
+        self.changed = False
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Content type detection of data package files, for the registry to serve them
+with the right Content-Type.
+
+The type is taken, in order, from the resource descriptor `mediatype` or
+`format`, the leading bytes of the file, its extension, or, for other text
+files, from whether the text looks like json. Charset of text files is
+the descriptor `encoding`, or detected from a byte order mark or by decoding
+a sample. Results of file sniffing are cached by path, size and mtime.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import codecs
+import io
+import os
+import threading
+
+from .columnar import MEDIA_TYPES as COLUMNAR_TYPES
+
+DEFAULT_TYPE = 'application/octet-stream'
+# Bytes read from the start of a file to detect its type and charset.
+SAMPLE_SIZE = 8 * 1024
+# Max count of cached results.
+CACHE_SIZE = 4096
+
+# Media types by resource format, as in datapackage.json "format".
+FORMATS = {
+    'csv': 'text/csv',
+    'tsv': 'text/tab-separated-values',
+    'json': 'application/json',
+    'geojson': 'application/geo+json',
+    'topojson': 'application/json',
+    'xml': 'application/xml',
+    'html': 'text/html',
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'xls': 'application/vnd.ms-excel',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'ods': 'application/vnd.oasis.opendocument.spreadsheet',
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+    'gz': 'application/gzip',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'svg': 'image/svg+xml',
+}
+FORMATS.update(COLUMNAR_TYPES)
+
+# Extensions other than .<format>.
+EXTENSIONS = {
+    '.feather': COLUMNAR_TYPES['arrow'],
+    '.markdown': 'text/markdown',
+    '.htm': 'text/html',
+}
+
+# Leading bytes of binary formats.
+MAGIC = [
+    (b'PAR1', COLUMNAR_TYPES['parquet']),
+    (b'ARROW1', COLUMNAR_TYPES['arrow']),
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/vnd.ms-excel'),
+]
+# Formats stored as zip archives, detected by extension.
+ZIP_TYPES = (FORMATS['xlsx'], FORMATS['ods'])
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def is_text(media_type):
+    return media_type.startswith('text/')
+
+
+def extension_type(path):
+    """
+    Return media type of `path` by its extension, or None.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return EXTENSIONS.get(extension) or FORMATS.get(extension[1:])
+
+
+def _charset(sample):
+    for bom, charset in BOMS:
+        if sample.startswith(bom):
+            return charset
+    try:
+        # The sample can end in the middle of a character.
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+
+def sniff(path):
+    """
+    Return (media type, charset) of the file at `path` from its contents
+    and extension. Charset is None for binary files or if it is unknown.
+    """
+    with io.open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    by_extension = extension_type(path)
+    for magic, media_type in MAGIC:
+        if sample.startswith(magic):
+            if media_type == 'application/zip' and by_extension in ZIP_TYPES:
+                return by_extension, None
+            return media_type, None
+    if b'\x00' in sample and not sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return by_extension or DEFAULT_TYPE, None
+    charset = _charset(sample)
+    if by_extension:
+        return by_extension, charset
+    if sample.lstrip(codecs.BOM_UTF8 + b' \t\r\n')[:1] in (b'{', b'['):
+        return 'application/json', charset
+    return 'text/plain', charset
+
+
+def _cached_sniff(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+    result = sniff(path)
+    with _cache_lock:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = result
+    return result
+
+
+def detect(path, descriptor=None):
+    """
+    Return (media type, charset) of the file at `path`, with resource
+    `descriptor` if it is a resource. The file is read only if the
+    descriptor has no mediatype or format.
+    """
+    descriptor = descriptor or {}
+    media_type = descriptor.get('mediatype') or FORMATS.get((descriptor.get('format') or '').lower())
+    if media_type:
+        # Text resources are utf-8 by default, see the data package spec.
+        charset = (descriptor.get('encoding') or 'utf-8') if is_text(media_type) else None
+        return media_type, charset
+    try:
+        media_type, charset = _cached_sniff(path)
+    except (IOError, OSError):
+        # Unreadable files are reported when they are hashed.
+        media_type, charset = extension_type(path) or DEFAULT_TYPE, None
+    if is_text(media_type) or media_type == 'application/json':
+        charset = descriptor.get('encoding') or charset
+    return media_type, charset
+
+
+def content_type(media_type, charset=None):
+    """
+    Return Content-Type header value, with charset of text types.
+    """
+    if charset and is_text(media_type):
+        return '%s; charset=%s' % (media_type, charset)
+    return media_type
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Timing instrumentation for client operations.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json as json_module
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+
+from .compat import monotonic
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+log = logging.getLogger('dpm')
+
+
+class Profiler(object):
+    """
+    Collects timing spans and counters. Thread-safe.
+
+    Spans measure a block of code, e.g. a publish phase or upload of one
+    file. Span `args` is a dict that can be updated inside the block, e.g.
+    with number of bytes processed.
+
+    Usage:
+        profiler = Profiler()
+        with profiler.span('upload', 'file', path=path) as args:
+            args['bytes'] = upload(path)
+        profiler.count('requests')
+        print(profiler.format_table())
+    """
+    enabled = True
+
+    def __init__(self):
+        self.origin = monotonic()
+        self.spans = []
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category='phase', **args):
+        start = monotonic()
+        try:
+            yield args
+        finally:
+            end = monotonic()
+            span = {
+                'name': name,
+                'category': category,
+                'start': start - self.origin,
+                'time': end - start,
+                'thread': threading.current_thread().name,
+                'args': args,
+            }
+            with self._lock:
+                self.spans.append(span)
+            log.debug('%s %s %.3fs %s', category, name, span['time'], args)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self):
+        """
+        Aggregate spans by category and name: count, total and max time,
+        bytes processed and throughput.
+        """
+        rows = OrderedDict()
+        for span in sorted(self.spans, key=lambda x: x['start']):
+            key = (span['category'], span['name'])
+            row = rows.setdefault(key, {
+                'category': span['category'],
+                'name': span['name'],
+                'count': 0,
+                'time': 0,
+                'max-time': 0,
+                'bytes': 0,
+            })
+            row['count'] += 1
+            row['time'] += span['time']
+            row['max-time'] = max(row['max-time'], span['time'])
+            row['bytes'] += span['args'].get('bytes', 0)
+        for row in rows.values():
+            row['bytes-per-second'] = int(row['bytes'] / row['time']) \
+                if row['bytes'] and row['time'] else None
+        return list(rows.values())
+
+    def report(self):
+        return {
+            'summary': self.summary(),
+            'counters': dict(self.counters),
+            'spans': self.spans,
+        }
+
+    def chrome_trace(self):
+        """
+        Return spans in Chrome trace event format, which can be loaded
+        in chrome://tracing or https://ui.perfetto.dev
+        """
+        threads = {}
+        events = []
+        for span in self.spans:
+            tid = threads.setdefault(span['thread'], len(threads) + 1)
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(span['start'] * 1e6),
+                'dur': int(span['time'] * 1e6),
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': span['args'],
+            })
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                           'tid': tid, 'args': {'name': name}})
+        return {'traceEvents': events, 'otherData': dict(self.counters)}
+
+    def format_table(self):
+        """
+        Return summary as a human-readable table.
+        """
+        lines = ['%-8s %-20s %6s %9s %9s %12s %10s' % (
+            'TYPE', 'NAME', 'COUNT', 'TIME(s)', 'MAX(s)', 'BYTES', 'MB/s')]
+        for row in self.summary():
+            rate = row['bytes-per-second']
+            lines.append('%-8s %-20s %6d %9.3f %9.3f %12s %10s' % (
+                row['category'], row['name'][:20], row['count'], row['time'],
+                row['max-time'], row['bytes'] or '-',
+                '%.2f' % (rate / 1024 / 1024) if rate else '-'))
+        for name, value in sorted(self.counters.items()):
+            lines.append('%-8s %-20s %6d' % ('counter', name[:20], value))
+        return '\n'.join(lines)
+
+    def dump(self, path, format='json'):
+        """
+        Write report to `path` as plain json or Chrome trace (format='chrome').
+        """
+        data = self.chrome_trace() if format == 'chrome' else self.report()
+        with open(path, 'w') as f:
+            json_module.dump(data, f, indent=2)
+
+
+class NullProfiler(object):
+    """
+    Profiler that records nothing. Used when profiling is off.
+    """
+    enabled = False
+
+    @contextmanager
+    def span(self, name, category='phase', **args):
+        yield args
+
+    def count(self, name, value=1):
+        pass
+
+
+def peak_rss():
+    """
+    Return peak resident set size of the process in bytes, or None if it is
+    not available on this platform.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset peak resident set size of the process to the current one, so
+    that peak_rss_since_reset() measures a block of code. Return False if
+    it is not supported on this platform (only Linux 4.0 or later is).
+    Resetting also lowers the peak reported by peak_rss().
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def peak_rss_since_reset():
+    """
+    Return peak resident set size of the process in bytes since the last
+    reset_peak_rss(), or None if it is not available on this platform.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .compat import monotonic
+
+# Bytes per second of waiting by which an upload moves ahead of bigger ones
+# in FairSlots, so a big file waits at most about size / AGING seconds for
+# smaller files that arrive after it.
+AGING = 10 * 1024 * 1024
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket. Allows `rate` tokens (bytes) per second on
+    average, with bursts of up to `capacity` tokens.
+
+    Callers reserve tokens and sleep off the debt outside of the lock, so the
+    total rate holds no matter how many threads share the bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.timestamp = monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """
+        Take `amount` tokens, blocking until they are available.
+        """
+        with self._lock:
+            now = monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class FairSlots(object):
+    """
+    Semaphore that hands free slots to the smallest waiting job first, so
+    small files are not stuck in the queue behind huge ones. Waiting jobs
+    age: every second of waiting counts as `aging` bytes less size, so a
+    steady flow of small jobs can not starve a big one. Jobs of the same
+    priority are served in arrival order.
+    """
+
+    def __init__(self, slots, aging=AGING):
+        self.free = slots
+        self.aging = aging
+        self._waiting = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        """
+        Take a slot for the job of given `size`. Return seconds spent waiting.
+        """
+        with self._lock:
+            if self.free and not self._waiting:
+                self.free -= 1
+                return 0
+            event = threading.Event()
+            start = monotonic()
+            # Priority at time t is size - aging * (t - start). The order of
+            # waiting jobs does not change over time, so the heap is ordered
+            # by size + aging * start.
+            heapq.heappush(self._waiting, (size + self.aging * start, next(self._counter), event))
+        event.wait()
+        return monotonic() - start
+
+    def release(self):
+        with self._lock:
+            if self._waiting:
+                # Hand the slot over directly to the next job
+                _, _, event = heapq.heappop(self._waiting)
+                event.set()
+            else:
+                self.free += 1
+
+
+class TransferScheduler(object):
+    """
+    Upload limits shared by all clients in a process: number of uploads in
+    flight and total upload bandwidth in bytes per second. Both are
+    unlimited by default.
+
+    When all upload slots are busy, the smallest waiting file gets the next
+    free slot, with waiting time counted against size, see FairSlots. Bandwidth is handed out in small chunks in the order they are
+    requested, so concurrent uploads share it evenly regardless of their
+    size.
+
+    Usage:
+        scheduler = TransferScheduler(max_uploads=4, bandwidth=10 * 1024 * 1024)
+        with scheduler.upload(size):
+            body.on_read = scheduler.consume
+            session.post(url, data=body)
+        print(scheduler.stats())
+    """
+
+    def __init__(self, max_uploads=None, bandwidth=None):
+        self.max_uploads = max_uploads
+        self.bandwidth = bandwidth
+        self._slots = FairSlots(max_uploads) if max_uploads else None
+        self._bucket = TokenBucket(bandwidth) if bandwidth else None
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        # Uploads skipped because the same content is already uploaded.
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.queue_time = 0
+        self.throttle_time = 0
+        self.started = None
+        self.finished = None
+
+    @contextmanager
+    def upload(self, size):
+        """
+        Hold an upload slot for the duration of the block. The upload is
+        counted in stats if the block finishes without error.
+        """
+        waited = self._slots.acquire(size) if self._slots else 0
+        with self._lock:
+            self.queue_time += waited
+            if self.started is None:
+                self.started = monotonic()
+        try:
+            yield self
+        finally:
+            if self._slots:
+                self._slots.release()
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.finished = monotonic()
+
+    def skip(self, size):
+        """
+        Count upload of `size` bytes skipped as duplicate.
+        """
+        with self._lock:
+            self.skipped_files += 1
+            self.skipped_bytes += size
+
+    def consume(self, nbytes):
+        """
+        Block until `nbytes` can be sent without exceeding the bandwidth.
+        """
+        if self._bucket:
+            waited = self._bucket.consume(nbytes)
+            if waited:
+                with self._lock:
+                    self.throttle_time += waited
+
+    def stats(self):
+        """
+        Return upload statistics. Time is the wall time from the start of the
+        first upload to the end of the last one.
+        """
+        elapsed = 0
+        if self.started is not None and self.finished is not None:
+            elapsed = self.finished - self.started
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'skipped-files': self.skipped_files,
+            'skipped-bytes': self.skipped_bytes,
+            'time': round(elapsed, 3),
+            'bytes-per-second': int(self.bytes / elapsed) if elapsed else None,
+            'bandwidth-limit': self.bandwidth,
+            'queue-time': round(self.queue_time, 3),
+            'throttle-time': round(self.throttle_time, 3),
+        }
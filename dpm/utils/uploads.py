@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Local index of files already uploaded to the bitstore, by content digest,
+so publishing the same content again, in any data package, can ask the
+registry to alias the uploaded file instead of uploading it again. Entries
+the registry does not accept as aliases are discarded.
+
+    {
+      "https://datapackaged.com": {
+        "<md5> <size> <encoding>": "https://bitstore/.../data.csv"
+      }
+    }
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import threading
+from os.path import exists
+
+from .compat import expanduser
+from .file import write_json
+
+DEFAULT_INDEX_PATH = expanduser('~/.dpm/uploads.json')
+
+
+def digest_key(info):
+    """
+    Return index key of file `info` sent to the registry: md5, size and
+    encoding of the uploaded bytes.
+    """
+    return '%s %s %s' % (info['md5'], info['size'], info.get('encoding') or '')
+
+
+class UploadIndex(object):
+    """
+    Bitstore urls of uploaded files by server and digest, stored as json at
+    `path`. Safe to share between threads.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_INDEX_PATH
+        self.entries = self._load()
+        # (server, key) of discarded entries, to drop them from the saved file.
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not exists(self.path):
+            return {}
+        try:
+            with io.open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            # Corrupted index only costs uploads.
+            return {}
+
+    def get(self, server, info):
+        with self._lock:
+            return self.entries.get(server, {}).get(digest_key(info))
+
+    def add(self, server, info, url):
+        with self._lock:
+            self.entries.setdefault(server, {})[digest_key(info)] = url
+            self._discarded.discard((server, digest_key(info)))
+
+    def discard(self, server, info):
+        with self._lock:
+            self.entries.get(server, {}).pop(digest_key(info), None)
+            self._discarded.add((server, digest_key(info)))
+
+    def save(self):
+        """
+        Write the index, merged with entries saved by other processes since
+        it was loaded, without entries discarded here.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            entries = self._load()
+            for server, key in self._discarded:
+                entries.get(server, {}).pop(key, None)
+            for server, urls in self.entries.items():
+                entries.setdefault(server, {}).update(urls)
+            self.entries = entries
+            self._discarded = set()
+            write_json(self.path, entries, indent=None)
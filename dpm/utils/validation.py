@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-bounded table validation on top of goodtables.
+
+goodtables keeps every row (duplicate-row) and every value (unique-constraint)
+of the table in memory. Here these checks record compact 64-bit fingerprints,
+digests of the values, with row numbers instead. When the fingerprints exceed
+the memory budget they are spilled to sorted runs on disk, and duplicates are
+found at the end of the table by merging the runs.
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import functools
+import hashlib
+import heapq
+import json
+import mmap
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+
+import six
+
+from goodtables import Inspector
+from goodtables.register import check
+from goodtables.spec import spec
+from jsontableschema import Schema
+from tabulator import Stream
+from tabulator.exceptions import FormatError
+
+from . import columnar
+from .compat import monotonic
+from .csvreader import MmapCSVParser
+from .profile import peak_rss, peak_rss_since_reset, reset_peak_rss
+
+# Row numbers are packed with fingerprints into one int for sorting.
+ROW_BITS = 40
+ROW_MASK = (1 << ROW_BITS) - 1
+
+# Memory taken by one buffered fingerprint: 16 bytes in the arrays, plus the
+# packed int and list slot while the buffer is sorted.
+ENTRY_SIZE = 64
+
+# Number of (fingerprint, row) pairs read from a run at once during merge.
+MERGE_CHUNK = 4096
+
+try:
+    array('Q')
+    UINT64 = 'Q'
+except ValueError:
+    # Python 2 has no 'Q', but 'L' is 64-bit on 64-bit platforms.
+    UINT64 = 'L'
+
+
+# blake2b is faster, but new in Python 3.6.
+if hasattr(hashlib, 'blake2b'):
+    _new_digest = functools.partial(hashlib.blake2b, digest_size=8)
+else:
+    _new_digest = hashlib.sha1
+
+
+def _serialize(value):
+    """
+    Return bytes of `value` tagged with its type. Equal numbers serialize
+    the same whatever their type, e.g. 1, 1.0 and Decimal('1.00').
+    """
+    if value is None:
+        return b'n'
+    if isinstance(value, bool):
+        return b'b1' if value else b'b0'
+    if isinstance(value, six.integer_types):
+        return ('i%d' % value).encode('ascii')
+    if isinstance(value, (float, Decimal)):
+        try:
+            if value == int(value):
+                return ('i%d' % int(value)).encode('ascii')
+        except (OverflowError, ValueError):
+            # Infinity and NaN.
+            pass
+        if isinstance(value, float):
+            value = Decimal(repr(value))
+        # Decimal.normalize() would round to the context precision.
+        sign, digits, exponent = value.as_tuple()
+        while isinstance(exponent, int) and exponent < 0 and digits and digits[-1] == 0:
+            digits, exponent = digits[:-1], exponent + 1
+        return ('d%s %s %s' % (sign, ''.join(map(str, digits)), exponent)).encode('ascii')
+    if isinstance(value, six.text_type):
+        return b's' + value.encode('utf-8')
+    if isinstance(value, bytes):
+        return b'y' + value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return ('t%s %s' % (type(value).__name__, value.isoformat())).encode('ascii')
+    # Objects and arrays of json tables, and other types.
+    return b'j' + json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+
+
+def fingerprint(values):
+    """
+    Return 64-bit fingerprint of a row or a value: digest of its values,
+    serialized with their types. Equal values have equal fingerprints.
+    Different values collide with probability of about n^2 / 2^65 for
+    n values, i.e. practically never.
+    """
+    digest = _new_digest()
+    for value in values:
+        data = _serialize(value)
+        digest.update(struct.pack('>I', len(data)))
+        digest.update(data)
+    return struct.unpack('>Q', digest.digest()[:8])[0]
+
+
+class FingerprintIndex(object):
+    """
+    (fingerprint, row number) pairs, buffered in arrays and spilled to sorted
+    runs in temporary files on demand.
+
+    Usage:
+        index = FingerprintIndex()
+        for row_number, row in rows:
+            index.add(fingerprint(row), row_number)
+        for row_number, first_row_number in index.duplicates():
+            ...
+        index.close()
+    """
+
+    def __init__(self, tmpdir=None):
+        self.tmpdir = tmpdir
+        self.keys = array(UINT64)
+        self.rows = array(UINT64)
+        self.runs = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, row_number):
+        self.keys.append(key)
+        self.rows.append(row_number)
+
+    def _sorted(self):
+        """
+        Return buffered pairs packed into ints and sorted, and empty the buffer.
+        """
+        packed = sorted((key << ROW_BITS) | row for key, row in zip(self.keys, self.rows))
+        self.keys = array(UINT64)
+        self.rows = array(UINT64)
+        return packed
+
+    def spill(self):
+        """
+        Write buffered pairs to disk as a sorted run.
+        """
+        run = tempfile.TemporaryFile(prefix='dpm-run-', dir=self.tmpdir)
+        packed = self._sorted()
+        for start in range(0, len(packed), MERGE_CHUNK):
+            chunk = array(UINT64)
+            for value in packed[start:start + MERGE_CHUNK]:
+                chunk.append(value >> ROW_BITS)
+                chunk.append(value & ROW_MASK)
+            chunk.tofile(run)
+        self.runs.append(run)
+
+    def _read_run(self, run):
+        run.seek(0)
+        while True:
+            chunk = array(UINT64)
+            try:
+                chunk.fromfile(run, 2 * MERGE_CHUNK)
+            except EOFError:
+                # Last chunk is shorter, available items are still read.
+                pass
+            if not chunk:
+                return
+            for idx in range(0, len(chunk), 2):
+                yield chunk[idx], chunk[idx + 1]
+
+    def duplicates(self):
+        """
+        Yield (row number, first row number) for every pair whose fingerprint
+        was already added with a smaller row number.
+        """
+        buffered = ((value >> ROW_BITS, value & ROW_MASK) for value in self._sorted())
+        merged = heapq.merge(buffered, *[self._read_run(run) for run in self.runs])
+        last_key = first = None
+        for key, row in merged:
+            if key == last_key:
+                yield row, first
+            else:
+                last_key, first = key, row
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+
+def _key_value(field, value):
+    """
+    Return key `value` cast to type of jsontableschema `field`, the same
+    whether it is csv text or a value read from a Parquet or Arrow file.
+    """
+    if field is None:
+        return value
+    if field.type == 'datetime' and type(value) is datetime.date:
+        value = datetime.datetime(value.year, value.month, value.day)
+    try:
+        value = field.cast_value(value, skip_constraints=True)
+    except Exception:
+        # Not castable values are reported by other checks.
+        return value
+    if isinstance(value, datetime.datetime):
+        if value.utcoffset() is not None:
+            # Datetimes in csv are UTC and cast as naive.
+            value = (value - value.utcoffset()).replace(tzinfo=None)
+        if field.type == 'date':
+            value = value.date()
+    return value
+
+
+def key_fingerprint(fields, values):
+    """
+    Return fingerprint of key `values` cast to types of jsontableschema
+    `fields`, so that e.g. "1" and "1.0" of number fields match.
+    """
+    return fingerprint([_key_value(field, value) for field, value in zip(fields, values)])
+
+
+class _MappedArray(object):
+    """
+    Read-only sequence of 64-bit ints in a memory-mapped file.
+    """
+    itemsize = struct.calcsize(UINT64)
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._len = len(buffer) // self.itemsize
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx):
+        return struct.unpack_from(UINT64, self._buffer, idx * self.itemsize)[0]
+
+
+class KeyIndex(object):
+    """
+    Sorted array of key fingerprints of a referenced table, with binary
+    search lookups. With `memory_map` the array is kept in a temporary file
+    and mapped into memory, so only pages touched by lookups are resident.
+    """
+
+    def __init__(self, keys, memory_map=False, tmpdir=None):
+        keys = array(UINT64, sorted(keys))
+        self._file = self._mmap = None
+        if memory_map and keys:
+            self._file = tempfile.TemporaryFile(prefix='dpm-keys-', dir=tmpdir)
+            keys.tofile(self._file)
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            keys = _MappedArray(self._mmap)
+        self._keys = keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        idx = bisect_left(self._keys, key)
+        return idx < len(self._keys) and self._keys[idx] == key
+
+    @property
+    def memory_mapped(self):
+        return self._mmap is not None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+
+# tabulator parsers of csv tables, by reader name.
+READERS = {
+    'csv': {},
+    'mmap': {'csv': MmapCSVParser},
+}
+
+
+def build_key_index(source, schema, fields, memory_budget=None, tmpdir=None, reader='csv'):
+    """
+    Read key `fields` of every row of the table at `source` into KeyIndex.
+    The index is memory-mapped if it is bigger than `memory_budget` bytes.
+    """
+    schema = Schema(schema) if schema else None
+    key_fields = [schema.get_field(name) if schema else None for name in fields]
+    keys = array(UINT64)
+    if columnar.table_format(source):
+        for values in columnar.iter_keys(source, fields):
+            keys.append(key_fingerprint(key_fields, values))
+    else:
+        with Stream(source, headers=1, custom_parsers=READERS[reader]) as stream:
+            headers = stream.headers
+            missing = [name for name in fields if name not in headers]
+            if missing:
+                raise ValueError('Referenced fields %s are missing in %s' % (
+                    ', '.join(missing), source))
+            positions = [headers.index(name) for name in fields]
+            try:
+                for row in stream.iter():
+                    values = [row[pos] if pos < len(row) else None for pos in positions]
+                    keys.append(key_fingerprint(key_fields, values))
+            except FormatError as e:
+                raise ValueError('Could not read %s: %s' % (source, e))
+    memory_map = bool(memory_budget) and len(keys) * keys.itemsize > memory_budget
+    return KeyIndex(keys, memory_map=memory_map, tmpdir=tmpdir)
+
+
+class ForeignKeyCheck(object):
+    """
+    foreign-key check of a referencing table against indexes of referenced
+    keys, see build_key_index(). Rows with empty key values are not checked.
+
+    Call reset() before every table with a list of foreign keys:
+        {'fields': [field names], 'index': KeyIndex, 'resource': referenced resource name}
+    """
+
+    def __init__(self):
+        self.reset()
+
+        @check('foreign-key', type='schema', context='body', after='primary-key')
+        def foreign_key(errors, columns, row_number, state):
+            if self.foreign_keys:
+                self._check(errors, columns, row_number)
+
+        self.check = foreign_key
+
+    def reset(self, foreign_keys=None):
+        self.foreign_keys = foreign_keys or []
+
+    def _check(self, errors, columns, row_number):
+        by_name = {column['field'].name: column for column in columns if 'field' in column}
+        for foreign_key in self.foreign_keys:
+            key_columns = [by_name.get(name) for name in foreign_key['fields']]
+            if None in key_columns:
+                # Missing columns are reported by other checks.
+                continue
+            values = [column.get('value') for column in key_columns]
+            if any(value in (None, '') for value in values):
+                continue
+            key = key_fingerprint([column['field'] for column in key_columns], values)
+            if key not in foreign_key['index']:
+                message = 'Row %s has foreign key violation in columns %s: %s not found in %s' % (
+                    row_number, ', '.join(str(column['number']) for column in key_columns),
+                    ', '.join('%s' % value for value in values), foreign_key['resource'])
+                errors.append({
+                    'code': 'foreign-key',
+                    'message': message,
+                    'row-number': row_number,
+                    'column-number': key_columns[0]['number'],
+                })
+
+
+class BoundedChecks(object):
+    """
+    duplicate-row, unique-constraint and primary-key checks which store
+    fingerprints instead of rows and values. Errors are found when the table
+    is finished, see finish(). Unlike goodtables, duplicated rows are still
+    checked by other checks.
+
+    With `memory_budget` (bytes) the biggest buffer is spilled to disk
+    whenever all buffers of the table would exceed it.
+
+    Usage:
+        checks = BoundedChecks(memory_budget=64 * 1024 * 1024)
+        inspector = Inspector(custom_checks=checks.checks)
+        checks.reset(primary_key=schema.primary_key)
+        report = inspect_table(table)
+        checks.finish(report, error_limit=1000)
+    """
+
+    def __init__(self, memory_budget=None, tmpdir=None):
+        self.memory_budget = memory_budget
+        self.tmpdir = tmpdir
+        self.indexes = {}
+        self.reset()
+
+        @check('duplicate-row')
+        def duplicate_row(errors, columns, row_number, state):
+            self._add('duplicate-row', fingerprint([c.get('value') for c in columns]),
+                      row_number)
+
+        @check('unique-constraint')
+        def unique_constraint(errors, columns, row_number, state):
+            for column in columns:
+                if len(column) == 4 and column['field'].constraints.get('unique'):
+                    self._add(column['number'], fingerprint([column['value']]), row_number)
+
+        @check('primary-key', type='schema', context='body', after='unique-constraint')
+        def primary_key(errors, columns, row_number, state):
+            if not self.primary_key:
+                return
+            values = [column.get('value') for column in columns
+                      if 'field' in column and column['field'].name in self.primary_key]
+            if len(values) == len(self.primary_key):
+                self._add('primary-key', fingerprint(values), row_number)
+
+        self.checks = [duplicate_row, unique_constraint, primary_key]
+
+    def reset(self, primary_key=None):
+        """
+        Prepare checks for the next table with `primary_key` field names.
+        """
+        for index in self.indexes.values():
+            index.close()
+        self.indexes = {}
+        self.buffered = 0
+        self.primary_key = primary_key or []
+
+    def _add(self, name, key, row_number):
+        index = self.indexes.get(name)
+        if index is None:
+            index = self.indexes[name] = FingerprintIndex(tmpdir=self.tmpdir)
+        index.add(key, row_number)
+        self.buffered += 1
+        if self.memory_budget and self.buffered * ENTRY_SIZE > self.memory_budget:
+            biggest = max(self.indexes.values(), key=len)
+            self.buffered -= len(biggest)
+            biggest.spill()
+
+    @property
+    def spilled_runs(self):
+        return sum(len(index.runs) for index in self.indexes.values())
+
+    def _errors(self, columns):
+        for name, index in self.indexes.items():
+            for row_number, first in index.duplicates():
+                if name == 'duplicate-row':
+                    message = spec['errors']['duplicate-row']['message'].format(
+                        row_number=row_number, row_numbers=first)
+                    yield {'code': 'duplicate-row', 'message': message,
+                           'row-number': row_number, 'column-number': None, 'row': None}
+                elif name == 'primary-key':
+                    message = 'Rows %s, %s has primary key violation in columns %s' % (
+                        first, row_number, ', '.join(columns))
+                    yield {'code': 'primary-key', 'message': message,
+                           'row-number': row_number, 'column-number': None, 'row': None}
+                else:
+                    message = spec['errors']['unique-constraint']['message'].format(
+                        row_numbers='%s, %s' % (first, row_number), column_number=name)
+                    yield {'code': 'unique-constraint', 'message': message,
+                           'row-number': row_number, 'column-number': name, 'row': None}
+
+    def finish(self, report, error_limit=1000):
+        """
+        Find duplicates in the finished table and add them to the table
+        `report`. Keep first `error_limit` errors by row number.
+        """
+        columns = [str(report['headers'].index(name) + 1)
+                   for name in self.primary_key if name in (report['headers'] or [])]
+        found = heapq.nsmallest(error_limit, self._errors(columns),
+                                key=lambda error: (error['row-number'], error['column-number'] or 0))
+        if found:
+            errors = sorted(report['errors'] + found,
+                            key=lambda error: error['row-number'] or 0)
+            report['errors'] = errors[:error_limit]
+            report['error-count'] = len(report['errors'])
+            report['valid'] = False
+        if self.spilled_runs:
+            report['spilled-runs'] = self.spilled_runs
+        self.reset()
+        return report
+
+
+class DataValidator(object):
+    """
+    Validate tables one by one with memory-bounded checks. Table reports
+    include validation speed and peak RSS of the process while the table
+    was validated, where it can be measured (Linux). The dataset report
+    includes peak RSS of the process.
+
+    :param row_limit: rows to validate in every table, None for all.
+    :param memory_budget: bytes for duplicate and unique checks of a table,
+        see BoundedChecks. Foreign key indexes bigger than this are
+        memory-mapped.
+    :param reader: 'csv' to read csv tables with tabulator's parser, or
+        'mmap' for memory-mapped MmapCSVParser.
+    """
+
+    def __init__(self, row_limit=1000, error_limit=1000, memory_budget=None,
+                 infer_schema=False, tmpdir=None, reader='csv'):
+        if reader not in READERS:
+            raise ValueError('Unknown reader: %s' % reader)
+        self.reader = reader
+        self.error_limit = error_limit
+        self.memory_budget = memory_budget
+        self.tmpdir = tmpdir
+        self.checks = BoundedChecks(memory_budget=memory_budget, tmpdir=tmpdir)
+        self.foreign_key_check = ForeignKeyCheck()
+        self.row_limit = row_limit
+        self.inspector = Inspector(row_limit=row_limit or sys.maxsize,
+                                   error_limit=error_limit,
+                                   infer_schema=infer_schema,
+                                   custom_checks=self.checks.checks + [self.foreign_key_check.check])
+        self._key_indexes = {}
+
+    def key_index(self, source, schema, fields):
+        """
+        Return KeyIndex of `fields` of the table at `source`. Built once per
+        table and fields, and reused by all tables referencing them.
+        """
+        cache_key = (source, tuple(fields))
+        if cache_key not in self._key_indexes:
+            self._key_indexes[cache_key] = build_key_index(
+                source, schema, fields, memory_budget=self.memory_budget, tmpdir=self.tmpdir,
+                reader=self.reader)
+        return self._key_indexes[cache_key]
+
+    def close(self):
+        for index in self._key_indexes.values():
+            index.close()
+        self._key_indexes = {}
+
+    def validate_table(self, source, schema=None, foreign_keys=None, format=None):
+        """
+        Validate table at `source` (path or url) against `schema` descriptor
+        and `foreign_keys`, see ForeignKeyCheck. Parquet and Arrow tables,
+        by `format` or file extension, are validated by columns, see
+        dpm.utils.columnar.
+        """
+        format = format or columnar.table_format(source)
+        if format in columnar.MEDIA_TYPES:
+            start, rss = monotonic(), reset_peak_rss()
+            report = columnar.validate_table(
+                source, schema, format, row_limit=self.row_limit,
+                error_limit=self.error_limit, foreign_keys=foreign_keys)
+            return self._add_stats(report, start, rss)
+        schema = Schema(schema) if schema else None
+        table = {
+            'source': source,
+            'stream': Stream(source, headers=1, custom_parsers=READERS[self.reader]),
+            'schema': schema,
+            'extra': {},
+        }
+        self.checks.reset(primary_key=schema.primary_key if schema else None)
+        self.foreign_key_check.reset(foreign_keys)
+        start, rss = monotonic(), reset_peak_rss()
+        try:
+            report = self.inspector._Inspector__inspect_table(table)
+        except FormatError as e:
+            # goodtables reports parser errors only in the header and sample.
+            self.checks.reset()
+            report = {
+                'time': round(monotonic() - start, 3),
+                'valid': False,
+                'error-count': 1,
+                'row-count': 0,
+                'headers': None,
+                'source': source,
+                'errors': [{'row': None, 'code': 'format-error', 'message': str(e),
+                            'row-number': None, 'column-number': None}],
+            }
+        else:
+            self.checks.finish(report, self.error_limit)
+        return self._add_stats(report, start, rss)
+
+    def _add_stats(self, report, start, rss_reset):
+        elapsed = monotonic() - start
+        report['rows-per-second'] = int(report['row-count'] / elapsed) if elapsed else None
+        # Without the reset the peak would be of everything validated before.
+        report['peak-rss'] = peak_rss_since_reset() if rss_reset else None
+        return report
+
+    def report(self, reports, start):
+        """
+        Return dataset report for table `reports`, validation started
+        at `start` datetime.
+        """
+        errors = []
+        for report in reports:
+            errors.extend(report['errors'][:self.error_limit - len(errors)])
+        # Tables reset the peak RSS of the process, so take the highest of all.
+        peaks = [rss for rss in [peak_rss()] + [report.get('peak-rss') for report in reports]
+                 if rss is not None]
+        return {
+            'time': round((datetime.datetime.now() - start).total_seconds(), 3),
+            'valid': all(report['valid'] for report in reports),
+            'table-count': len(reports),
+            'error-count': sum(len(report['errors']) for report in reports),
+            'peak-rss': max(peaks) if peaks else None,
+            'errors': errors,
+            'tables': reports,
+        }
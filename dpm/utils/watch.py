@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Watching data package directory for changed files, with inotify if the
+optional inotify_simple package is installed (Linux), or by polling.
+
+    watcher = make_watcher('/path/to/dp')
+    for paths in changes(watcher, debounce=1):
+        print('Changed: %s' % paths)
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import time
+from os.path import join, relpath
+
+from .compat import monotonic
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+def _ignored(name):
+    # Hidden and temporary files, e.g. editor swap files or files written by
+    # write_json(), and the lock file that dpm updates itself.
+    return name.startswith('.') or name.endswith('~') or name == 'datapackage.lock'
+
+
+def _relpath(path, base_path):
+    return relpath(path, base_path).replace(os.sep, '/')
+
+
+class PollingWatcher(object):
+    """
+    Find changed files by comparing size and mtime of all files under
+    `base_path` every `interval` seconds.
+    """
+
+    def __init__(self, base_path, interval=1.0):
+        self.base_path = base_path
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(self.base_path):
+            dirnames[:] = [name for name in dirnames if not _ignored(name)]
+            for name in filenames:
+                if _ignored(name):
+                    continue
+                path = join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # Removed after listing
+                    continue
+                snapshot[_relpath(path, self.base_path)] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def poll(self, timeout=None):
+        """
+        Return set of paths, relative to `base_path`, of files created,
+        changed or removed since the last call. Wait up to `timeout` seconds
+        for changes, or forever if None.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = set(path for path in set(snapshot) | set(self._snapshot)
+                          if snapshot.get(path) != self._snapshot.get(path))
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return changed
+                time.sleep(min(self.interval, remaining))
+            else:
+                time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Find changed files under `base_path` with inotify.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.inotify = inotify_simple.INotify()
+        self.mask = (inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO |
+                     inotify_simple.flags.MOVED_FROM | inotify_simple.flags.DELETE |
+                     inotify_simple.flags.CREATE)
+        self._dirs = {}
+        for dirpath, dirnames, _ in os.walk(base_path):
+            dirnames[:] = [name for name in dirnames if not _ignored(name)]
+            self._add_watch(dirpath)
+
+    def _add_watch(self, path):
+        self._dirs[self.inotify.add_watch(path, self.mask)] = path
+
+    def poll(self, timeout=None):
+        """
+        Return set of paths, relative to `base_path`, of files created,
+        changed or removed since the last call. Wait up to `timeout` seconds
+        for changes, or forever if None.
+        """
+        changed = set()
+        timeout_ms = None if timeout is None else int(timeout * 1000)
+        for event in self.inotify.read(timeout=timeout_ms):
+            dirpath = self._dirs.get(event.wd)
+            if dirpath is None or not event.name or _ignored(event.name):
+                continue
+            path = join(dirpath, event.name)
+            if event.mask & inotify_simple.flags.ISDIR:
+                if event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                    self._add_watch(path)
+                continue
+            # Files are reported once written and closed, not on creation.
+            if event.mask & inotify_simple.flags.CREATE:
+                continue
+            changed.add(_relpath(path, self.base_path))
+        return changed
+
+    def close(self):
+        self.inotify.close()
+
+
+def make_watcher(base_path, polling=False, interval=1.0):
+    """
+    Return InotifyWatcher if inotify is available, PollingWatcher otherwise
+    or if `polling` is True.
+    """
+    if not polling and inotify_simple is not None:
+        try:
+            return InotifyWatcher(base_path)
+        except OSError:
+            # Not Linux, or out of inotify watches.
+            pass
+    return PollingWatcher(base_path, interval=interval)
+
+
+def changes(watcher, debounce=1.0):
+    """
+    Yield sets of changed paths from `watcher`. Changes are collected until
+    there are none for `debounce` seconds, so a file being written or several
+    files saved together are reported once.
+    """
+    while True:
+        changed = watcher.poll()
+        while True:
+            more = watcher.poll(timeout=debounce)
+            if not more:
+                break
+            changed |= more
+        yield changed
@@ -6,16 +6,21 @@ By default script awaits that dpm credentials are set in ~/.dpm/config and getti
 Publisher and Server to check against from there. You can also set this argguments
 by adding optional -p (--publisher) publisher_name and -s (--server) server_url
 flags when running script
+
+Links are checked concurrently, see `dpm check --help` for the command
+with more options.
 """
 # -*- coding: utf-8 -*-
 from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
-from dpm import client, config
-import subprocess
 import argparse
-import requests
+import sys
+
+from dpm import client, config
+from dpm.utils.linkcheck import LinkChecker
+
 
 def parse_arguments():
     '''
@@ -26,45 +31,46 @@ def parse_arguments():
                      help="Publisher name")
     arg.add_argument("-s", "--server",
                      help="Server domain that DataPackages should be published. Eg: https://www.datapackaged.com")
+    arg.add_argument("-j", "--jobs", type=int, default=16,
+                     help="Number of concurrent requests")
     return arg.parse_args()
 
 
 def get_published_datapackages(publisher, server):
     '''
-    Returns list of urls for published datapackages
+    Yields urls of published datapackages, page by page
     '''
-    if parse_arguments().publisher:
-        publisher=parse_arguments().publisher
-    if parse_arguments().server:
-        server=parse_arguments().server
     if not publisher:
         raise Exception('Publisher name is required - please run same command with  -p publisher-name. Run with -h for help')
     if not server:
         raise Exception('Server name is required - please run same command with  -p server-name. Run with -h for help')
-    if server.endswith('/'):
-        server = server[:-1]
-    url = '%s/api/package/%s'%(server, publisher)
-    res = requests.get(url)
-    datapackages = ['%s/%s/%s'%(server, publisher, package)  for package in res.json().get('data')]
-    return datapackages
+    registry = client.BaseClient(config={'server': server, 'username': publisher,
+                                         'access_token': 'unused'})
+    return (registry.package_url(package, publisher)
+            for package in registry.iter_packages(publisher))
+
 
-def check_200(links):
+def check_200(links, jobs=16):
     '''
     checks if status code for link is 200. returns list ones that is not 200
     '''
     not_ok = []
-    for link in links:
-        status = requests.get(link).status_code
-        if status != 200:
-            not_ok.append({'package': link, 'status': status})
+    for result in LinkChecker(max_workers=jobs).check_all(links):
+        if not result['ok']:
+            not_ok.append({'package': result['url'],
+                           'status': result['status'] or result['error']})
     return not_ok
 
+
 def run():
+    args = parse_arguments()
     try:
         conf = config.read_config()
-        published_packages = get_published_datapackages(publisher=conf.get('username'), server=conf.get('server'))
+        published_packages = get_published_datapackages(
+            publisher=args.publisher or conf.get('username'),
+            server=args.server or conf.get('server'))
         print ('\nChecking if published datapackages are OK ...')
-        problems = check_200(published_packages)
+        problems = check_200(published_packages, jobs=args.jobs)
         print ('\n---------------------------------------------\n')
         if len (problems):
             print ('\nFollowing packages have problems after being published:\n')
@@ -75,6 +81,9 @@ def run():
 
     except Exception as e:
         print(e)
+        sys.exit(1)
+    if problems:
+        sys.exit(1)
 
 if __name__ == '__main__':
     run()
@@ -28,9 +28,15 @@ but elements of the list Eg:
 
 Script can be used form Command Line Interface (CLI).
 `python modify.py --help` for instructions
-'''
 
+To fix many data packages concurrently use `dpm fix <dir>...`, which also
+skips data packages that did not change since the last run.
+'''
 import json
+import os
+
+from dpm.utils.fixers import fix_package, transform
+
 
 class Modify(object):
     def __init__(self, path='datapackage.json'):
@@ -39,33 +45,19 @@ class Modify(object):
     def transform_package(self, data):
         '''Transform data
         '''
-        unsupported_number_types = [
-            'decimal', 'double', 'float', 'binary'
-        ]
-        for item in data:
-            if type(data[item]) is dict:
-                data[item] = [data[item]]
-        for res_idx in range (len(data['resources'])):
-            fields = data['resources'][res_idx]['schema']['fields']
-            for field_idx in range(len(fields)):
-                field = data['resources'][res_idx]['schema']['fields'][field_idx]
-                if field['type'] == 'date':
-                    data['resources'][res_idx]['schema']['fields'][field_idx]['format'] = "any"
-                if field['type'] in unsupported_number_types:
-                    data['resources'][res_idx]['schema']['fields'][field_idx]['type'] = "number"
+        transform(data)
         return data
 
     def modify(self):
         '''Rewrites datapackage.json
         '''
-        transformed_data = self.transform_package(json.load(open(self.path)))
-        jsonfile = open(self.path , 'w')
-        json.dump(transformed_data, jsonfile,  indent=2)
+        fix_package(os.path.dirname(os.path.abspath(self.path)))
 
     def show(self):
         '''See modified datapackage.json as a json string
         '''
-        transformed_data = self.transform_package(json.load(open(self.path)))
+        _, transformed_data = fix_package(os.path.dirname(os.path.abspath(self.path)),
+                                          dry_run=True)
         print (json.dumps(transformed_data, indent=2))
 
 ## ==============================================
@@ -76,8 +68,8 @@ import optparse
 import inspect
 
 def _object_methods(obj):
-    methods = inspect.getmembers(obj, inspect.ismethod)
-    methods = filter(lambda (name, y): not name.startswith('_'), methods)
+    methods = inspect.getmembers(obj, lambda m: inspect.ismethod(m) or inspect.isfunction(m))
+    methods = filter(lambda method: not method[0].startswith('_'), methods)
     methods = dict(methods)
     return methods
 
@@ -46,7 +46,16 @@ setup(
     include_package_data=True,
     install_requires=INSTALL_REQUIRES,
     tests_require=TESTS_REQUIRE,
-    extras_require={'develop': TESTS_REQUIRE},
+    extras_require={
+        'develop': TESTS_REQUIRE,
+        'zstd': ['zstandard'],
+        'watch': ['inotify_simple'],
+        # pyarrow 1.0 and numpy 1.17 need Python 3.5 or later, on older
+        # versions Parquet and Arrow tables are not supported.
+        'parquet:python_version >= "3.5"': ['pyarrow >= 1.0', 'numpy >= 1.17'],
+        # concurrent.futures backport
+        ':python_version < "3"': ['futures'],
+    },
     test_suite='nose.collector',
     entry_points={
         'console_scripts': ['dpm = dpm.main:cli'],
@@ -4,9 +4,12 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import json
+import shutil
 import sys
+import tempfile
+from os.path import join
 from unittest import TestCase
-import json
 
 import responses
 import six
@@ -37,9 +40,9 @@ def jsonify(request):
 
     if not request.body:
         return ''
-    if 'multipart/form-data' in request.headers.get('Content-Type', '') \
-       and request.body.startswith(b'--'):
-        # It is not easy to decode multipart body, so return nothing for now.
+    if 'multipart/form-data' in request.headers.get('Content-Type', ''):
+        # It is not easy to decode multipart body (it could also be a stream),
+        # so return nothing for now.
         return ''
 
     if hasattr(request.body, 'read'):
@@ -49,6 +52,16 @@ def jsonify(request):
     return request.body
 
 
+def read_body(request):
+    """
+    Return the whole request body. Older versions of `responses` pass
+    streamed bodies as file-like objects, newer ones read them into bytes.
+    """
+    if hasattr(request.body, 'read'):
+        return b''.join(iter(request.body.read, b''))
+    return request.body
+
+
 
 class SimpleTestCase(TestCase):
     """
@@ -98,6 +111,10 @@ class BaseTestCase(SimpleTestCase):
             responses.start()
 
         patch('dpm.main.DATAVALIDATE', False).start()
+        # Every test starts with empty index of uploaded files.
+        self._upload_index_dir = tempfile.mkdtemp()
+        patch('dpm.utils.uploads.DEFAULT_INDEX_PATH',
+              join(self._upload_index_dir, 'uploads.json')).start()
 
     def _post_teardown(self):
         """
@@ -107,6 +124,23 @@ class BaseTestCase(SimpleTestCase):
             responses.reset()
             responses.stop()
         patch.stopall()
+        shutil.rmtree(self._upload_index_dir, ignore_errors=True)
+
+
+class LiveServerTestCase(BaseTestCase):
+    """
+    Test case with real sockets, for tests against local server,
+    e.g. tests.fake_registry.FakeRegistry.
+    """
+    mock_requests = False
+
+    def _pre_setup(self):
+        super(LiveServerTestCase, self)._pre_setup()
+        mock_socket.unpatch_socket()
+
+    def _post_teardown(self):
+        mock_socket.patch_socket()
+        super(LiveServerTestCase, self)._post_teardown()
 
 
 class BaseCliTestCase(BaseTestCase):
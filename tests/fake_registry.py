@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the registry server and the bitstore, served over real
+sockets. Use it to test connection pooling, retries and streaming uploads,
+or to load-test dpm on one machine:
+
+    python -m tests.fake_registry --port 5000 --latency 0.05 --bandwidth 10M
+
+and configure dpm with server = http://127.0.0.1:5000
+
+In tests:
+
+    with FakeRegistry(latency=0.01) as registry:
+        Client(path, registry.config).publish()
+        assert registry.published
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import base64
+import hashlib
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+
+import click
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+from dpm.utils.click import ByteSize
+from dpm.utils.scheduler import TokenBucket
+
+CHUNK_SIZE = 64 * 1024
+PACKAGE_URL = re.compile(r'^/api/package/(?P<owner>[^/]+)/(?P<name>[^/]+)(/(?P<action>\w+))?$')
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse pooled connections.
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.registry._record('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.registry._handle(self)
+
+    do_POST = do_DELETE = do_PUT = do_GET
+
+
+class FakeRegistry(object):
+    """
+    Registry server and S3-style bitstore that accept any package.
+
+    :param latency: seconds to wait before every response.
+    :param bandwidth: bytes per second shared by all request bodies.
+    :param error_rate: probability of responding with one of `error_statuses`
+        instead of handling the request. Status 0 drops the connection
+        without response.
+    :param seed: seed for error injection, for reproducible runs.
+
+    Use fail_next() to inject errors into specific requests.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, bandwidth=None,
+                 error_rate=0, error_statuses=(503,), seed=None, username='user',
+                 access_token='access_token'):
+        self.latency = latency
+        self.bucket = TokenBucket(bandwidth, capacity=CHUNK_SIZE) if bandwidth else None
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.username = username
+        self.access_token = access_token
+        self.token = 'fake-token'
+
+        self.requests = []
+        self.uploads = {}
+        self.published = []
+        self.stats = {'connections': 0, 'bytes': 0, 'errors': 0}
+        self._failures = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.server = _HTTPServer((host, port), _Handler)
+        self.server.registry = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    @property
+    def config(self):
+        """ dpm config for this server. """
+        return {'server': self.url, 'username': self.username,
+                'access_token': self.access_token}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name='fake-registry')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, path, status=503, count=1):
+        """
+        Respond with `status` to the next `count` requests whose path starts
+        with `path`. Status 0 drops the connection.
+        """
+        with self._lock:
+            self._failures.append([path, status, count])
+
+    def _record(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _injected_error(self, path):
+        with self._lock:
+            for failure in self._failures:
+                if path.startswith(failure[0]):
+                    failure[2] -= 1
+                    if not failure[2]:
+                        self._failures.remove(failure)
+                    return failure[1]
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_statuses)
+        return None
+
+    def _read_body(self, handler, sink):
+        """
+        Read request body into `sink` file, throttled to the bandwidth.
+        """
+        remaining = int(handler.headers.get('Content-Length') or 0)
+        while remaining:
+            chunk = handler.rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError('Connection closed while reading request body')
+            if self.bucket:
+                self.bucket.consume(len(chunk))
+            sink.write(chunk)
+            remaining -= len(chunk)
+        self._record('bytes', sink.tell())
+        sink.seek(0)
+
+    def _handle(self, handler):
+        path = handler.path.split('?')[0]
+        body = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        try:
+            self._read_body(handler, body)
+            if self.latency:
+                time.sleep(self.latency)
+
+            status = self._injected_error(path)
+            if status is not None:
+                self._record('errors')
+            if status == 0:
+                handler.close_connection = True
+                return
+            if status is not None:
+                status, response = status, {'message': 'Injected error'}
+            else:
+                status, response = self._route(handler, path, body)
+        finally:
+            body.close()
+
+        with self._lock:
+            self.requests.append((handler.command, path, status))
+        payload = json.dumps(response).encode('utf-8') if response is not None else b''
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _route(self, handler, path, body):
+        if path == '/bitstore':
+            return self._upload(handler, body)
+
+        if handler.command == 'POST' and path == '/api/auth/token':
+            data = json.loads(body.read().decode('utf-8'))
+            if (data.get('username'), data.get('secret')) != (self.username, self.access_token):
+                return 401, {'message': 'Invalid credentials'}
+            return 200, {'token': self.token}
+
+        if handler.headers.get('Auth-Token') != self.token:
+            return 401, {'message': 'Invalid token'}
+
+        if handler.command == 'POST' and path == '/api/datastore/authorize':
+            data = json.loads(body.read().decode('utf-8'))
+            prefix = '%s/%s' % (data['metadata']['owner'], data['metadata']['name'])
+            return 200, {'filedata': {
+                name: {
+                    'name': name,
+                    'upload_url': self.url + '/bitstore',
+                    'upload_query': {'key': '%s/%s' % (prefix, name)},
+                } for name in data['filedata']
+            }}
+
+        if handler.command == 'POST' and path == '/api/package/upload':
+            data = json.loads(body.read().decode('utf-8'))
+            with self._lock:
+                self.published.append(data['datapackage'])
+            return 200, {'status': 'queued'}
+
+        if PACKAGE_URL.match(path):
+            return 200, {'status': 'OK'}
+
+        return 404, {'message': 'Not found'}
+
+    def _upload(self, handler, body):
+        """
+        Accept S3-style form upload. Like S3, the file must be the last part
+        of the form.
+        """
+        match = re.search(r'boundary=(\S+)', handler.headers.get('Content-Type', ''))
+        if not match:
+            return 400, {'message': 'Expected multipart/form-data'}
+        boundary = ('--' + match.group(1)).encode('ascii')
+
+        head = body.read(CHUNK_SIZE)
+        header_end = head.find(b'\r\n\r\n', head.find(b'filename="'))
+        if header_end < 0:
+            return 400, {'message': 'No file in the form'}
+        fields = {}
+        for part in head[:header_end].split(boundary)[1:-1]:
+            name = re.search(br'name="([^"]+)"', part).group(1).decode('utf-8')
+            fields[name] = part.split(b'\r\n\r\n', 1)[1][:-2].decode('utf-8')
+
+        # File content ends with \r\n<boundary>--\r\n
+        body.seek(0, 2)
+        size = body.tell() - (header_end + 4) - len(boundary) - 6
+        body.seek(header_end + 4)
+        hash_md5 = hashlib.md5()
+        remaining = size
+        while remaining:
+            chunk = body.read(min(CHUNK_SIZE, remaining))
+            hash_md5.update(chunk)
+            remaining -= len(chunk)
+
+        with self._lock:
+            self.uploads[fields.get('key')] = {
+                'size': size,
+                'md5': base64.b64encode(hash_md5.digest()).decode(),
+                'fields': fields,
+            }
+        return 204, None
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=5000)
+@click.option('--latency', default=0.0, help='Seconds to wait before every response.')
+@click.option('--bandwidth', type=ByteSize(), default=None,
+              help='Bytes per second for all request bodies, e.g. 10M.')
+@click.option('--error-rate', default=0.0, help='Probability of error response.')
+@click.option('--error-status', 'error_statuses', type=int, multiple=True, default=[503],
+              help='Status of injected errors, 0 to drop connection. Can be repeated.')
+@click.option('--seed', type=int, default=None)
+def main(host, port, latency, bandwidth, error_rate, error_statuses, seed):
+    """
+    Run fake registry server and bitstore until interrupted.
+    """
+    registry = FakeRegistry(host, port, latency=latency, bandwidth=bandwidth,
+                            error_rate=error_rate, error_statuses=error_statuses,
+                            seed=seed).start()
+    click.echo('Serving fake registry at %s (username: %s, access_token: %s)' % (
+        registry.url, registry.username, registry.access_token))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        registry.stop()
+        click.echo('%(connections)s connections, %(bytes)s bytes received, '
+                   '%(errors)s injected errors' % registry.stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,11 @@ from __future__ import unicode_literals
 
 import socket
 
+# Names replaced by patch_socket(), with original values.
+_PATCHED = ('socket', '_socketobject', 'SocketType', 'create_connection', 'getaddrinfo',
+            'gethostname', 'gethostbyname', 'inet_aton')
+_originals = {name: socket.__dict__[name] for name in _PATCHED if name in socket.__dict__}
+
 
 class NetworkDisabled(Exception):
     pass
@@ -51,3 +56,14 @@ def patch_socket():
     socket.gethostbyname = socket.__dict__['gethostbyname'] = lambda host: '127.0.0.1'
     socket.inet_aton = socket.__dict__['inet_aton'] = lambda host: '127.0.0.1'
 
+
+
+def unpatch_socket():
+    """
+    Restore real sockets, e.g. for tests against a local server.
+    """
+    for name in _PATCHED:
+        if name in _originals:
+            setattr(socket, name, _originals[name])
+        else:
+            socket.__dict__.pop(name, None)
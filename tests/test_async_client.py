@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from concurrent.futures import wait
+
+import pytest
+import responses
+
+from dpm.client import DpmException, HTTPStatusError
+from dpm.client.async_client import AsyncClient
+from .base import BaseTestCase
+from .base import jsonify
+
+dp1_path = 'tests/fixtures/dp1'
+
+
+class AsyncClientTestCase(BaseTestCase):
+    config = {
+        'username': 'user',
+        'access_token': 'access_token',
+        'server': 'http://127.0.0.1:5000'
+    }
+
+    def setUp(self):
+        # GIVEN the registry server that accepts any user
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        # AND async client
+        self.client = AsyncClient(self.config, max_workers=4)
+
+    def tearDown(self):
+        self.client.close()
+
+
+class AsyncClientPackageOpsTest(AsyncClientTestCase):
+    def test_delete_many_packages_single_auth(self):
+        # GIVEN registry server that accepts deletion of any datapackage
+        for name in ('pkg-1', 'pkg-2', 'pkg-3'):
+            responses.add(
+                responses.DELETE, 'http://127.0.0.1:5000/api/package/user/%s' % name,
+                json={'message': 'OK'},
+                status=200)
+
+        # WHEN delete() is invoked for 3 packages
+        futures = [self.client.delete(name) for name in ('pkg-1', 'pkg-2', 'pkg-3')]
+        wait(futures)
+
+        # THEN all operations should succeed
+        assert all(future.exception() is None for future in futures)
+        # AND client should authenticate only once
+        calls = sorted((x.request.method, x.request.url) for x in responses.calls)
+        self.assertEqual(calls, [
+            ('DELETE', 'http://127.0.0.1:5000/api/package/user/pkg-1'),
+            ('DELETE', 'http://127.0.0.1:5000/api/package/user/pkg-2'),
+            ('DELETE', 'http://127.0.0.1:5000/api/package/user/pkg-3'),
+            ('POST', 'http://127.0.0.1:5000/api/auth/token'),
+        ])
+
+    def test_tag_by_datapackage_dir(self):
+        # GIVEN registry server that accepts tagging of the datapackage
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/user/abc/tag',
+            json={'message': 'OK'},
+            status=200)
+
+        # WHEN tag() is invoked with datapackage dir
+        self.client.tag(dp1_path, 'v1').result()
+
+        # THEN package name should be read from datapackage.json
+        self.assertEqual(
+            [(x.request.method, x.request.url, jsonify(x.request))
+             for x in responses.calls][-1],
+            ('POST', 'http://127.0.0.1:5000/api/package/user/abc/tag', {'version': 'v1'}))
+
+    def test_error_is_stored_in_future(self):
+        # GIVEN registry server that rejects undelete
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/user/pkg/undelete',
+            json={'message': 'not found'},
+            status=404)
+
+        # WHEN undelete() is invoked
+        future = self.client.undelete('pkg')
+
+        # THEN HTTPStatusError should be raised from the future
+        with pytest.raises(HTTPStatusError):
+            future.result()
+
+    def test_validate_missing_datapackage(self):
+        # WHEN validate() is invoked on a dir without datapackage
+        future = self.client.validate('tests/fixtures')
+
+        # THEN DpmException should be raised from the future
+        with pytest.raises(DpmException):
+            future.result()
@@ -4,8 +4,14 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import base64
+import hashlib
+import json
+import shutil
+import tempfile
 import unittest
 import os
+import zlib
 
 import datapackage
 import pytest
@@ -15,7 +21,9 @@ import responses
 from datapackage.exceptions import ValidationError
 from mock import patch, mock_open, MagicMock, Mock
 
-from dpm.client import Client, DpmException, ConfigError, JSONDecodeError, HTTPStatusError, ResourceDoesNotExist, AuthResponseError
+from dpm.utils import columnar
+from dpm.utils.uploads import UploadIndex
+from dpm.client import BaseClient, Client, DpmException, ConfigError, JSONDecodeError, HTTPStatusError, ResourceDoesNotExist, AuthResponseError
 from .base import BaseTestCase
 from .base import jsonify
 
@@ -296,7 +304,7 @@ class ClientPublishSuccessTest(BaseClientTestCase):
                          "README.md": {
                              "md5": '2ODaQHCqodO2B/cbf03lgA==',
                              "size": 24,
-                             "type": 'binary/octet-stream',
+                             "type": 'text/markdown; charset=utf-8',
                              'name': 'README.md'
                          },
                          "datapackage.json": {
@@ -308,7 +316,7 @@ class ClientPublishSuccessTest(BaseClientTestCase):
                          "data/some-data.csv": {
                              "md5": 'Nlu4VmSF8ZT6wK4QjL8iyw==',
                              "size": 12,
-                             "type": 'binary/octet-stream',
+                             "type": 'text/csv; charset=utf-8',
                              'name': 'data/some-data.csv'
                          }
                      }
@@ -323,6 +331,273 @@ class ClientPublishSuccessTest(BaseClientTestCase):
             ])
 
 
+class ClientPublishCompressedTest(BaseClientTestCase):
+    """
+    When user publishes datapackage with compression, text resources should be
+    compressed and described by size and md5 of the compressed bytes.
+    """
+
+    def test_publish_gzip(self):
+        # GIVEN client with gzip compression
+        client = Client(dp1_path, self.config, compress='gzip')
+        # AND the registry server that accepts any user and upload
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/datastore/authorize',
+            json={
+                'filedata': {
+                    path: {'upload_url': 'https://s3.fake/put_here', 'upload_query': {'key': 'k'}}
+                    for path in ('datapackage.json', 'README.md', 'data/some-data.csv')
+                }
+            },
+            status=200)
+        responses.add(
+            responses.POST, 'https://s3.fake/put_here',
+            json={'message': 'OK'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+
+        # WHEN publish() is invoked
+        client.publish()
+
+        # THEN resource should be authorized as gzip-encoded compressed file
+        with open(os.path.join(dp1_path, 'data/some-data.csv'), 'rb') as f:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            compressed = compressor.compress(f.read()) + compressor.flush()
+        filedata = jsonify(responses.calls[1].request)['filedata']
+        self.assertEqual(filedata['data/some-data.csv'], {
+            'md5': base64.b64encode(hashlib.md5(compressed).digest()).decode(),
+            'size': len(compressed),
+            'type': 'text/csv; charset=utf-8',
+            'encoding': 'gzip',
+            'name': 'data/some-data.csv'
+        })
+        # AND other files should be sent as is
+        self.assertNotIn('encoding', filedata['datapackage.json'])
+        self.assertEqual(filedata['README.md']['size'], 24)
+
+    def test_publish_unknown_compression(self):
+        # GIVEN client with unsupported compression
+        client = Client(dp1_path, self.config, compress='rar')
+
+        # WHEN publish() is invoked
+        # THEN DpmException should be raised
+        with pytest.raises(DpmException):
+            client.publish()
+
+
+class ClientPublishDedupTest(BaseClientTestCase):
+    """
+    When user publishes datapackages with files of the same content, each
+    content should be uploaded once and the rest aliased by the server.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with the same lookup table under two paths
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        for name in ('lookup.csv', 'copy.csv'):
+            with open(os.path.join(self.tmpdir, name), 'w') as f:
+                f.write('code,name\n1,a\n')
+        with open(os.path.join(self.tmpdir, 'datapackage.json'), 'w') as f:
+            json.dump({'name': 'abc', 'resources': [{'name': 'lookup', 'path': 'lookup.csv'},
+                                                    {'name': 'copy', 'path': 'copy.csv'}]}, f)
+        # AND the registry server that accepts any user and upload
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        # AND the registry server that accepts aliases by sending no upload url
+        self.accept_aliases = True
+        responses.add_callback(
+            responses.POST, 'http://127.0.0.1:5000/api/datastore/authorize',
+            callback=self.authorize,
+            content_type='application/json')
+        responses.add(
+            responses.POST, 'https://s3.fake/put_here',
+            json={'message': 'OK'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+
+    def authorize(self, request):
+        filedata = {}
+        for path, info in jsonify(request)['filedata'].items():
+            if 'alias' in info and self.accept_aliases:
+                filedata[path] = {}
+            else:
+                filedata[path] = {'upload_url': 'https://s3.fake/put_here',
+                                  'upload_query': {'key': path}}
+        return 200, {}, json.dumps({'filedata': filedata})
+
+    def publish(self, **kwargs):
+        responses.calls.reset()
+        client = Client(self.tmpdir, self.config, **kwargs)
+        client.publish()
+        filedata = jsonify(responses.calls[1].request)['filedata']
+        uploads = len([call for call in responses.calls
+                       if call.request.url == 'https://s3.fake/put_here'])
+        return filedata, uploads, client.scheduler.stats()
+
+    def test_publish_duplicates_once(self):
+        # WHEN publish() is invoked with dedup
+        filedata, uploads, stats = self.publish(dedup=True)
+
+        # THEN the copy should be aliased to the first file and not uploaded
+        self.assertNotIn('alias', filedata['lookup.csv'])
+        self.assertEqual(filedata['copy.csv']['alias'], 'lookup.csv')
+        self.assertEqual(uploads, 2)
+        self.assertEqual((stats['skipped-files'], stats['skipped-bytes']), (1, 14))
+
+    def test_republish_skips_uploaded(self):
+        # GIVEN datapackage published before
+        self.publish(dedup=True)
+
+        # WHEN it is published again
+        filedata, uploads, _ = self.publish(dedup=True)
+
+        # THEN files should be aliased to the uploaded ones, only
+        # datapackage.json should be uploaded
+        self.assertEqual(filedata['lookup.csv']['alias'], 'https://s3.fake/put_here/lookup.csv')
+        self.assertEqual(filedata['copy.csv']['alias'], 'https://s3.fake/put_here/lookup.csv')
+        self.assertEqual(uploads, 1)
+
+    def test_aliases_ignored_by_server(self):
+        # GIVEN datapackage published before
+        self.publish(dedup=True)
+        # AND the server which does not support aliases, or lost the files
+        self.accept_aliases = False
+
+        # WHEN it is published again
+        filedata, uploads, stats = self.publish(dedup=True)
+
+        # THEN every file should be uploaded
+        self.assertEqual(filedata['lookup.csv']['alias'], 'https://s3.fake/put_here/lookup.csv')
+        self.assertEqual(uploads, 3)
+        self.assertEqual(stats['skipped-files'], 0)
+        # AND the index should point to the new upload
+        index = UploadIndex()
+        self.assertEqual(index.get('http://127.0.0.1:5000', filedata['lookup.csv']),
+                         'https://s3.fake/put_here/copy.csv')
+
+    def test_publish_without_dedup(self):
+        # WHEN publish() is invoked without dedup
+        filedata, uploads, _ = self.publish()
+
+        # THEN every file should be uploaded
+        self.assertNotIn('alias', filedata['copy.csv'])
+        self.assertEqual(uploads, 3)
+
+
+@unittest.skipIf(columnar.pyarrow is None, 'pyarrow is not installed')
+class ClientPublishConvertedTest(BaseClientTestCase):
+    """
+    When user publishes datapackage with conversion to Parquet, csv resources
+    should be converted and the uploaded datapackage.json should describe them.
+    """
+
+    def publish(self, convert_mode):
+        client = Client(dp1_path, self.config, convert='parquet', convert_mode=convert_mode)
+        paths = ('datapackage.json', 'README.md', 'data/some-data.csv', 'data/some-data.parquet')
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/datastore/authorize',
+            json={
+                'filedata': {
+                    path: {'upload_url': 'https://s3.fake/put_here', 'upload_query': {'key': 'k'}}
+                    for path in paths
+                }
+            },
+            status=200)
+        responses.add(
+            responses.POST, 'https://s3.fake/put_here',
+            json={'message': 'OK'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+        uploaded = {}
+
+        def upload(client, path, data, local_path=None, file_type=None):
+            with open(local_path or os.path.join(dp1_path, path), 'rb') as f:
+                uploaded[path] = f.read()
+
+        with patch.object(Client, '_upload_file', autospec=True, side_effect=upload):
+            client.publish()
+        return jsonify(responses.calls[1].request)['filedata'], uploaded
+
+    def test_publish_add_parquet(self):
+        # WHEN publish() is invoked with conversion in add mode
+        filedata, uploaded = self.publish('add')
+
+        # THEN Parquet file should be uploaded in addition to csv
+        self.assertEqual(sorted(filedata), ['README.md', 'data/some-data.csv',
+                                            'data/some-data.parquet', 'datapackage.json'])
+        self.assertEqual(filedata['data/some-data.parquet']['type'],
+                         'application/vnd.apache.parquet')
+        self.assertEqual(uploaded['data/some-data.parquet'][:4], b'PAR1')
+        # AND uploaded datapackage.json should describe both resources
+        resources = json.loads(uploaded['datapackage.json'].decode('utf-8'))['resources']
+        self.assertEqual([(resource['name'], resource['path']) for resource in resources],
+                         [('some-resource', 'data/some-data.csv'),
+                          ('some-resource-parquet', 'data/some-data.parquet')])
+        self.assertEqual(filedata['datapackage.json']['size'], len(uploaded['datapackage.json']))
+        # AND local datapackage.json should not change
+        with open(os.path.join(dp1_path, 'datapackage.json')) as f:
+            self.assertEqual(len(json.load(f)['resources']), 1)
+
+    def test_publish_replace_csv(self):
+        # WHEN publish() is invoked with conversion in replace mode
+        filedata, uploaded = self.publish('replace')
+
+        # THEN only Parquet file should be uploaded in place of csv
+        self.assertEqual(sorted(filedata), ['README.md', 'data/some-data.parquet',
+                                            'datapackage.json'])
+        resources = json.loads(uploaded['datapackage.json'].decode('utf-8'))['resources']
+        self.assertEqual(resources, [{
+            'name': 'some-resource',
+            'path': 'data/some-data.parquet',
+            'format': 'parquet',
+            'mediatype': 'application/vnd.apache.parquet',
+        }])
+
+
+    def test_convert_csv_dialect(self):
+        # GIVEN datapackage with latin-1 csv resource delimited by ;
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        with open(os.path.join(tmpdir, 'data.csv'), 'wb') as f:
+            f.write('id;name\n1;Zürich\n'.encode('latin-1'))
+        with open(os.path.join(tmpdir, 'datapackage.json'), 'w') as f:
+            json.dump({'name': 'some-datapackage', 'resources': [{
+                'name': 'data', 'path': 'data.csv', 'encoding': 'latin-1',
+                'dialect': {'delimiter': ';'},
+                'schema': {'fields': [{'name': 'id', 'type': 'integer'},
+                                      {'name': 'name', 'type': 'string'}]},
+            }]}, f)
+        client = Client(tmpdir, self.config, convert='parquet', convert_mode='replace')
+
+        # WHEN the resource is converted to Parquet
+        local_paths = {}
+        client._convert_files(['datapackage.json', 'data.csv'], tmpdir, local_paths)
+
+        # THEN it should be parsed with the dialect and encoding of the resource
+        table = columnar.pyarrow.parquet.read_table(local_paths['data.parquet'])
+        self.assertEqual(table.to_pydict(), {'id': [1], 'name': ['Zürich']})
+
+
 class PublishInvalidTest(BaseClientTestCase):
     """
     When user publishes datapackage, which is deemed invalid by server, the error message should
@@ -504,3 +779,49 @@ class ClientEnsureAuthSuccessTest(BaseClientTestCase):
         # AND client should store the token
         assert client.token == '12345'
 
+
+
+class ClientIterPackagesTest(BaseClientTestCase):
+    """
+    `BaseClient.iter_packages()` should follow pages of package listing.
+    """
+    url = 'http://127.0.0.1:5000/api/package/user'
+
+    def test_iter_packages_next_url_and_cursor(self):
+        # GIVEN server listing packages on three pages: with next url, with cursor, last
+        responses.add(responses.GET, self.url,
+                      json={'data': ['a', 'b'], 'next': self.url + '?page=2'})
+        responses.add(responses.GET, self.url, json={'data': ['c'], 'cursor': 'xyz'})
+        responses.add(responses.GET, self.url, json={'data': ['d']})
+
+        # WHEN packages are iterated
+        packages = list(BaseClient(self.config).iter_packages(page_size=2))
+
+        # THEN packages of all pages should be yielded
+        assert packages == ['a', 'b', 'c', 'd']
+        # AND pages should be requested with page size and cursor
+        urls = [call.request.url for call in responses.calls]
+        assert urls == [self.url + '?per_page=2', self.url + '?page=2',
+                        self.url + '?per_page=2&cursor=xyz']
+
+    def test_iter_packages_link_header(self):
+        # GIVEN server paginating with Link header
+        responses.add(responses.GET, self.url, json={'data': ['a']},
+                      headers={'Link': '<%s?page=2>; rel="next"' % self.url})
+        responses.add(responses.GET, self.url, json={'data': ['b']})
+
+        # WHEN packages of other publisher are iterated
+        packages = BaseClient(self.config).iter_packages('user')
+
+        # THEN packages should be yielded lazily
+        assert next(packages) == 'a'
+        assert list(packages) == ['b']
+
+    def test_iter_packages_not_paginated(self):
+        # GIVEN server listing all packages at once
+        responses.add(responses.GET, self.url, json={'data': ['a', 'b']})
+
+        # WHEN packages are iterated
+        # THEN all packages should be yielded
+        assert list(BaseClient(self.config).iter_packages()) == ['a', 'b']
+        assert len(responses.calls) == 1
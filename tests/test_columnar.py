@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from datapackage import DataPackage
+from mock import patch
+
+from dpm.client import validate_data
+from dpm.utils import columnar
+
+if columnar.pyarrow is not None:
+    import pyarrow
+    import pyarrow.parquet
+
+
+SCHEMA = {
+    'fields': [
+        {'name': 'id', 'type': 'integer', 'constraints': {'required': True, 'unique': True}},
+        {'name': 'name', 'type': 'string'},
+        {'name': 'score', 'type': 'number', 'constraints': {'minimum': 0}},
+    ],
+}
+
+
+@unittest.skipIf(columnar.pyarrow is None, 'pyarrow is not installed')
+class ColumnarTest(unittest.TestCase):
+    """
+    Parquet and Arrow tables should be validated by columns.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name, columns, row_group_size=None):
+        table = pyarrow.Table.from_arrays([pyarrow.array(values) for values in columns.values()],
+                                          names=list(columns))
+        path = join(self.tmpdir, name)
+        if name.endswith('.parquet'):
+            pyarrow.parquet.write_table(table, path, row_group_size=row_group_size)
+        else:
+            with pyarrow.OSFile(path, 'wb') as f:
+                writer = pyarrow.ipc.new_file(f, table.schema)
+                writer.write_table(table)
+                writer.close()
+        return path
+
+    def test_validate_invalid_table(self):
+        for name in ('data.parquet', 'data.arrow'):
+            # GIVEN table with duplicate id, missing id and negative score
+            path = self.write(name, {
+                'id': [1, 2, 2, None],
+                'name': ['a', 'b', 'c', 'd'],
+                'score': [1.0, 5.0, -1.0, 2.0],
+            })
+
+            # WHEN it is validated
+            report = columnar.validate_table(path, SCHEMA)
+
+            # THEN errors should be reported with row numbers as in csv tables
+            self.assertFalse(report['valid'])
+            self.assertEqual(report['row-count'], 4)
+            self.assertEqual([(error['code'], error['row-number']) for error in report['errors']],
+                             [('unique-constraint', 4), ('minimum-constraint', 4),
+                              ('required-constraint', 5)])
+
+    def test_header_and_type_errors(self):
+        # GIVEN table with text ids and without score column
+        path = self.write('data.parquet', {'id': ['1', '2'], 'name': ['a', 'b']})
+
+        # WHEN it is validated
+        report = columnar.validate_table(path, SCHEMA)
+
+        # THEN wrong type and missing column should be reported
+        self.assertEqual([(error['code'], error['column-number']) for error in report['errors']],
+                         [('non-castable-value', 1), ('missing-header', 3)])
+
+    def test_parquet_statistics(self):
+        # GIVEN valid parquet table in two row groups
+        path = self.write('data.parquet', {
+            'id': [1, 2, 3], 'name': ['a', 'b', 'c'], 'score': [1.0, 2.0, 3.0]},
+            row_group_size=2)
+        schema = {'fields': [
+            {'name': 'id', 'type': 'integer', 'constraints': {'required': True}},
+            {'name': 'name', 'type': 'string'},
+            {'name': 'score', 'type': 'number', 'constraints': {'minimum': 0}},
+        ]}
+
+        # WHEN it is validated
+        with patch.object(columnar.ColumnarTable, 'read', autospec=True,
+                          side_effect=columnar.ColumnarTable.read) as read:
+            report = columnar.validate_table(path, schema)
+
+        # THEN constraints should be checked by row group statistics only
+        self.assertTrue(report['valid'])
+        self.assertEqual(read.call_args[0][1], [])
+
+    def test_validate_data_package(self):
+        # GIVEN data package with csv table referencing parquet table
+        self.write('countries.parquet', {'code': [1, 2], 'name': ['France', 'Spain']})
+        with io.open(join(self.tmpdir, 'cities.csv'), 'w') as f:
+            f.write('name,country\nParis,1\nRome,3\n')
+        with io.open(join(self.tmpdir, 'datapackage.json'), 'w') as f:
+            f.write(json.dumps({
+                'name': 'some-datapackage',
+                'resources': [{
+                    'name': 'countries',
+                    'path': 'countries.parquet',
+                    'schema': {'fields': [{'name': 'code', 'type': 'integer'},
+                                          {'name': 'name', 'type': 'string'}],
+                               'primaryKey': 'code'},
+                }, {
+                    'name': 'cities',
+                    'path': 'cities.csv',
+                    'schema': {
+                        'fields': [{'name': 'name', 'type': 'string'},
+                                   {'name': 'country', 'type': 'integer'}],
+                        'foreignKeys': [{'fields': 'country',
+                                         'reference': {'resource': 'countries',
+                                                       'fields': 'code'}}],
+                    },
+                }],
+            }))
+
+        # WHEN the data package is validated
+        report = validate_data(DataPackage(join(self.tmpdir, 'datapackage.json')))
+
+        # THEN both tables should be validated, with foreign keys to parquet
+        self.assertEqual(report['table-count'], 2)
+        self.assertEqual(report['tables'][0]['format'], 'parquet')
+        self.assertTrue(report['tables'][0]['valid'])
+        self.assertEqual([error['code'] for error in report['errors']], ['foreign-key'])
+
+    def test_datetime_foreign_keys(self):
+        # GIVEN parquet and csv tables referencing each other by datetime keys
+        self.write('events.parquet', {'at': [datetime.datetime(2017, 1, 1, 10),
+                                             datetime.datetime(2017, 1, 2, 10)]})
+        with io.open(join(self.tmpdir, 'log.csv'), 'w') as f:
+            f.write('at\n2017-01-01T10:00:00Z\n2017-01-03T10:00:00Z\n')
+        schema = {'fields': [{'name': 'at', 'type': 'datetime'}]}
+
+        def reference(resource):
+            return [{'fields': 'at', 'reference': {'resource': resource, 'fields': 'at'}}]
+        with io.open(join(self.tmpdir, 'datapackage.json'), 'w') as f:
+            f.write(json.dumps({
+                'name': 'some-datapackage',
+                'resources': [
+                    {'name': 'events', 'path': 'events.parquet',
+                     'schema': dict(schema, foreignKeys=reference('log'))},
+                    {'name': 'log', 'path': 'log.csv',
+                     'schema': dict(schema, foreignKeys=reference('events'))},
+                ],
+            }))
+
+        # WHEN the data package is validated
+        report = validate_data(DataPackage(join(self.tmpdir, 'datapackage.json')))
+
+        # THEN only the datetimes missing in the other table should be reported
+        self.assertEqual([(error['code'], error['row-number']) for error in report['errors']],
+                         [('foreign-key', 3), ('foreign-key', 3)])
+
+    def test_csv_to_parquet_dialect(self):
+        # GIVEN csv without header, with | quotes and day-first dates
+        source = join(self.tmpdir, 'data.csv')
+        with io.open(source, 'w') as f:
+            f.write('1\t|a\tb|\t31/01/2017\n')
+        schema = {'fields': [{'name': 'id', 'type': 'integer'},
+                             {'name': 'name', 'type': 'string'},
+                             {'name': 'day', 'type': 'date', 'format': '%d/%m/%Y'}]}
+        dialect = {'delimiter': '\t', 'quoteChar': '|', 'header': False}
+
+        # WHEN it is converted to Parquet with its dialect
+        target = join(self.tmpdir, 'data.parquet')
+        columnar.csv_to_parquet(source, target, schema, dialect=dialect)
+
+        # THEN values should be parsed with the dialect and date format
+        self.assertEqual(pyarrow.parquet.read_table(target).to_pydict(), {
+            'id': [1], 'name': ['a\tb'], 'day': [datetime.date(2017, 1, 31)]})
+
+    def test_unsupported_csv_dialect(self):
+        # GIVEN csv with comments
+        source = join(self.tmpdir, 'data.csv')
+        with io.open(source, 'w') as f:
+            f.write('id\n# comment\n1\n')
+
+        # WHEN it is converted to Parquet
+        # THEN the dialect should be refused
+        with self.assertRaisesRegexp(ValueError, 'commentChar'):
+            columnar.csv_to_parquet(source, join(self.tmpdir, 'data.parquet'),
+                                    dialect={'commentChar': '#'})
+
+    def test_numpy_is_required(self):
+        # WHEN numpy is not installed
+        # THEN error should name the missing package
+        with patch.object(columnar, 'numpy', None), \
+                self.assertRaisesRegexp(ValueError, 'pip install "numpy>=1.17"'):
+            columnar.validate_table(self.write('data.parquet', {'id': [1]}), SCHEMA)
+
+    def test_old_python(self):
+        # WHEN Python is older than 3.5
+        # THEN error should name the required version
+        with patch.object(columnar.sys, 'version_info', (3, 4, 0)), \
+                self.assertRaisesRegexp(ValueError, 'Python 3.5 or later'):
+            columnar.validate_table(self.write('data.parquet', {'id': [1]}), SCHEMA)
+
+    def test_old_pyarrow(self):
+        # WHEN installed pyarrow is too old
+        # THEN error should name the required version
+        with patch.object(columnar.pyarrow, '__version__', '0.17.1'), \
+                self.assertRaisesRegexp(ValueError, r'pyarrow package, version 1\.0 or later'):
+            columnar.validate_table(self.write('data.parquet', {'id': [1]}), SCHEMA)
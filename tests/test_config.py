@@ -5,6 +5,7 @@ import os
 import pytest
 
 import dpm.config
+from dpm.client import Client
 
 class TestConfig(unittest.TestCase):
 
@@ -28,3 +29,13 @@ class TestConfig(unittest.TestCase):
         assert config['username'] == 'xyz'
         del os.environ['DPM_USERNAME']
 
+    def test_http_cache_size(self):
+        config_path = 'tests/fixtures/config.ini'
+        config = dpm.config.read_config(config_path)
+        assert config['http_cache_size'] == '500M'
+        assert Client('tests/fixtures/dp1', config).http_cache.max_size == 500 * 1024 ** 2
+
+        os.environ['DPM_HTTP_CACHE_SIZE'] = '2G'
+        config = dpm.config.read_config(config_path)
+        assert config['http_cache_size'] == '2G'
+        del os.environ['DPM_HTTP_CACHE_SIZE']
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import csv
+import io
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mock import patch
+from tabulator import Stream
+
+from dpm.utils.csvreader import MmapCSVParser
+from dpm.utils.validation import DataValidator
+
+
+class MmapCSVParserTest(unittest.TestCase):
+    """
+    MmapCSVParser should read the same rows as the default tabulator parser.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = join(self.tmpdir, 'data.csv')
+
+    def _read(self, **kwargs):
+        with Stream(self.path, headers=1, **kwargs) as stream:
+            return stream.headers, stream.read()
+
+    def test_same_rows_as_default_parser(self):
+        # GIVEN csv file with quoted delimiters, multiline values and unicode
+        with io.open(self.path, 'wb') as f:
+            f.write('id,name,comment\r\n'
+                    '1,Žluť,plain\r\n'
+                    '2,"a, b","say ""hi"""\r\n'
+                    '3,c,"two\nlines"\r\n'
+                    '\r\n'
+                    '4,d,\r\n'.encode('utf-8'))
+
+        # WHEN it is read with MmapCSVParser
+        result = self._read(custom_parsers={'csv': MmapCSVParser})
+
+        # THEN headers and rows should be the same as with the default parser
+        self.assertEqual(result, self._read())
+        self.assertEqual(result[1][1], ['2', 'a, b', 'say "hi"'])
+
+    def test_delimiter_option(self):
+        # GIVEN csv file with semicolon delimiter and BOM
+        with io.open(self.path, 'wb') as f:
+            f.write(b'\xef\xbb\xbfa;b\n1;2\n3;4\n')
+
+        # WHEN it is read with MmapCSVParser and delimiter option
+        headers, rows = self._read(custom_parsers={'csv': MmapCSVParser}, delimiter=';')
+
+        # THEN rows should be split on the delimiter and BOM skipped
+        self.assertEqual(headers, ['a', 'b'])
+        self.assertEqual(rows, [['1', '2'], ['3', '4']])
+
+    def test_quotes_inside_values(self):
+        # GIVEN csv file with quotes inside unquoted values
+        with io.open(self.path, 'wb') as f:
+            f.write(b'id,size,name\n1,5 10",a\n2,"x"y,b\n3,6",c\n')
+
+        # WHEN it is read with MmapCSVParser
+        result = self._read(custom_parsers={'csv': MmapCSVParser})
+
+        # THEN the quotes should not join rows, as with the default parser
+        self.assertEqual(result, self._read())
+        self.assertEqual(result[1], [['1', '5 10"', 'a'], ['2', 'xy', 'b'], ['3', '6"', 'c']])
+
+    def test_unparsable_row(self):
+        # GIVEN csv file with a quoted row after the sample
+        with io.open(self.path, 'wb') as f:
+            f.write(''.join(['id,name\n'] + ['%d,a\n' % i for i in range(200)] +
+                            ['2,"b"\n']).encode('utf-8'))
+        schema = {'fields': [{'name': 'id', 'type': 'integer'},
+                             {'name': 'name', 'type': 'string'}]}
+
+        # WHEN it is validated with mmap reader, and the csv module can not parse the row
+        with patch('dpm.utils.csvreader._csv_reader', side_effect=csv.Error('bad row')):
+            table = DataValidator(reader='mmap').validate_table(self.path, schema)
+
+        # THEN format error should be reported
+        self.assertFalse(table['valid'])
+        self.assertEqual([e['code'] for e in table['errors']], ['format-error'])
+        self.assertIn('row 202', table['errors'][0]['message'])
+
+    def test_validate_table(self):
+        # GIVEN csv file with invalid integer
+        with io.open(self.path, 'w') as f:
+            f.write('id,name\n1,a\nx,b\n')
+        schema = {'fields': [{'name': 'id', 'type': 'integer'},
+                             {'name': 'name', 'type': 'string'}]}
+
+        # WHEN it is validated with mmap reader
+        validator = DataValidator(reader='mmap')
+        table = validator.validate_table(self.path, schema)
+
+        # THEN the error should be reported as with the default reader
+        default = DataValidator().validate_table(self.path, schema)
+        self.assertFalse(table['valid'])
+        self.assertEqual([e['code'] for e in table['errors']],
+                         [e['code'] for e in default['errors']])
+        self.assertEqual(table['row-count'], default['row-count'])
+
+    def test_unknown_reader(self):
+        # WHEN validator is created with unknown reader
+        # THEN ValueError should be raised
+        self.assertRaises(ValueError, DataValidator, reader='xml')
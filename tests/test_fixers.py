@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mock import patch
+
+from dpm.utils.fixers import FixCache, fix_packages, transform
+
+
+class TransformTest(unittest.TestCase):
+    """
+    transform() should fix common issues of the descriptor.
+    """
+
+    def test_transform(self):
+        # GIVEN descriptor with metadata object and unsupported field types
+        descriptor = {
+            'name': 'example',
+            'licenses': {'name': 'example license'},
+            'resources': [
+                {'path': 'a.csv', 'schema': {'fields': [
+                    {'name': 'a', 'type': 'date', 'format': 'YYYY'},
+                    {'name': 'b', 'type': 'decimal'},
+                ]}},
+                {'path': 'b.csv'},
+            ]
+        }
+
+        # WHEN it is transformed
+        applied = transform(descriptor)
+
+        # THEN all issues should be fixed
+        self.assertEqual(applied, ['list-metadata', 'date-format', 'number-type'])
+        self.assertEqual(descriptor['licenses'], [{'name': 'example license'}])
+        self.assertEqual(descriptor['resources'][0]['schema']['fields'], [
+            {'name': 'a', 'type': 'date', 'format': 'any'},
+            {'name': 'b', 'type': 'number'},
+        ])
+
+        # AND fixed descriptor should not be changed again
+        self.assertEqual(transform(descriptor), [])
+
+
+class FixPackagesTest(unittest.TestCase):
+    """
+    fix_packages() should fix datapackages and skip unchanged ones next time.
+    """
+
+    def setUp(self):
+        # GIVEN datapackages with and without issues
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.dirs = []
+        for idx in range(4):
+            path = join(self.tmpdir, 'dp%s' % idx)
+            os.mkdir(path)
+            self.write(path, {
+                'name': 'dp%s' % idx,
+                'resources': [{'path': 'a.csv', 'schema': {'fields': [
+                    {'name': 'a', 'type': 'float' if idx % 2 else 'number'}]}}],
+            })
+            self.dirs.append(path)
+        self.cache = FixCache(join(self.tmpdir, 'cache.json'))
+
+    def write(self, path, descriptor):
+        with io.open(join(path, 'datapackage.json'), 'w') as f:
+            f.write(json.dumps(descriptor))
+
+    def fix(self):
+        return [status for _, status, _, _ in
+                fix_packages(self.dirs, cache=self.cache, max_workers=2)]
+
+    def test_fix_packages(self):
+        # WHEN datapackages are fixed
+        # THEN datapackages with issues should be fixed
+        self.assertEqual(self.fix(), ['unchanged', 'fixed', 'unchanged', 'fixed'])
+        with io.open(join(self.dirs[1], 'datapackage.json')) as f:
+            self.assertEqual(json.load(f)['resources'][0]['schema']['fields'][0]['type'],
+                             'number')
+
+        # WHEN datapackages are fixed again with saved cache, after one is changed
+        self.cache.save()
+        self.cache = FixCache(self.cache.path)
+        self.write(self.dirs[2], {'name': 'dp2', 'licenses': {'name': 'license'}})
+        with patch('dpm.utils.fixers.json.loads', side_effect=json.loads) as loads:
+            statuses = self.fix()
+
+        # THEN only the changed datapackage should be parsed and fixed
+        self.assertEqual(statuses, ['cached', 'cached', 'fixed', 'cached'])
+        self.assertEqual(loads.call_count, 1)
+
+    def test_invalid_descriptors(self):
+        # GIVEN datapackages with descriptors which are not json objects
+        with io.open(join(self.dirs[1], 'datapackage.json'), 'w') as f:
+            f.write('["dp1"]')
+        with io.open(join(self.dirs[2], 'datapackage.json'), 'w') as f:
+            f.write('"dp2"')
+
+        # WHEN datapackages are fixed
+        results = list(fix_packages(self.dirs, max_workers=2))
+
+        # THEN only these datapackages should fail
+        self.assertEqual([status for _, status, _, _ in results],
+                         ['unchanged', 'error', 'error', 'fixed'])
+        self.assertIn('should contain a json object', str(results[1][3]))
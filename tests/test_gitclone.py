@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from concurrent.futures import Future
+from os.path import exists, join
+
+from mock import patch
+
+from dpm.client.async_client import AsyncClient
+from dpm.utils.gitclone import GitError, cache_path, read_url_list, sparse_clone
+
+try:
+    subprocess.check_output(['git', '--version'])
+    HAS_GIT = True
+except (OSError, subprocess.CalledProcessError):
+    HAS_GIT = False
+
+
+@unittest.skipUnless(HAS_GIT, 'git is not installed')
+class SparseCloneTest(unittest.TestCase):
+    """
+    sparse_clone() should check out only datapackage.json, readme and
+    resources, and update the cached clone with fetch.
+    """
+
+    def setUp(self):
+        # GIVEN git repository with datapackage and unrelated files
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.repo = join(self.tmpdir, 'repo')
+        self.cache_dir = join(self.tmpdir, 'cache')
+        os.makedirs(join(self.repo, 'data'))
+        self.git('init', '--quiet')
+        self.write('datapackage.json', json.dumps({
+            'name': 'some-datapackage',
+            'resources': [{'name': 'a', 'path': './data/a.csv'}],
+        }))
+        self.write('data/a.csv', 'id\n1\n')
+        self.write('data/other.csv', 'id\n1\n')
+        self.write('README.md', 'Readme')
+        self.commit()
+        self.url = 'file://' + self.repo
+
+    def git(self, *args):
+        subprocess.check_output(('git', '-c', 'user.name=dpm', '-c', 'user.email=dpm@localhost')
+                                + args, cwd=self.repo)
+
+    def write(self, path, content):
+        with io.open(join(self.repo, path), 'w') as f:
+            f.write(content)
+
+    def commit(self):
+        self.git('add', '.')
+        self.git('commit', '--quiet', '-m', 'Update')
+
+    def files(self, path):
+        return sorted(os.path.relpath(join(dirpath, name), path)
+                      for dirpath, dirnames, filenames in os.walk(path)
+                      if '.git' not in dirpath.split(os.sep)
+                      for name in filenames)
+
+    def test_sparse_clone(self):
+        # WHEN repository is cloned
+        path = sparse_clone(self.url, self.cache_dir)
+
+        # THEN only datapackage files should be checked out into the cache
+        self.assertEqual(path, cache_path(self.url, self.cache_dir))
+        self.assertEqual(self.files(path), ['README.md', 'data/a.csv', 'datapackage.json'])
+
+        # WHEN repository is changed and cloned again
+        self.write('data/a.csv', 'id\n2\n')
+        self.commit()
+        self.assertEqual(sparse_clone(self.url, self.cache_dir), path)
+
+        # THEN the clone should be updated
+        with io.open(join(path, 'data', 'a.csv')) as f:
+            self.assertEqual(f.read(), 'id\n2\n')
+
+    def test_not_a_repository(self):
+        # WHEN url is not a git repository
+        # THEN error should be raised
+        with self.assertRaises(GitError):
+            sparse_clone('file://' + join(self.tmpdir, 'missing'), self.cache_dir)
+
+    def test_url_is_not_an_option(self):
+        # WHEN url looks like a git option
+        url = '--upload-pack=touch pwned'
+        with patch('dpm.utils.gitclone._git', side_effect=GitError) as git, \
+                self.assertRaises(GitError):
+            sparse_clone(url, self.cache_dir)
+
+        # THEN it should be passed to git clone after the end of options
+        self.assertEqual(git.call_args[0][0][-3:], ['--', url, cache_path(url, self.cache_dir)])
+
+
+class ImportGitTest(unittest.TestCase):
+    """
+    AsyncClient.import_git() should publish every cloned repository once.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        with io.open(join(self.tmpdir, 'urls.txt'), 'w') as f:
+            f.write('# datasets\nhttps://git/a\n\nhttps://git/b\nhttps://git/broken\nhttps://git/a\n'
+                    '--upload-pack=touch pwned\nfile:///home/user/repo\n')
+
+    def test_import_git(self):
+        def clone(url, cache_dir):
+            if url.endswith('broken'):
+                raise GitError('not found')
+            return url.replace('https://git', cache_dir)
+
+        def publish(path, validate=True):
+            future = Future()
+            future.set_result('published ' + path)
+            return future
+
+        # WHEN urls from a list are imported
+        urls = read_url_list(join(self.tmpdir, 'urls.txt'))
+        with patch('dpm.client.async_client.sparse_clone', clone), \
+                patch.object(AsyncClient, 'publish', side_effect=publish), \
+                AsyncClient({}, max_workers=2) as client:
+            results = sorted((url, result, str(error) if error else None)
+                             for url, result, error in client.import_git(urls, '/cache'))
+
+        # THEN every repository should be imported once and errors reported
+        # AND urls which are not remote repositories should not be cloned
+        unsupported = 'Unsupported repository url: %s. Url should start with ' \
+                      'https://, http://, ssh://, git://'
+        self.assertEqual(results, [
+            ('--upload-pack=touch pwned', None, unsupported % '--upload-pack=touch pwned'),
+            ('file:///home/user/repo', None, unsupported % 'file:///home/user/repo'),
+            ('https://git/a', 'published /cache/a', None),
+            ('https://git/b', 'published /cache/b', None),
+            ('https://git/broken', None, 'not found'),
+        ])
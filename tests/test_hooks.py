@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+
+import responses
+from mock import Mock, patch
+
+from dpm.client import Client
+from dpm.client.hooks import Hooks, PrometheusTextfileHooks, hooks_from_url, StatsdHooks
+from .base import BaseTestCase, read_body
+
+dp1_path = 'tests/fixtures/dp1'
+
+
+class RecordingHooks(Hooks):
+    def __init__(self):
+        self.events = []
+
+    def on_request_start(self, method, url):
+        self.events.append(('start', method, url))
+
+    def on_request_end(self, method, url, status_code, elapsed, error=None):
+        self.events.append(('end', method, url, status_code))
+
+    def on_upload_progress(self, path, sent, total, nbytes):
+        self.events.append(('progress', path, sent, total))
+
+    def on_retry(self, method, url, attempt, error):
+        self.events.append(('retry', method, url, attempt))
+
+
+class ClientHooksTest(BaseTestCase):
+    config = {
+        'username': 'user',
+        'access_token': 'access_token',
+        'server': 'http://127.0.0.1:5000'
+    }
+
+    def setUp(self):
+        # GIVEN the registry server that accepts any user and upload
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/datastore/authorize',
+            json={
+                'filedata': {
+                    path: {'upload_url': 'https://s3.fake/put_here', 'upload_query': {'key': 'k'}}
+                    for path in ('datapackage.json', 'README.md', 'data/some-data.csv')
+                }
+            },
+            status=200)
+        # AND the bitstore which reads the uploaded body
+        responses.add_callback(
+            responses.POST, 'https://s3.fake/put_here',
+            callback=lambda request: (200, {}, read_body(request) and '{}'))
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+
+    def test_publish_reports_requests_and_upload_progress(self):
+        # GIVEN client with registered hooks
+        hooks = RecordingHooks()
+        client = Client(dp1_path, self.config, hooks=[hooks])
+
+        # WHEN publish() is invoked
+        client.publish()
+
+        # THEN every request should be reported when sent and when finished
+        ends = [event[1:] for event in hooks.events if event[0] == 'end']
+        self.assertEqual(ends, [
+            ('POST', 'http://127.0.0.1:5000/api/auth/token', 200),
+            ('POST', 'http://127.0.0.1:5000/api/datastore/authorize', 200),
+            ('POST', 'https://s3.fake/put_here', 200),
+            ('POST', 'https://s3.fake/put_here', 200),
+            ('POST', 'https://s3.fake/put_here', 200),
+            ('POST', 'http://127.0.0.1:5000/api/package/upload', 200),
+        ])
+        self.assertEqual(len([e for e in hooks.events if e[0] == 'start']), 6)
+
+        # AND upload progress should reach the file size
+        progress = [event for event in hooks.events if event[0] == 'progress']
+        self.assertIn(('progress', 'README.md', 24, 24), progress)
+
+    @patch('dpm.client.time.sleep')
+    def test_retry_unavailable_server(self, sleep):
+        # GIVEN client with hooks and retries
+        hooks = RecordingHooks()
+        client = Client(dp1_path, self.config, hooks=[hooks], retries=2)
+        # AND the server which is unavailable on the first request
+        responses.reset()
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'message': 'Service Unavailable'},
+            status=503)
+        responses.add(
+            responses.POST, 'http://127.0.0.1:5000/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+
+        # WHEN client authenticates
+        client._ensure_auth()
+
+        # THEN the request should be retried once after backoff
+        self.assertEqual(client.token, 'blabla')
+        self.assertEqual([e for e in hooks.events if e[0] == 'retry'],
+                         [('retry', 'POST', 'http://127.0.0.1:5000/api/auth/token', 1)])
+        sleep.assert_called_once_with(0.5)
+
+
+class ConcurrentUploadProgressTest(BaseTestCase):
+    config = ClientHooksTest.config
+
+    def test_same_paths_of_two_packages(self):
+        # GIVEN metrics hooks shared by clients of two packages
+        prometheus = PrometheusTextfileHooks('metrics.prom')
+        statsd = StatsdHooks()
+        statsd._socket = Mock()
+        first = Client(dp1_path, self.config, hooks=[prometheus, statsd])
+        second = Client(dp1_path, self.config, hooks=[prometheus, statsd])
+
+        # WHEN both upload data.csv at the same time, with interleaved reads
+        first_read = first._upload_progress('data.csv', 100)
+        second_read = second._upload_progress('data.csv', 100)
+        for read, nbytes in ((first_read, 60), (second_read, 30),
+                             (first_read, 40), (second_read, 70)):
+            read(nbytes)
+
+        # THEN every uploaded byte should be counted once
+        self.assertIn('dpm_upload_bytes_total 200', prometheus.render().splitlines())
+        packets = [call[0][0] for call in statsd._socket.sendto.call_args_list]
+        self.assertEqual(packets, [b'dpm.upload.bytes:60|c', b'dpm.upload.bytes:30|c',
+                                   b'dpm.upload.bytes:40|c', b'dpm.upload.bytes:70|c'])
+
+
+class PrometheusTextfileHooksTest(BaseTestCase):
+
+    def test_flush_writes_histogram_and_counters(self):
+        # GIVEN prometheus hooks which saw some events
+        metrics = hooks_from_url('prometheus://metrics.prom')
+        self.assertIsInstance(metrics, PrometheusTextfileHooks)
+        metrics.on_request_end('POST', 'http://x', 200, 0.2)
+        metrics.on_request_end('POST', 'http://x', None, 3, error=IOError())
+        metrics.on_upload_progress('data.csv', 60, 100, 60)
+        metrics.on_upload_progress('data.csv', 100, 100, 40)
+        metrics.on_validation_table_done({'row-count': 10, 'error-count': 1})
+
+        # WHEN metrics are flushed
+        metrics.flush()
+
+        # THEN the file should contain metrics in Prometheus text format
+        with open('metrics.prom') as f:
+            text = f.read()
+        for line in ('dpm_request_duration_seconds_bucket{method="POST",le="0.25"} 1',
+                     'dpm_request_duration_seconds_bucket{method="POST",le="5"} 2',
+                     'dpm_request_duration_seconds_count{method="POST"} 2',
+                     'dpm_requests_total{method="POST",status="200"} 1',
+                     'dpm_requests_total{method="POST",status="error"} 1',
+                     'dpm_upload_bytes_total 100',
+                     'dpm_validated_rows_total 10'):
+            self.assertIn(line, text.splitlines())
+        os.remove('metrics.prom')
+
+
+class StatsdHooksTest(BaseTestCase):
+
+    def test_request_end_sends_timer_and_counter(self):
+        metrics = hooks_from_url('statsd://stats.local:9125/pipeline')
+        self.assertIsInstance(metrics, StatsdHooks)
+        metrics._socket = Mock()
+
+        metrics.on_request_end('GET', 'http://x', 404, 0.25)
+
+        packets = [call[0][0] for call in metrics._socket.sendto.call_args_list]
+        self.assertEqual(packets, [b'pipeline.request.time:250|ms', b'pipeline.request.404:1|c'])
+        self.assertEqual(metrics._socket.sendto.call_args[0][1], ('stats.local', 9125))
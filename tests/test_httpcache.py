@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import gzip
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+from os.path import join
+
+import datapackage
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from dpm.client import validate_data
+from dpm.utils.httpcache import HTTPCache
+from .base import LiveServerTestCase
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serve server.files with ETag and single range support. Files in
+    server.gzipped are sent gzip-encoded, without range support.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        self.server.requests.append((self.command, self.path, self.headers.get('Range')))
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        status = 200
+        headers = {'ETag': '"%s"' % hashlib.md5(content).hexdigest()}
+        if self.path in self.server.gzipped:
+            buffer = io.BytesIO()
+            with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as f:
+                f.write(content)
+            content = buffer.getvalue()
+            headers['Content-Encoding'] = 'gzip'
+        match = self.path not in self.server.gzipped and re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range') or '')
+        if match:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(content) - 1)
+            headers['Content-Range'] = 'bytes %s-%s/%s' % (start, end, len(content))
+            status, content = 206, content[start:end + 1]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+
+class HTTPCacheTest(LiveServerTestCase):
+    """
+    HTTPCache should download remote files once, and revalidate them with
+    one HEAD request.
+    """
+
+    def setUp(self):
+        # GIVEN http server with csv files
+        self.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.files = {
+            '/small.csv': b'id,name\n1,a\n2,b\n',
+            '/big.csv': ('id,name\n' + ''.join('%s,name-%s\n' % (i, i)
+                                              for i in range(100000))).encode('utf-8'),
+        }
+        self.server.gzipped = set()
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.cache = HTTPCache(join(self.tmpdir, 'cache'))
+
+    def requests(self):
+        requests, self.server.requests[:] = list(self.server.requests), []
+        return requests
+
+    def test_fetch(self):
+        # WHEN remote file is fetched
+        path = self.cache.fetch(self.url + '/small.csv')
+
+        # THEN it should be downloaded
+        with io.open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'id,name\n1,a\n2,b\n')
+        self.assertEqual(self.requests(), [('GET', '/small.csv', None)])
+
+        # WHEN it is fetched again
+        # THEN only HEAD request should be sent
+        self.assertEqual(self.cache.fetch(self.url + '/small.csv'), path)
+        self.assertEqual(self.requests(), [('HEAD', '/small.csv', None)])
+
+        # WHEN remote file is changed
+        self.server.files['/small.csv'] = b'id,name\n3,c\n'
+
+        # THEN it should be downloaded again
+        with io.open(self.cache.fetch(self.url + '/small.csv'), 'rb') as f:
+            self.assertEqual(f.read(), b'id,name\n3,c\n')
+        self.assertEqual(self.cache.stats['downloads'], 2)
+
+    def test_fetch_gzipped(self):
+        # GIVEN file served with gzip encoding
+        self.server.gzipped.add('/big.csv')
+
+        # WHEN it is fetched
+        path = self.cache.fetch(self.url + '/big.csv')
+
+        # THEN it should be stored decoded
+        with io.open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.server.files['/big.csv'])
+        self.requests()
+
+        # AND it should be reused when fetched again
+        self.assertEqual(self.cache.fetch(self.url + '/big.csv'), path)
+        self.assertEqual(self.requests(), [('HEAD', '/big.csv', None)])
+        self.assertEqual(self.cache.stats['downloads'], 1)
+
+    def test_fetch_head(self):
+        # WHEN first lines of big file are fetched
+        path = self.cache.fetch(self.url + '/big.csv', lines=1001)
+
+        # THEN only the head should be downloaded with range request, whole lines
+        with io.open(path, 'rb') as f:
+            content = f.read()
+        self.assertTrue(content.endswith(b'\n'))
+        self.assertGreaterEqual(content.count(b'\n'), 1001)
+        self.assertLess(len(content), len(self.server.files['/big.csv']))
+        self.assertEqual(self.requests(), [('GET', '/big.csv', 'bytes=0-262143')])
+
+        # AND the head should be reused for the same number of lines
+        self.cache.fetch(self.url + '/big.csv', lines=1001)
+        self.assertEqual(self.requests(), [('HEAD', '/big.csv', None)])
+
+    def test_lru_eviction(self):
+        # GIVEN cache smaller than two files
+        self.cache.max_size = len(self.server.files['/big.csv']) + 10
+
+        # WHEN both files are fetched
+        small = self.cache.fetch(self.url + '/small.csv')
+        big = self.cache.fetch(self.url + '/big.csv')
+
+        # THEN the least recently used file should be removed
+        self.assertFalse(os.path.exists(small))
+        self.assertTrue(os.path.exists(big))
+
+    def test_validate_remote_resource(self):
+        # GIVEN datapackage with remote resource
+        dp = datapackage.DataPackage({
+            'name': 'some-datapackage',
+            'resources': [{
+                'name': 'small',
+                'url': self.url + '/small.csv',
+                'schema': {'fields': [{'name': 'id', 'type': 'integer'},
+                                      {'name': 'name', 'type': 'string'}]},
+            }]
+        })
+
+        # WHEN it is validated twice through the cache
+        for _ in range(2):
+            report = validate_data(dp, http_cache=self.cache)
+            self.assertTrue(report['valid'], report)
+
+        # THEN the file should be downloaded once, for the row limit
+        self.assertEqual([request[0] for request in self.requests()], ['GET', 'HEAD'])
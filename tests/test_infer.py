@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from dpm.utils.infer import infer_schema, infer_type
+
+
+class InferTest(unittest.TestCase):
+    """
+    infer_schema() should infer field types from a sample of rows.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = join(self.tmpdir, 'data.csv')
+
+    def test_infer_type(self):
+        # WHEN types of columns are inferred
+        # THEN the most specific type of majority of values should be returned
+        self.assertEqual(infer_type(['1', '-2', '', 'null']), 'integer')
+        self.assertEqual(infer_type(['1', '2.5', '1e3']), 'number')
+        self.assertEqual(infer_type(['Yes', 'n', 'TRUE']), 'boolean')
+        self.assertEqual(infer_type(['2016-01-01', '2016-12-31']), 'date')
+        self.assertEqual(infer_type(['2016-01-01T10:00:00Z']), 'datetime')
+        self.assertEqual(infer_type(['10', '20', 'E']), 'integer')
+        self.assertEqual(infer_type(['a', 'b', '1']), 'string')
+        self.assertEqual(infer_type([]), 'string')
+
+    def test_infer_schema_from_blocks(self):
+        # GIVEN big file, where only rows far from the head have decimals
+        with io.open(self.path, 'w') as f:
+            f.write('id;price;name\n')
+            for idx in range(20000):
+                f.write('%s;%s;"name %s"\n' % (idx, idx if idx < 1000 else idx / 4, idx))
+
+        # WHEN schema is inferred from the head only
+        schema = infer_schema(self.path, blocks=0)
+
+        # THEN price should look like integer
+        self.assertEqual([field['type'] for field in schema['fields']],
+                         ['integer', 'integer', 'string'])
+
+        # WHEN schema is inferred from the head and random blocks
+        schema = infer_schema(self.path, head=100, blocks=20)
+
+        # THEN price should be number
+        self.assertEqual(schema['fields'], [
+            {'name': 'id', 'type': 'integer', 'format': 'default'},
+            {'name': 'price', 'type': 'number', 'format': 'default'},
+            {'name': 'name', 'type': 'string', 'format': 'default'},
+        ])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import requests
+import responses
+from mock import patch
+
+from dpm.utils.linkcheck import LinkChecker
+from .base import BaseTestCase
+
+
+class LinkCheckerTest(BaseTestCase):
+    """
+    LinkChecker should check links with HEAD requests concurrently, falling
+    back to GET and retrying failed requests.
+    """
+
+    def setUp(self):
+        patch('dpm.utils.linkcheck.RETRY_BACKOFF', 0).start()
+        self.checker = LinkChecker(max_workers=4, per_host=2, retries=2)
+
+    def requests(self):
+        return [(call.request.method, call.request.url) for call in responses.calls]
+
+    def test_head_not_supported(self):
+        # GIVEN server not supporting HEAD
+        responses.add(responses.HEAD, 'http://example.com/a', status=405)
+        responses.add(responses.GET, 'http://example.com/a', status=200)
+
+        # WHEN link is checked
+        result = self.checker.check('http://example.com/a')
+
+        # THEN link should be checked with GET
+        self.assertEqual((result['ok'], result['status'], result['method']), (True, 200, 'GET'))
+
+    def test_retries(self):
+        # GIVEN server responding with 503 twice and 200 then
+        for status in (503, 503, 200):
+            responses.add(responses.HEAD, 'http://example.com/a', status=status)
+
+        # WHEN link is checked
+        result = self.checker.check('http://example.com/a')
+
+        # THEN link should be ok after retries
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(len(self.requests()), 3)
+
+    def test_connection_error(self):
+        # GIVEN server that is down
+        responses.add(responses.HEAD, 'http://example.com/a',
+                      body=requests.ConnectionError('Connection refused'))
+
+        # WHEN link is checked
+        result = self.checker.check('http://example.com/a')
+
+        # THEN link should be broken, after retries
+        self.assertEqual((result['ok'], result['status']), (False, None))
+        self.assertIn('Connection refused', result['error'])
+        self.assertEqual(len(self.requests()), 3)
+
+    def test_check_all(self):
+        # GIVEN many links, one of them broken
+        urls = ['http://example.com/%s' % idx for idx in range(50)]
+        for url in urls:
+            responses.add(responses.HEAD, url, status=404 if url.endswith('/7') else 200)
+
+        # WHEN links are checked lazily
+        results = list(self.checker.check_all(iter(urls)))
+
+        # THEN all links should be checked once
+        self.assertEqual(sorted(result['url'] for result in results), sorted(urls))
+        self.assertEqual([result['url'] for result in results if not result['ok']],
+                         ['http://example.com/7'])
+        self.assertEqual(len(self.requests()), 50)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+import requests
+
+from dpm.client import Client
+from dpm.client.async_client import AsyncClient
+from dpm.utils.md5_hash import md5_file_chunk
+from .base import LiveServerTestCase
+from .fake_registry import FakeRegistry
+
+dp1_path = 'tests/fixtures/dp1'
+
+
+class LiveRegistryTest(LiveServerTestCase):
+    """
+    Client should talk to the registry and bitstore over real connections.
+    """
+
+    def setUp(self):
+        # GIVEN local registry server and bitstore
+        self.registry = FakeRegistry(latency=0.001).start()
+        self.addCleanup(self.registry.stop)
+
+    def test_publish_streams_files_to_bitstore(self):
+        # WHEN datapackage is published
+        url = Client(dp1_path, self.registry.config).publish()
+
+        # THEN every file should be received intact
+        self.assertEqual(url, self.registry.url + '/user/abc')
+        self.assertEqual(self.registry.uploads['user/abc/data/some-data.csv']['md5'],
+                         md5_file_chunk(dp1_path + '/data/some-data.csv'))
+        self.assertEqual(sorted(self.registry.uploads), [
+            'user/abc/README.md', 'user/abc/data/some-data.csv', 'user/abc/datapackage.json'])
+        # AND the package should be queued for processing
+        self.assertEqual(self.registry.published,
+                         [self.registry.url + '/bitstore/user/abc/datapackage.json'])
+        # AND connections should be reused
+        self.assertEqual(self.registry.stats['connections'], 1)
+
+    def test_retry_injected_errors(self):
+        # GIVEN the registry that drops connection and then is unavailable
+        self.registry.fail_next('/api/auth/token', status=0)
+        self.registry.fail_next('/api/datastore/authorize', status=503)
+
+        # WHEN datapackage is published by the client with retries
+        with pytest.raises(requests.ConnectionError):
+            Client(dp1_path, self.registry.config).publish()
+        Client(dp1_path, self.registry.config, retries=2).publish()
+
+        # THEN the failed requests should be retried
+        self.assertEqual(
+            [request for request in self.registry.requests if request[2] != 204], [
+                ('POST', '/api/auth/token', 200),
+                ('POST', '/api/datastore/authorize', 503),
+                ('POST', '/api/datastore/authorize', 200),
+                ('POST', '/api/package/upload', 200),
+            ])
+
+    def test_concurrent_operations_share_connection_pool(self):
+        # WHEN many packages are deleted concurrently with 4 connections
+        with AsyncClient(self.registry.config, max_workers=8, max_connections=4) as client:
+            results = list(client.batch('delete', ['package-%s' % idx for idx in range(40)]))
+
+        # THEN all should succeed over at most 4 connections
+        self.assertEqual([error for _, _, error in results], [None] * 40)
+        self.assertLessEqual(self.registry.stats['connections'], 4)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mock import patch
+
+from dpm.client import Client
+from dpm.utils.lock import LOCK_FILENAME, Lockfile
+from dpm.utils.validation import DataValidator
+
+
+class LockTest(unittest.TestCase):
+    """
+    Client.lock() should write digests and validation status of the files,
+    and recompute only changed entries on the next run.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with cities referencing countries
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.write('countries.csv', 'code,name\n1,France\n2,Spain\n')
+        self.write('cities.csv', 'name,country\nParis,1\nMadrid,2\n')
+        self.write('datapackage.json', json.dumps({
+            'name': 'some-datapackage',
+            'resources': [{
+                'name': 'cities',
+                'path': 'cities.csv',
+                'schema': {
+                    'fields': [
+                        {'name': 'name', 'type': 'string'},
+                        {'name': 'country', 'type': 'integer'},
+                    ],
+                    'foreignKeys': [{
+                        'fields': 'country',
+                        'reference': {'resource': 'countries', 'fields': 'code'},
+                    }],
+                },
+            }, {
+                'name': 'countries',
+                'path': 'countries.csv',
+                'schema': {'fields': [
+                    {'name': 'code', 'type': 'integer'},
+                    {'name': 'name', 'type': 'string'},
+                ]},
+            }]
+        }))
+
+    def write(self, path, content):
+        with io.open(join(self.tmpdir, path), 'w') as f:
+            f.write(content)
+
+    def lock(self, verify=False):
+        """
+        Lock the datapackage, return the lock and names of validated files.
+        """
+        with patch.object(DataValidator, 'validate_table', autospec=True,
+                          side_effect=DataValidator.validate_table) as validate_table:
+            lockfile = Client(self.tmpdir, verify=verify).lock()
+        return lockfile, sorted(os.path.basename(call[0][1])
+                                for call in validate_table.call_args_list)
+
+    def test_lock(self):
+        # WHEN lock is created
+        lockfile, validated = self.lock()
+
+        # THEN digests and validation status of every file should be saved
+        with io.open(join(self.tmpdir, LOCK_FILENAME)) as f:
+            files = json.load(f)['files']
+        self.assertEqual(sorted(files), ['cities.csv', 'countries.csv', 'datapackage.json'])
+        self.assertEqual(files['cities.csv']['size'], 30)
+        self.assertEqual(files['cities.csv']['valid'], True)
+        self.assertEqual(len(files['cities.csv']['sha256']), 64)
+        self.assertEqual(validated, ['cities.csv', 'countries.csv'])
+
+        # WHEN lock is updated without changes
+        lockfile, validated = self.lock()
+
+        # THEN nothing should be hashed or validated
+        self.assertEqual(lockfile.recomputed, [])
+        self.assertEqual(validated, [])
+
+        # WHEN referenced resource is changed
+        self.write('countries.csv', 'code,name\n1,France\n')
+        lockfile, validated = self.lock()
+
+        # THEN it and the resource referencing it should be revalidated
+        self.assertEqual(lockfile.recomputed, ['countries.csv'])
+        self.assertEqual(validated, ['cities.csv', 'countries.csv'])
+        self.assertEqual(lockfile.files['cities.csv']['valid'], False)
+
+        # WHEN lock is verified
+        lockfile, validated = self.lock(verify=True)
+
+        # THEN everything should be recomputed
+        self.assertEqual(sorted(lockfile.recomputed),
+                         ['cities.csv', 'countries.csv', 'datapackage.json'])
+        self.assertEqual(validated, ['cities.csv', 'countries.csv'])
+
+    def test_unchanged_file_uses_stored_digest(self):
+        # GIVEN locked file
+        lockfile = Lockfile(self.tmpdir)
+        md5 = lockfile.entry('cities.csv')['md5']
+        lockfile.save()
+
+        # WHEN file info is collected for publish
+        with patch('dpm.utils.lock.file_digests') as file_digests:
+            info = Client(self.tmpdir)._get_file_info('cities.csv')
+
+        # THEN stored digest should be used
+        self.assertFalse(file_digests.called)
+        self.assertEqual(info['md5'], md5)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mock import patch
+
+from dpm.utils import mediatype
+
+
+class MediaTypeTest(unittest.TestCase):
+    """
+    detect() should pick content type and charset from the resource
+    descriptor, leading bytes and extension of the file.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name, content):
+        path = join(self.tmpdir, name)
+        with io.open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_descriptor(self):
+        # GIVEN file without extension
+        path = self.write('data', b'a,b\n')
+
+        # WHEN resource descriptor has format or mediatype
+        # THEN it should be used without reading the file
+        with patch.object(mediatype, 'sniff') as sniff:
+            self.assertEqual(mediatype.detect(path, {'format': 'csv'}), ('text/csv', 'utf-8'))
+            self.assertEqual(mediatype.detect(path, {'mediatype': 'text/csv',
+                                                     'encoding': 'iso-8859-2'}),
+                             ('text/csv', 'iso-8859-2'))
+        self.assertFalse(sniff.called)
+
+    def test_sniff(self):
+        # WHEN type of files is detected by contents and extension
+        # THEN leading bytes of binary formats should win over the extension
+        self.assertEqual(mediatype.detect(self.write('data.csv', b'\x1f\x8b\x08\x00')),
+                         ('application/gzip', None))
+        self.assertEqual(mediatype.detect(self.write('table.bin', b'PAR1\x15\x04')),
+                         ('application/vnd.apache.parquet', None))
+        self.assertEqual(mediatype.detect(self.write('book.xlsx', b'PK\x03\x04')),
+                         (mediatype.FORMATS['xlsx'], None))
+        # AND charset of text files should be detected
+        self.assertEqual(mediatype.detect(self.write('data.csv', 'a\nŽluť\n'.encode('utf-8'))),
+                         ('text/csv', 'utf-8'))
+        self.assertEqual(mediatype.detect(self.write('data.tsv', 'a\n\xe9\n'.encode('latin-1'))),
+                         ('text/tab-separated-values', None))
+        # AND text without known extension should be told by contents
+        self.assertEqual(mediatype.detect(self.write('README', b'Data Package')),
+                         ('text/plain', 'utf-8'))
+        self.assertEqual(mediatype.detect(self.write('data', b' {"a": 1}')),
+                         ('application/json', 'utf-8'))
+        self.assertEqual(mediatype.detect(self.write('blob', b'\x00\x01')),
+                         ('application/octet-stream', None))
+
+    def test_cache(self):
+        # GIVEN file which type was detected
+        path = self.write('README', b'text')
+        mediatype.detect(path)
+
+        # WHEN type of the unchanged file is detected again
+        # THEN the file should not be read again
+        with patch.object(mediatype, 'sniff') as sniff:
+            self.assertEqual(mediatype.detect(path), ('text/plain', 'utf-8'))
+        self.assertFalse(sniff.called)
+
+    def test_content_type(self):
+        # WHEN Content-Type is formatted
+        # THEN charset should be added only to text types
+        self.assertEqual(mediatype.content_type('text/csv', 'utf-8'), 'text/csv; charset=utf-8')
+        self.assertEqual(mediatype.content_type('application/json', 'utf-8'), 'application/json')
+        self.assertEqual(mediatype.content_type('text/csv'), 'text/csv')
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from dpm.utils.scheduler import FairSlots, TokenBucket, TransferScheduler
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    @patch('dpm.utils.scheduler.time.sleep')
+    @patch('dpm.utils.scheduler.monotonic', lambda: 100.0)
+    def test_consume_sleeps_off_the_debt(self, sleep):
+        # GIVEN full bucket for 1000 bytes per second
+        bucket = TokenBucket(1000)
+
+        # WHEN the burst is consumed
+        bucket.consume(1000)
+        # THEN there is no wait
+        sleep.assert_not_called()
+
+        # WHEN more bytes are consumed at the same moment
+        bucket.consume(500)
+        bucket.consume(500)
+        # THEN callers wait until their share of tokens is refilled
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [0.5, 1.0])
+
+
+class TransferSchedulerTest(unittest.TestCase):
+
+    def test_counts_successful_uploads(self):
+        scheduler = TransferScheduler(max_uploads=1)
+
+        with scheduler.upload(10):
+            pass
+        try:
+            with scheduler.upload(20):
+                raise IOError
+        except IOError:
+            pass
+
+        self.assertEqual((scheduler.files, scheduler.bytes), (1, 10))
+
+
+class FairSlotsTest(unittest.TestCase):
+
+    def run_jobs(self, slots, jobs):
+        """
+        Queue jobs of (size, arrival time) for the taken slot, release it
+        and return sizes of jobs in the order they got the slot.
+        """
+        order = []
+
+        def job(size):
+            slots.acquire(size)
+            order.append(size)
+            slots.release()
+
+        with patch('dpm.utils.scheduler.monotonic') as monotonic:
+            threads = []
+            for size, arrival in jobs:
+                monotonic.return_value = arrival
+                threads.append(threading.Thread(target=job, args=(size,)))
+                threads[-1].start()
+                while len(slots._waiting) < len(threads):
+                    time.sleep(0.001)
+            slots.release()
+            for thread in threads:
+                thread.join()
+        return order
+
+    def test_smallest_waiting_job_gets_next_slot(self):
+        # GIVEN single slot, which is taken
+        slots = FairSlots(1)
+        slots.acquire(1000)
+
+        # WHEN big and then small job wait for it at the same time
+        order = self.run_jobs(slots, [(500, 0), (10, 0)])
+
+        # THEN small job should run first
+        self.assertEqual(order, [10, 500])
+
+    def test_waiting_big_job_is_not_starved(self):
+        # GIVEN single slot, which is taken
+        slots = FairSlots(1, aging=100)
+        slots.acquire(1000)
+
+        # WHEN big job waits for it, and small jobs arrive later
+        order = self.run_jobs(slots, [(500, 0), (10, 1), (10, 4), (10, 6)])
+
+        # THEN big job should run once it waited long enough to beat new jobs
+        self.assertEqual(order, [10, 10, 500, 10])
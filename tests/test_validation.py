@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from os.path import join
+
+import datapackage
+from mock import patch
+
+from dpm.client import ResourceDoesNotExist, validate_data, validate_metadata
+from dpm.utils.profile import reset_peak_rss
+from dpm.utils.validation import BoundedChecks, fingerprint
+
+
+class ValidateDataTest(unittest.TestCase):
+    """
+    validate_data() should find duplicate rows and unique constraint
+    violations without keeping rows in memory, and report speed and memory.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with a table with unique id column
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.write_csv('id,name\n1,a\n2,b\n1,c\n3,d\n2,b\n')
+
+    def write_csv(self, content):
+        with io.open(join(self.tmpdir, 'data.csv'), 'w') as f:
+            f.write(content)
+        self.dp = datapackage.DataPackage({
+            'name': 'some-datapackage',
+            'resources': [{
+                'name': 'data',
+                'path': 'data.csv',
+                'schema': {'fields': [
+                    {'name': 'id', 'type': 'integer', 'constraints': {'unique': True}},
+                    {'name': 'name', 'type': 'string'},
+                ]}
+            }]
+        }, default_base_path=self.tmpdir)
+
+    def test_duplicate_rows_and_unique_values(self):
+        # WHEN data is validated
+        report = validate_data(self.dp)
+
+        # THEN duplicates should be reported with the row where value was first seen
+        self.assertEqual([error['message'] for error in report['errors']], [
+            'Rows 2, 4 has unique constraint violation in column 1',
+            'Row 6 is duplicated to row(s) 3',
+            'Rows 3, 6 has unique constraint violation in column 1',
+        ])
+        # AND report should include speed and memory usage
+        table = report['tables'][0]
+        self.assertEqual(table['row-count'], 6)
+        self.assertIn('peak-rss', table)
+        self.assertIn('rows-per-second', table)
+        self.assertGreater(report['peak-rss'], 0)
+
+    @unittest.skipUnless(reset_peak_rss(), 'peak RSS can not be reset on this platform')
+    def test_peak_rss_of_table(self):
+        # GIVEN table which needs memory only while it is validated
+        size = 64 * 1024 * 1024
+        original_finish = BoundedChecks.finish
+
+        def finish(checks, report, error_limit):
+            allocated = b'x' * size
+            del allocated
+            return original_finish(checks, report, error_limit)
+
+        # WHEN data is validated
+        with patch.object(BoundedChecks, 'finish', finish):
+            report = validate_data(self.dp)
+
+        # THEN the table should report peak RSS including the freed memory
+        table = report['tables'][0]
+        self.assertGreater(table['peak-rss'], size)
+        self.assertGreaterEqual(report['peak-rss'], table['peak-rss'])
+
+    def test_memory_budget_spills_to_disk(self):
+        # GIVEN bigger table with duplicates far apart
+        self.write_csv('id,name\n' + ''.join('%s,x\n' % i for i in range(5000)) + '7,y\n0,x\n')
+
+        # WHEN data is validated with memory for about 100 fingerprints
+        report = validate_data(self.dp, memory_budget=100 * 64, row_limit=None)
+
+        # THEN fingerprints should be spilled to disk
+        table = report['tables'][0]
+        self.assertGreater(table['spilled-runs'], 10)
+        # AND exact row numbers should still be reported
+        self.assertEqual([error['message'] for error in report['errors']], [
+            'Rows 9, 5002 has unique constraint violation in column 1',
+            'Row 5003 is duplicated to row(s) 2',
+            'Rows 2, 5003 has unique constraint violation in column 1',
+        ])
+
+    def test_primary_key(self):
+        # GIVEN table with composite primary key
+        self.write_csv('id,name\n1,a\n1,b\n2,a\n1,b\n')
+        self.dp.resources[0].descriptor['schema']['fields'][0]['constraints'] = {}
+        self.dp.resources[0].descriptor['schema']['primaryKey'] = ['id', 'name']
+
+        # WHEN data is validated
+        report = validate_data(self.dp)
+
+        # THEN rows with the same key should be reported
+        self.assertEqual([error['message'] for error in report['errors']], [
+            'Row 5 is duplicated to row(s) 3',
+            'Rows 3, 5 has primary key violation in columns 1, 2',
+        ])
+
+    def test_values_with_equal_hash(self):
+        # GIVEN unique integers which are equal by hash(): -1 and -2,
+        # N and N + 2**61 - 1
+        self.write_csv('id,name\n-1,a\n-2,a\n5,a\n%s,a\n' % (5 + 2 ** 61 - 1))
+        self.dp.resources[0].descriptor['schema']['primaryKey'] = ['id']
+
+        # WHEN data is validated
+        report = validate_data(self.dp)
+
+        # THEN no unique or primary key violation should be reported
+        self.assertEqual(report['errors'], [])
+
+    def test_fingerprint(self):
+        # WHEN values are fingerprinted
+        # THEN values equal by hash() should differ
+        self.assertNotEqual(fingerprint([-1]), fingerprint([-2]))
+        self.assertNotEqual(fingerprint([5]), fingerprint([5 + 2 ** 61 - 1]))
+        self.assertNotEqual(fingerprint(['1']), fingerprint([1]))
+        self.assertNotEqual(fingerprint(['a', 'b']), fingerprint(['ab', '']))
+        # AND equal numbers of different types should be equal
+        self.assertEqual(fingerprint([1]), fingerprint([Decimal('1.00')]))
+        self.assertEqual(fingerprint([1.5]), fingerprint([Decimal('1.50')]))
+
+    def test_row_limit(self):
+        # GIVEN table with duplicate after the first rows
+        self.write_csv('id,name\n' + ''.join('%s,x\n' % i for i in range(10)) + '0,x\n')
+
+        # WHEN data is validated with and without row limit
+        # THEN only the limited rows should be checked
+        self.assertTrue(validate_data(self.dp, row_limit=5)['valid'])
+        self.assertEqual(validate_data(self.dp, row_limit=None)['error-count'], 2)
+
+
+class ValidateForeignKeysTest(unittest.TestCase):
+    """
+    validate_data() should check foreign keys against the referenced resource.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with cities referencing countries
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        with io.open(join(self.tmpdir, 'countries.csv'), 'w') as f:
+            f.write('code,name\n1,France\n2,Spain\n')
+        with io.open(join(self.tmpdir, 'cities.csv'), 'w') as f:
+            f.write('name,country\nParis,1\nMadrid,2.0\nAtlantis,3\nNowhere,\n')
+        self.descriptor = {
+            'name': 'some-datapackage',
+            'resources': [{
+                'name': 'cities',
+                'path': 'cities.csv',
+                'schema': {
+                    'fields': [
+                        {'name': 'name', 'type': 'string'},
+                        {'name': 'country', 'type': 'number'},
+                    ],
+                    'foreignKeys': [{
+                        'fields': 'country',
+                        'reference': {'resource': 'countries', 'fields': 'code'},
+                    }],
+                },
+            }, {
+                'name': 'countries',
+                'path': 'countries.csv',
+                'schema': {'fields': [
+                    {'name': 'code', 'type': 'integer'},
+                    {'name': 'name', 'type': 'string'},
+                ]},
+            }]
+        }
+
+    def test_foreign_key_violation(self):
+        # WHEN data is validated, with key index in memory and memory-mapped
+        for memory_budget in (None, 8):
+            dp = datapackage.DataPackage(self.descriptor, default_base_path=self.tmpdir)
+            report = validate_data(dp, memory_budget=memory_budget)
+
+            # THEN only the missing key should be reported, typed values compared
+            self.assertEqual([error['message'] for error in report['errors']], [
+                'Row 4 has foreign key violation in columns 2: 3 not found in countries',
+            ])
+
+    def test_negative_keys(self):
+        # GIVEN countries with key -1 and a city referencing key -2,
+        # which is equal to -1 by hash()
+        with io.open(join(self.tmpdir, 'countries.csv'), 'w') as f:
+            f.write('code,name\n-1,France\n')
+        with io.open(join(self.tmpdir, 'cities.csv'), 'w') as f:
+            f.write('name,country\nParis,-1\nAtlantis,-2\n')
+
+        # WHEN data is validated
+        dp = datapackage.DataPackage(self.descriptor, default_base_path=self.tmpdir)
+        report = validate_data(dp)
+
+        # THEN the missing key should be reported
+        self.assertEqual([error['message'] for error in report['errors']], [
+            'Row 3 has foreign key violation in columns 2: -2 not found in countries',
+        ])
+
+    def test_missing_referenced_resource(self):
+        # GIVEN foreign key to missing resource
+        self.descriptor['resources'].pop()
+        dp = datapackage.DataPackage(self.descriptor, default_base_path=self.tmpdir)
+
+        # WHEN metadata is validated
+        # THEN error should be raised
+        with self.assertRaises(ResourceDoesNotExist):
+            validate_metadata(dp)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mock import patch
+
+from dpm.client import Client
+from dpm.main import watch_update
+from dpm.utils import watch
+from dpm.utils.validation import DataValidator
+
+
+class WatcherTest(unittest.TestCase):
+    """
+    Watchers should report created, changed and removed files.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        os.mkdir(join(self.tmpdir, 'data'))
+        self.write('data/a.csv', 'id\n1\n')
+        self.write('b.csv', 'id\n1\n')
+
+    def write(self, path, content):
+        with io.open(join(self.tmpdir, path), 'w') as f:
+            f.write(content)
+
+    def check_watcher(self, watcher):
+        self.addCleanup(watcher.close)
+        # WHEN nothing is changed
+        # THEN no changes should be reported
+        self.assertEqual(watcher.poll(timeout=0.05), set())
+
+        # WHEN files are changed, created, removed, and hidden files are written
+        self.write('data/a.csv', 'id\n1\n2\n')
+        self.write('c.csv', 'id\n')
+        self.write('.c.csv.swp', '')
+        os.remove(join(self.tmpdir, 'b.csv'))
+
+        # THEN changed files should be reported, hidden ignored
+        self.assertEqual(watcher.poll(timeout=1), {'data/a.csv', 'b.csv', 'c.csv'})
+
+    def test_polling_watcher(self):
+        self.check_watcher(watch.PollingWatcher(self.tmpdir, interval=0.01))
+
+    @unittest.skipIf(watch.inotify_simple is None, 'inotify_simple is not installed')
+    def test_inotify_watcher(self):
+        self.check_watcher(watch.InotifyWatcher(self.tmpdir))
+
+    def test_changes_are_debounced(self):
+        # GIVEN watcher reporting changes of one file in a row
+        polls = iter([{'a.csv'}, {'a.csv'}, {'b.csv'}, set()])
+        watcher = type(str('Watcher'), (object,), {'poll': lambda self, timeout=None: next(polls)})()
+
+        # WHEN changes are collected
+        # THEN they should be reported once
+        self.assertEqual(next(watch.changes(watcher, debounce=0.01)), {'a.csv', 'b.csv'})
+
+
+class WatchUpdateTest(unittest.TestCase):
+    """
+    watch_update() should validate only resources affected by changed files,
+    and publish only changed files.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with cities referencing countries, and notes
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.write('countries.csv', 'code,name\n1,France\n')
+        self.write('cities.csv', 'name,country\nParis,1\n')
+        self.write('notes.csv', 'text\nhello\n')
+        self.descriptor = {
+            'name': 'some-datapackage',
+            'resources': [{
+                'name': 'cities',
+                'path': 'cities.csv',
+                'schema': {
+                    'fields': [
+                        {'name': 'name', 'type': 'string'},
+                        {'name': 'country', 'type': 'integer'},
+                    ],
+                    'foreignKeys': [{
+                        'fields': 'country',
+                        'reference': {'resource': 'countries', 'fields': 'code'},
+                    }],
+                },
+            }, {
+                'name': 'countries',
+                'path': 'countries.csv',
+                'schema': {'fields': [
+                    {'name': 'code', 'type': 'integer'},
+                    {'name': 'name', 'type': 'string'},
+                ]},
+            }, {
+                'name': 'notes',
+                'path': 'notes.csv',
+            }]
+        }
+        self.write('datapackage.json', json.dumps(self.descriptor))
+        self.client = Client(self.tmpdir, datavalidate=True)
+
+    def write(self, path, content):
+        with io.open(join(self.tmpdir, path), 'w') as f:
+            f.write(content)
+
+    def update(self, changed, republish=False):
+        """
+        Return result of watch_update() and names of validated files.
+        """
+        with patch.object(DataValidator, 'validate_table', autospec=True,
+                          side_effect=DataValidator.validate_table) as validate_table, \
+                patch('dpm.main.echo'):
+            valid = watch_update(self.client, changed, republish=republish)
+        return valid, sorted(os.path.basename(call[0][1])
+                             for call in validate_table.call_args_list)
+
+    def test_changed_resource(self):
+        # WHEN referenced resource is changed
+        self.write('countries.csv', 'code,name\n2,Spain\n')
+
+        # THEN it and resource referencing it should be validated
+        self.assertEqual(self.update({'countries.csv'}),
+                         (False, ['cities.csv', 'countries.csv']))
+
+    def test_changed_descriptor(self):
+        # WHEN schema of one resource is changed
+        self.descriptor['resources'][2]['schema'] = {'fields': [
+            {'name': 'text', 'type': 'integer'}]}
+        self.write('datapackage.json', json.dumps(self.descriptor))
+
+        # THEN only that resource should be validated with the new schema
+        self.assertEqual(self.update({'datapackage.json'}), (False, ['notes.csv']))
+
+    def test_publish_changed_files(self):
+        # WHEN resource is changed in watch mode with publish
+        with patch.object(Client, '_ensure_auth'), \
+                patch.object(Client, '_publish_files') as publish_files:
+            valid, validated = self.update({'notes.csv'}, republish=True)
+
+        # THEN only the changed file and datapackage.json should be published
+        self.assertTrue(valid)
+        self.assertEqual(publish_files.call_args[0][0], ['datapackage.json', 'notes.csv'])
+
+    def test_publish_changed_readme(self):
+        # GIVEN datapackage with readme
+        self.write('README.md', 'Notes')
+
+        # WHEN only the readme is changed in watch mode with publish
+        with patch.object(Client, '_ensure_auth'), \
+                patch.object(Client, '_publish_files') as publish_files:
+            valid, validated = self.update({'README.md'}, republish=True)
+
+        # THEN nothing should be validated, but the readme should be published
+        self.assertEqual((valid, validated), (True, []))
+        self.assertEqual(publish_files.call_args[0][0], ['datapackage.json', 'README.md'])
+
+    def test_unpublished_change(self):
+        # WHEN file which is not published is changed in watch mode with publish
+        with patch.object(Client, '_publish_files') as publish_files:
+            valid, validated = self.update({'scratch.txt'}, republish=True)
+
+        # THEN nothing should be validated or published
+        self.assertEqual((valid, validated), (True, []))
+        self.assertFalse(publish_files.called)
+
+    def test_publish_added_resource(self):
+        # GIVEN data file created before it is added to the datapackage
+        self.write('towns.csv', 'name\nLyon\n')
+
+        # WHEN resource is added by changing only datapackage.json
+        self.descriptor['resources'].append({'name': 'towns', 'path': 'towns.csv'})
+        self.write('datapackage.json', json.dumps(self.descriptor))
+        with patch.object(Client, '_ensure_auth'), \
+                patch.object(Client, '_publish_files') as publish_files:
+            valid, validated = self.update({'datapackage.json'}, republish=True)
+
+        # THEN the new resource should be validated and published
+        self.assertEqual((valid, validated), (True, ['towns.csv']))
+        self.assertEqual(publish_files.call_args[0][0], ['datapackage.json', 'towns.csv'])
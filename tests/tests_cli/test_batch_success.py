@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import responses
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class BatchTest(BaseCliTestCase):
+    """
+    When user runs batch operation on the list of datapackages, dpm should
+    report result for every datapackage.
+    """
+
+    def setUp(self):
+        # GIVEN the registry server that accepts any user
+        responses.add(
+            responses.POST, 'https://example.com/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        # AND registry server accepts deletion of two datapackages
+        for name in ('pkg-1', 'pkg-2'):
+            responses.add(
+                responses.DELETE, 'https://example.com/api/package/user/%s' % name,
+                json={'message': 'OK'},
+                status=200)
+        # AND rejects deletion of the third one
+        responses.add(
+            responses.DELETE, 'https://example.com/api/package/user/pkg-3',
+            json={'message': 'Package not found'},
+            status=404)
+
+        with open('packages.txt', 'w') as f:
+            f.write('pkg-1\npkg-2\n\n')
+
+    def test_batch_delete_success(self):
+        # WHEN `dpm batch delete --file packages.txt` is invoked
+        result = self.invoke(cli, ['batch', 'delete', '--file', 'packages.txt'])
+
+        # THEN every package should be reported
+        self.assertIn('OK pkg-1', result.output)
+        self.assertIn('OK pkg-2', result.output)
+        self.assertIn('delete: 2 succeeded, 0 failed', result.output)
+        # AND auth token should be requested only once
+        self.assertEqual(
+            sorted((x.request.method, x.request.url) for x in responses.calls),
+            [
+                ('DELETE', 'https://example.com/api/package/user/pkg-1'),
+                ('DELETE', 'https://example.com/api/package/user/pkg-2'),
+                ('POST', 'https://example.com/api/auth/token'),
+            ])
+        # AND exit code should be 0
+        self.assertEqual(result.exit_code, 0)
+
+    def test_batch_delete_json_with_failure(self):
+        with open('packages.txt', 'a') as f:
+            f.write('pkg-3\n')
+
+        # WHEN `dpm batch delete --json` is invoked
+        result = self.invoke(cli, ['batch', 'delete', '--file', 'packages.txt', '--json'])
+
+        # THEN machine-readable report should be printed
+        report = json.loads(result.output)
+        report['results'].sort(key=lambda x: x['target'])
+        self.assertEqual(report, {
+            'operation': 'delete',
+            'total': 3,
+            'succeeded': 2,
+            'failed': 1,
+            'results': [
+                {'target': 'pkg-1', 'ok': True, 'error': None},
+                {'target': 'pkg-2', 'ok': True, 'error': None},
+                {'target': 'pkg-3', 'ok': False, 'error': 'Error 404\nPackage not found'},
+            ]
+        })
+        # AND exit code should be 1
+        self.assertEqual(result.exit_code, 1)
+
+    def test_batch_tag_requires_tag(self):
+        # WHEN `dpm batch tag` is invoked without --tag
+        result = self.invoke(cli, ['batch', 'tag', '--file', 'packages.txt'])
+
+        # THEN error should be printed
+        self.assertIn('--tag is required', result.output)
+        self.assertEqual(result.exit_code, 1)
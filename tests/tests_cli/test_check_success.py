@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import responses
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class CheckSuccessTest(BaseCliTestCase):
+    """
+    When user launches `dpm check`, pages of all packages of the publisher
+    should be checked.
+    """
+
+    def setUp(self):
+        # GIVEN registry server with two published packages, one broken
+        self._config['server'] = 'https://example.com'
+        responses.add(responses.GET, 'https://example.com/api/package/user',
+                      json={'data': ['good', 'bad']})
+        responses.add(responses.HEAD, 'https://example.com/user/good', status=200)
+        responses.add(responses.HEAD, 'https://example.com/user/bad', status=404)
+
+    def test_check(self):
+        # WHEN `dpm check` is invoked
+        result = self.invoke(cli, ['check'])
+
+        # THEN result of every package should be printed
+        self.assertIn('OK     https://example.com/user/good\n', result.output)
+        self.assertIn('BROKEN https://example.com/user/bad (404)\n', result.output)
+        self.assertIn('1 ok, 1 broken', result.output)
+
+        # AND exit code should be 1
+        self.assertEqual(result.exit_code, 1)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+from mock import patch
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class FixSuccessTest(BaseCliTestCase):
+    """
+    When user launches `dpm fix`, datapackage.json files should be fixed.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with metadata object instead of list
+        patch('dpm.utils.fixers.DEFAULT_CACHE_PATH', os.path.abspath('fix-cache.json')).start()
+        os.mkdir('dp')
+        with io.open('dp/datapackage.json', 'w') as f:
+            f.write(json.dumps({'name': 'dp', 'licenses': {'name': 'license'}}))
+
+    def test_fix(self):
+        # WHEN `dpm fix` is invoked
+        result = self.invoke(cli, ['fix', 'dp'])
+
+        # THEN datapackage should be fixed
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, '[FIXED] dp\n1 fixed, 0 unchanged, 0 cached, 0 errors\n')
+        with io.open('dp/datapackage.json') as f:
+            self.assertEqual(json.load(f)['licenses'], [{'name': 'license'}])
+
+        # AND next run should skip it
+        result = self.invoke(cli, ['fix', 'dp'])
+        self.assertEqual(result.output, '0 fixed, 0 unchanged, 1 cached, 0 errors\n')
+
+    def test_fix_show(self):
+        # WHEN `dpm fix --show` is invoked
+        result = self.invoke(cli, ['fix', '--show', 'dp'])
+
+        # THEN fixed datapackage should be printed, but not written
+        self.assertEqual(json.loads(result.output)['licenses'], [{'name': 'license'}])
+        with io.open('dp/datapackage.json') as f:
+            self.assertEqual(json.load(f)['licenses'], {'name': 'license'})
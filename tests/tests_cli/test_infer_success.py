@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class InferSuccessTest(BaseCliTestCase):
+    """
+    When user launches `dpm infer` on a csv file, inferred schema should be
+    printed and optionally saved to datapackage.json.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with resource without schema
+        with io.open('datapackage.json', 'w') as f:
+            f.write(json.dumps({
+                'name': 'some-datapackage',
+                'resources': [{'name': 'data', 'path': './data.csv'}],
+            }))
+        with io.open('data.csv', 'w') as f:
+            f.write('id,date,valid\n1,2016-01-01,yes\n2,2016-02-01,no\n')
+
+    def test_infer_prints_schema(self):
+        # WHEN `dpm infer` is invoked
+        result = self.invoke(cli, ['infer', 'data.csv'])
+
+        # THEN schema should be printed
+        self.assertEqual(result.exit_code, 0)
+        schema = json.loads(result.output)
+        self.assertEqual([field['type'] for field in schema['fields']],
+                         ['integer', 'date', 'boolean'])
+
+    def test_infer_write(self):
+        # WHEN `dpm infer --write` is invoked
+        result = self.invoke(cli, ['infer', '--write', 'data.csv'])
+
+        # THEN schema should be saved to the resource
+        self.assertEqual(result.exit_code, 0)
+        with io.open('datapackage.json') as f:
+            resources = json.load(f)['resources']
+        self.assertEqual(len(resources), 1)
+        self.assertEqual([field['name'] for field in resources[0]['schema']['fields']],
+                         ['id', 'date', 'valid'])
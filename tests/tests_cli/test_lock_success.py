@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class LockSuccessTest(BaseCliTestCase):
+    """
+    When user launches `dpm lock` inside a datapackage dir, datapackage.lock
+    should be written.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage with one resource
+        with io.open('datapackage.json', 'w') as f:
+            f.write(json.dumps({
+                'name': 'some-datapackage',
+                'resources': [{'name': 'data', 'path': 'data.csv'}],
+            }))
+        with io.open('data.csv', 'w') as f:
+            f.write('id,name\n1,a\n')
+
+    def test_lock(self):
+        # WHEN `dpm lock` is invoked twice
+        result = self.invoke(cli, ['lock'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'datapackage.lock: 2 files, 2 updated\n')
+        result = self.invoke(cli, ['lock'])
+
+        # THEN unchanged files should not be updated on the second run
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'datapackage.lock: 2 files, 0 updated\n')
+
+        # AND lock should have validation status of the resource
+        with io.open('datapackage.lock') as f:
+            self.assertEqual(json.load(f)['files']['data.csv']['valid'], True)
+
+    def test_lock_verify(self):
+        # WHEN `dpm lock --verify` is invoked on locked datapackage
+        self.invoke(cli, ['lock'])
+        result = self.invoke(cli, ['lock', '--verify'])
+
+        # THEN all files should be updated
+        self.assertEqual(result.output, 'datapackage.lock: 2 files, 2 updated\n')
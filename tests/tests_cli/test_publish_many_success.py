@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import os
+import re
+
+import responses
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+def authorize_callback(request):
+    """
+    Registry server authorizes upload of all files from the request.
+    """
+    body = json.loads(request.body.decode('utf8'))
+    name = body['metadata']['name']
+    filedata = {}
+    for path in body['filedata']:
+        filedata[path] = {
+            'upload_url': 'https://s3.fake/%s' % name,
+            'upload_query': {'key': '%s/%s' % (name, path)}
+        }
+    return 200, {}, json.dumps({'filedata': filedata})
+
+
+class PublishManyTest(BaseCliTestCase):
+    """
+    When user publishes many datapackages at once, dpm should publish valid ones
+    and report the ones that failed.
+    """
+
+    def setUp(self):
+        # GIVEN two valid datapackages
+        for name in ('first', 'second'):
+            os.makedirs('packages/%s/data' % name)
+            with open('packages/%s/datapackage.json' % name, 'w') as f:
+                json.dump({'name': name, 'resources': [{'path': 'data/data.csv'}]}, f)
+            with open('packages/%s/data/data.csv' % name, 'w') as f:
+                f.write('a,b\n1,2\n')
+        # AND datapackage with missing resource file
+        os.makedirs('packages/broken')
+        with open('packages/broken/datapackage.json', 'w') as f:
+            json.dump({'name': 'broken', 'resources': [{'path': 'missing.csv'}]}, f)
+
+        # AND the registry server that accepts any user
+        responses.add(
+            responses.POST, 'https://example.com/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        # AND registry server gives bitstore upload urls
+        responses.add_callback(
+            responses.POST, 'https://example.com/api/datastore/authorize',
+            callback=authorize_callback,
+            content_type='application/json')
+        # AND s3 server allows data upload
+        responses.add(
+            responses.POST, re.compile('https://s3.fake/.*'),
+            json={'message': 'OK'},
+            status=200)
+        # AND registry server successfully finalizes upload
+        responses.add(
+            responses.POST, 'https://example.com/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+
+    def test_publish_many(self):
+        # WHEN `dpm publish-many packages` is invoked
+        result = self.invoke(cli, ['publish-many', 'packages', '--max-uploads', '2',
+                                   '--limit-rate', '10M'])
+
+        # THEN valid datapackages should be published
+        self.assertIn('packages/first: https://example.com/user/first', result.output)
+        self.assertIn('packages/second: https://example.com/user/second', result.output)
+        # AND broken datapackage should be reported
+        self.assertIn('packages/broken: Resource at index 0', result.output)
+        # AND summary with throughput should be printed
+        self.assertRegexpMatches(
+            result.output,
+            r'Published 2 of 3 datapackages in [\d.]+s \([\d.]+ packages/min, [\d.]+ MB/s\)')
+        # AND 4 files should be uploaded
+        uploads = [x.request.url for x in responses.calls
+                   if x.request.url.startswith('https://s3.fake/')]
+        self.assertEqual(len(uploads), 4)
+        # AND exit code should be 1
+        self.assertEqual(result.exit_code, 1)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+
+import datapackage
+import responses
+from mock import patch, mock_open
+
+from dpm.main import cli
+from ..base import BaseCliTestCase
+
+
+class PublishProfileTest(BaseCliTestCase):
+    """
+    When user publishes datapackage with --profile, dpm should report time
+    spent in every phase.
+    """
+
+    def setUp(self):
+        # GIVEN datapackage that can be treated as valid by the dpm
+        self.valid_dp = datapackage.DataPackage({
+                "name": "some-datapackage",
+                "resources": [
+                    {"name": "some-resource", "path": "./data/some_data.csv", }
+                ]
+            },
+            default_base_path='.')
+        patch('dpm.client.DataPackage', lambda *a: self.valid_dp).start()
+        patch('dpm.client.exists', lambda *a: True).start()
+
+        # AND the registry server that accepts the datapackage
+        responses.add(
+            responses.POST, 'https://example.com/api/auth/token',
+            json={'token': 'blabla'},
+            status=200)
+        responses.add(
+            responses.POST, 'https://example.com/api/datastore/authorize',
+            json={
+                'filedata': {
+                    'datapackage.json': {'upload_url': 'https://s3.fake/put_here',
+                                         'upload_query': {'key': 'k'}},
+                    './data/some_data.csv': {'upload_url': 'https://s3.fake/put_here',
+                                             'upload_query': {'key': 'k'}}
+                }
+            },
+            status=200)
+        responses.add(
+            responses.POST, 'https://s3.fake/put_here',
+            json={'message': 'OK'},
+            status=200)
+        responses.add(
+            responses.POST, 'https://example.com/api/package/upload',
+            json={'status': 'queued'},
+            status=200)
+
+    @patch('dpm.client.filter', lambda *a: ['datapackage.json'])
+    @patch('dpm.client.open', mock_open())
+    @patch('dpm.client.getsize', lambda a: 10)
+    @patch('dpm.client.md5_file_chunk', lambda a: '855f938d67b52b5a7eb124320a21a139')
+    def test_publish_profile(self):
+        # WHEN `dpm --profile publish` is invoked with chrome trace output
+        result = self.invoke(cli, ['--profile', '--profile-output', 'trace.json',
+                                   '--profile-format', 'chrome', 'publish'])
+
+        # THEN every phase should be reported
+        self.assertEqual(result.exit_code, 0)
+        for row in (r'phase +validate', r'phase +hash', r'phase +authorize',
+                    r'phase +upload', r'phase +finalize',
+                    r'upload +\./data/some_data\.csv +1 ',
+                    r'counter +api-requests +3', r'counter +bitstore-requests +2'):
+            self.assertRegexpMatches(result.output, row)
+
+        # AND Chrome trace should be saved
+        with open('trace.json') as f:
+            trace = json.load(f)
+        names = [event['name'] for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertIn('authorize', names)
+        self.assertIn('datapackage.json', names)
@@ -87,6 +87,8 @@ class PublishSuccessTest(BaseCliTestCase):
 
         # THEN published package url should be printed to stdout
         self.assertRegexpMatches(result.output, 'Datapackage successfully published. It is available at https://example.com/user/some-datapackage')
+        # AND upload statistics should be printed
+        self.assertRegexpMatches(result.output, r'Uploaded 3 files \(30\) in [\d.]+s')
         # AND 6 requests should be sent
         self.assertEqual(
             [(x.request.method, x.request.url)
@@ -50,8 +50,11 @@ class DatavalidateInvalidInferredSchemaTest(BaseCliTestCase):
         # Strip time measurements
         # https://github.com/frictionlessdata/goodtables-py/issues/169
         report.pop('time')
+        report.pop('peak-rss')
         for table in report['tables']:
             table.pop('time')
+            table.pop('rows-per-second')
+            table.pop('peak-rss')
 
         # THEN json with validation error should be printed to stdout
         assert report == {
@@ -76,7 +79,18 @@ class DatavalidateInvalidInferredSchemaTest(BaseCliTestCase):
                     "source": "invalid.csv"
                 }
             ],
-            "errors": [],
+            "errors": [
+                {
+                    "message": "Row 4 has non castable value E in column 1 (type: integer, format: default)",
+                    "code": "non-castable-value",
+                    "row-number": 4,
+                    "column-number": 1,
+                    "row": [
+                        "E",
+                        "1982"
+                    ]
+                }
+            ],
             "table-count": 1,
             "error-count": 1,
             "valid": False,